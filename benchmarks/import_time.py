@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+# Import Time
+#
+# Time the imports of the treat package in fresh interpreters, and make sure
+# the light entry points do not pull in OpenMC, OpenMOC, or matplotlib.
+# Timings share the baselines file of run_benchmarks.py, as "import:<statement>".
+#
+# Usage:
+#     python benchmarks/import_time.py              # run and compare
+#     python benchmarks/import_time.py --save       # run and store new baselines
+
+import os
+import sys
+import json
+import argparse
+import subprocess
+
+_ROOT = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+BASELINES = os.path.join(os.path.dirname(os.path.realpath(__file__)), "baselines.json")
+HEAVY_MODULES = ("openmc", "openmoc", "matplotlib")
+
+# {statement: whether it may import the heavy modules}
+STATEMENTS = {
+	"import treat": False,
+	"import treat.argparse": False,
+	"from treat.moc import Executor, Automator": False,
+	"from treat.moc import StandardCase": True,
+}
+
+_PROBE = """
+import sys, time
+sys.path.insert(0, {root!r})
+t0 = time.perf_counter()
+{statement}
+t = time.perf_counter() - t0
+print(t)
+print(" ".join(m for m in {heavy!r} if m in sys.modules))
+"""
+
+
+def time_import(statement):
+	"""Time one import statement in a fresh interpreter
+
+	Returns:
+	--------
+	seconds:        float; time the statement took
+	heavy:          list of str; heavy modules it imported
+	"""
+	code = _PROBE.format(root=_ROOT, statement=statement, heavy=HEAVY_MODULES)
+	output = subprocess.check_output([sys.executable, "-c", code], universal_newlines=True)
+	lines = output.splitlines()
+	return float(lines[-2]), lines[-1].split()
+
+
+def load_baselines(fname=BASELINES):
+	if not os.path.isfile(fname):
+		return {}
+	with open(fname, 'r') as f:
+		return json.load(f)
+
+
+def save_baselines(timings, fname=BASELINES):
+	baselines = load_baselines(fname)
+	baselines.update(timings)
+	with open(fname, 'w') as f:
+		json.dump(baselines, f, indent=1, sort_keys=True)
+
+
+def main(argv=None):
+	parser = argparse.ArgumentParser(
+		description="Time the imports of the treat package.")
+	parser.add_argument("--repeat", type=int, default=5,
+	                    help="number of fresh interpreters per import; the fastest counts")
+	parser.add_argument("--tolerance", type=float, default=1.5,
+	                    help="slowdown (time/baseline) that counts as a regression")
+	parser.add_argument("--baselines", default=BASELINES,
+	                    help="JSON file of baseline timings")
+	parser.add_argument("--save", action="store_true",
+	                    help="store these timings as the new baselines")
+	args = parser.parse_args(argv)
+	baselines = load_baselines(args.baselines)
+	timings = {}
+	failures = []
+	print("{:44s} {:>10s} {:>12s} {:>8s}".format("Import", "Time (s)", "Baseline (s)", "Ratio"))
+	for statement, heavy_ok in STATEMENTS.items():
+		key = "import:" + statement
+		runs = [time_import(statement) for _ in range(args.repeat)]
+		seconds = min(t for t, _ in runs)
+		heavy = runs[0][1]
+		timings[key] = seconds
+		flag = ""
+		if heavy and not heavy_ok:
+			flag = "  IMPORTS " + ", ".join(heavy)
+			failures.append(key)
+		base = baselines.get(key)
+		if base is None:
+			print("{:44s} {:10.4f} {:>12s} {:>8s}{}".format(statement, seconds, "-", "-", flag))
+			continue
+		ratio = seconds/base
+		if ratio > args.tolerance:
+			flag += "  REGRESSION"
+			failures.append(key)
+		print("{:44s} {:10.4f} {:12.4f} {:8.2f}{}".format(statement, seconds, base, ratio, flag))
+	if args.save:
+		save_baselines(timings, args.baselines)
+		print("Baselines saved to", args.baselines)
+	if failures:
+		print("\n{} failure(s): {}".format(len(failures), ", ".join(failures)))
+		return 1
+	return 0
+
+
+if __name__ == "__main__":
+	sys.exit(main())
@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+# Run Benchmarks
+#
+# Time the Python hot paths on synthetic data and compare them against stored baselines.
+# No OpenMC transport or OpenMOC solves are run.
+#
+# Usage:
+#     python benchmarks/run_benchmarks.py                # run and compare
+#     python benchmarks/run_benchmarks.py --save         # run and store new baselines
+#     python benchmarks/run_benchmarks.py --only project_array --scales 380
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+from collections import OrderedDict
+import numpy as np
+
+_ROOT = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+sys.path.insert(0, _ROOT)
+sys.path.insert(0, os.path.dirname(os.path.realpath(__file__)))
+
+import openmc
+import synthetic
+from treat import moc
+from treat.moc import constants
+from treat.moc.plotting import project_array, load_results
+from treat.moc.cmm import CumulativeMigrationCorrection
+from treat.moc.correction_operator import CorrectionOperator
+from treat.moc.superhomogeneisation import SuperhomogeneisationFactors
+from treat.mesh import MeshGroup
+from treat.elements.geometry import Layer, Manager
+from treat.materials import MaterialLib, TreatMaterial
+
+SCALES = (3, 19, 380)
+NGROUPS = 25
+BASELINES = os.path.join(os.path.dirname(os.path.realpath(__file__)), "baselines.json")
+BENCHMARKS = OrderedDict()
+
+
+def benchmark(name):
+	"""Register a benchmark
+
+	The decorated function takes (scale, workdir), does any setup,
+	and returns the zero-argument callable to time.
+	"""
+	def register(setup):
+		BENCHMARKS[name] = setup
+		return setup
+	return register
+
+
+@benchmark("core_lattice")
+def bench_core_lattice(n, workdir):
+	"""Core.get_moc_lattice MGXS population, with CMM and SPH on every Element"""
+	lattice, ids_fname = synthetic.make_lattice(n, directory=workdir)
+	uids = list(lattice.get_unique_universes().keys())
+	xslib = synthetic.SyntheticLibrary(uids, NGROUPS)
+	ids_to_keys = {u.id: u.name.title() for u in lattice.get_unique_universes().values()}
+	elements = {}
+	for key in ids_to_keys.values():
+		elem = moc.Element2D(key)
+		elem.cmm[NGROUPS] = CumulativeMigrationCorrection(NGROUPS, np.linspace(0.9, 1.1, NGROUPS))
+		elem.sph[NGROUPS] = SuperhomogeneisationFactors(NGROUPS, np.linspace(0.95, 1.05, NGROUPS))
+		elements[key] = elem
+
+	def run():
+		core = moc.Core(lattice, xslib, "universe", use_cmm=True, use_sph=True,
+		                elements=elements, ids_fname=ids_fname)
+		core.get_moc_lattice()
+	return run
+
+
+@benchmark("project_array")
+def bench_project_array(n, workdir):
+	"""Project an (n, n, 70) array onto a mesh 20 times coarser"""
+	fine = synthetic.make_mesh_arrays(n, 70)
+	coarse = np.zeros((max(n//20, 1),)*2)
+	return lambda: project_array(fine, coarse)
+
+
+@benchmark("cmm_sph")
+def bench_cmm_sph(n, workdir):
+	"""CMM and SPH corrections of the MGXS of n*n domains, with the CorrectionOperator"""
+	xslib = synthetic.SyntheticLibrary(range(64), NGROUPS)
+	xs_arrays = moc.MgxsArrays(xslib, domain_ids=range(64))
+	rows = xs_arrays.get_rows([d % 64 for d in range(n*n)])
+	elem = moc.Element2D("synthetic")
+	elem.cmm[NGROUPS] = CumulativeMigrationCorrection(NGROUPS, np.linspace(0.9, 1.1, NGROUPS))
+	elem.sph[NGROUPS] = SuperhomogeneisationFactors(NGROUPS, np.linspace(0.95, 1.05, NGROUPS))
+	elements = [elem]*(n*n)
+
+	def run():
+		operator = CorrectionOperator(NGROUPS, elements, use_cmm=True, use_sph=True)
+		operator.apply_to_arrays(xs_arrays, rows)
+	return run
+
+
+@benchmark("mesh_group_power")
+def bench_mesh_group_power(n, workdir):
+	"""MeshGroup axial and radial power extraction from a statepoint"""
+	group = MeshGroup(constants.PITCH, n, n, lower_left=(0.0, 0.0, 0.0))
+	group.nzs = np.array([1, 4, 2])
+	group.dzs = np.array([3.0, 10.0, 5.0])
+	group.build_group()
+	fname = os.path.join(workdir, "statepoint.synthetic.h5")
+	synthetic.write_statepoint(fname, n, n, group.nzs)
+
+	def run():
+		group.get_axial_power(fname)
+		group.get_radial_power_by_tally(fname, tally_id=2)
+	return run
+
+
+@benchmark("load_results")
+def bench_load_results(n, workdir):
+	"""plotting.load_results of one group, all groups, and the integrated rates"""
+	mesh_shape = synthetic.write_results_tree(workdir, n, NGROUPS)
+
+	def run():
+		for g in (1, -1, 0):
+			load_results(workdir, True, NGROUPS, mesh_shape, "fsr", "fission", g)
+	return run
+
+
+@benchmark("layer_geometry")
+def bench_layer_geometry(n, workdir):
+	"""Layer/Manager construction of n four-ring elements"""
+	mats = [openmc.Material(name="synthetic layer {}".format(k)) for k in range(4)]
+
+	def run():
+		manager = Manager()
+		for _ in range(n):
+			ring0 = manager.get_circle(r0=1.0, innermost=True)
+			ring0.fill = mats[0]
+			layer = Layer(manager, None, ring0, mats[3])
+			layer.add_ring(mats[1], "circle", thick=0.5)
+			layer.add_ring(mats[2], "octagon", r=2.0, d=2.5)
+			layer.add_ring(mats[1], "octagon", thick=0.1)
+			layer.finalize()
+	return run
+
+
+@benchmark("material_lookup")
+def bench_material_lookup(n, workdir):
+	"""MaterialLib lookup, n*n times"""
+	lib = MaterialLib()
+	keys = []
+	for k in range(50):
+		key = "synthetic material {}".format(k)
+		lib.add_material(TreatMaterial(name=key, key=key))
+		keys.append(key)
+	lookups = [keys[i % len(keys)] for i in range(n*n)]
+
+	def run():
+		for key in lookups:
+			lib[key]
+	return run
+
+
+def time_benchmark(func, repeat):
+	"""Get the fastest of `repeat` calls, in seconds"""
+	best = np.inf
+	for _ in range(repeat):
+		t0 = time.perf_counter()
+		func()
+		best = min(best, time.perf_counter() - t0)
+	return best
+
+
+def load_baselines(fname=BASELINES):
+	if not os.path.isfile(fname):
+		return {}
+	with open(fname, 'r') as f:
+		return json.load(f)
+
+
+def save_baselines(timings, fname=BASELINES):
+	baselines = load_baselines(fname)
+	baselines.update(timings)
+	with open(fname, 'w') as f:
+		json.dump(baselines, f, indent=1, sort_keys=True)
+
+
+def run_benchmarks(names=None, scales=SCALES, repeat=3):
+	"""Run the benchmarks
+
+	Parameters:
+	-----------
+	names:          iterable of str, optional; benchmarks to run
+	                [Default: None --> all of them]
+	scales:         iterable of int, optional; mesh sizes to run them at
+	                [Default: SCALES]
+	repeat:         int, optional; number of times to time each one (the fastest counts)
+	                [Default: 3]
+
+	Returns:
+	--------
+	OrderedDict of {"name@scale": seconds}
+	"""
+	if names is None:
+		names = BENCHMARKS.keys()
+	timings = OrderedDict()
+	for name in names:
+		for n in scales:
+			with tempfile.TemporaryDirectory() as workdir:
+				func = BENCHMARKS[name](n, workdir)
+				timings["{}@{}".format(name, n)] = time_benchmark(func, repeat)
+	return timings
+
+
+def compare(timings, baselines, tolerance):
+	"""Print the timings against the baselines, and return the names of any regressions"""
+	regressions = []
+	print("{:28s} {:>12s} {:>12s} {:>8s}".format("Benchmark", "Time (s)", "Baseline (s)", "Ratio"))
+	for key, seconds in timings.items():
+		base = baselines.get(key)
+		if base is None:
+			print("{:28s} {:12.4f} {:>12s} {:>8s}".format(key, seconds, "-", "-"))
+			continue
+		ratio = seconds/base
+		flag = ""
+		if ratio > tolerance:
+			flag = "  REGRESSION"
+			regressions.append(key)
+		print("{:28s} {:12.4f} {:12.4f} {:8.2f}{}".format(key, seconds, base, ratio, flag))
+	return regressions
+
+
+def main(argv=None):
+	parser = argparse.ArgumentParser(
+		description="Time the Python hot paths on synthetic data.")
+	parser.add_argument("--only", nargs="+", choices=list(BENCHMARKS.keys()),
+	                    help="benchmarks to run [Default: all]")
+	parser.add_argument("--scales", nargs="+", type=int, default=SCALES,
+	                    help="mesh sizes to run at [Default: {}]".format(SCALES))
+	parser.add_argument("--repeat", type=int, default=3,
+	                    help="number of timings of each benchmark; the fastest counts")
+	parser.add_argument("--tolerance", type=float, default=1.5,
+	                    help="slowdown (time/baseline) that counts as a regression")
+	parser.add_argument("--baselines", default=BASELINES,
+	                    help="JSON file of baseline timings")
+	parser.add_argument("--save", action="store_true",
+	                    help="store these timings as the new baselines")
+	args = parser.parse_args(argv)
+	timings = run_benchmarks(args.only, args.scales, args.repeat)
+	regressions = compare(timings, load_baselines(args.baselines), args.tolerance)
+	if args.save:
+		save_baselines(timings, args.baselines)
+		print("Baselines saved to", args.baselines)
+	if regressions:
+		print("\n{} regression(s): {}".format(len(regressions), ", ".join(regressions)))
+		return 1
+	return 0
+
+
+if __name__ == "__main__":
+	sys.exit(main())
@@ -0,0 +1,174 @@
+# Synthetic
+#
+# Synthetic inputs for the benchmarks: no OpenMC transport or OpenMOC solves needed
+
+import os
+import pickle
+import h5py
+import numpy as np
+import openmc
+from treat.moc import constants
+from treat.moc.results import ResultsFile
+
+REACTIONS = ("flux", "fission", "nu-fission")
+
+
+class _Domain:
+	def __init__(self, domain_id):
+		self.id = domain_id
+
+
+class _EnergyGroups:
+	def __init__(self, ngroups):
+		self.num_groups = ngroups
+
+
+class _Mgxs:
+	def __init__(self, xs):
+		self._xs = xs
+
+	def get_xs(self):
+		return self._xs
+
+
+class SyntheticLibrary:
+	"""Stand-in for an openmc.mgxs.Library with random, physical-looking MGXS
+
+	Only the parts used by MgxsArrays and Core are provided. There are no
+	tallies, so MgxsArrays extracts the MGXS domain by domain.
+
+	Parameters:
+	-----------
+	domain_ids:     iterable of int; IDs of the domains
+	ngroups:        int; number of energy groups
+	seed:           int, optional; random seed
+	                [Default: 0]
+	"""
+	def __init__(self, domain_ids, ngroups, seed=0):
+		rng = np.random.RandomState(seed)
+		self.domain_type = "universe"
+		self.energy_groups = _EnergyGroups(ngroups)
+		self.domains = [_Domain(d) for d in domain_ids]
+		self._xs = {}
+		for d in domain_ids:
+			transport = rng.uniform(0.2, 1.0, ngroups)
+			scatter = np.triu(rng.uniform(0, 1, (ngroups, ngroups)))
+			scatter *= 0.9*transport[:, None]/scatter.sum(axis=1)[:, None]
+			fission = rng.uniform(0, 0.05, ngroups)
+			chi = np.zeros(ngroups)
+			chi[:min(3, ngroups)] = 1
+			chi /= chi.sum()
+			self._xs[d] = {"nu-transport": transport,
+			               "consistent nu-scatter matrix": scatter,
+			               "fission": fission,
+			               "nu-fission": 2.4*fission,
+			               "chi": chi}
+
+	def get_mgxs(self, domain_id, rxn):
+		return _Mgxs(self._xs[domain_id][rxn])
+
+
+def make_lattice(n, nkinds=4, directory="."):
+	"""Build an n x n openmc.RectLattice of homogeneous universes
+
+	Also writes the ids_to_keys pickle that Core expects into `directory`.
+
+	Parameters:
+	-----------
+	n:              int; number of lattice positions along each axis
+	nkinds:         int, optional; number of distinct universes
+	                [Default: 4]
+	directory:      str, optional; where to write the pickle
+	                [Default: "."]
+
+	Returns:
+	--------
+	lattice:        openmc.RectLattice
+	ids_fname:      str; path to the ids_to_keys pickle
+	"""
+	universes = []
+	ids_to_keys = {}
+	for k in range(nkinds):
+		material = openmc.Material(name="synthetic {}".format(k))
+		cell = openmc.Cell(name="synthetic cell {}".format(k), fill=material)
+		universe = openmc.Universe(name="synthetic {}".format(k), cells=[cell])
+		universes.append(universe)
+		ids_to_keys[universe.id] = "Synthetic {}".format(k)
+	lattice = openmc.RectLattice(name="synthetic lattice")
+	lattice.pitch = (constants.PITCH, constants.PITCH)
+	lattice.lower_left = (-n*constants.HPITCH, -n*constants.HPITCH)
+	kinds = np.arange(n*n).reshape(n, n) % nkinds
+	lattice.universes = [[universes[k] for k in row] for row in kinds]
+	ids_fname = os.path.join(directory, constants.IDS_PICKLE)
+	with open(ids_fname, 'wb') as f:
+		pickle.dump(ids_to_keys, f)
+	return lattice, ids_fname
+
+
+def make_mesh_arrays(n, ngroups, seed=0):
+	"""Make a random (n, n, ngroups) array of reaction rates with a NaN border"""
+	rng = np.random.RandomState(seed)
+	rates = rng.uniform(0.5, 1.5, (n, n, ngroups))
+	if n > 2:
+		rates[0, :] = np.NaN
+	return rates
+
+
+def write_statepoint(fname, nx, ny, nzs, seed=0):
+	"""Write a statepoint-shaped HDF5 file with one fission mesh tally per MeshGroup mesh
+
+	Tally and filter IDs start at 1, like `MeshGroup(id0=1)`.
+
+	Parameters:
+	-----------
+	fname:          str; path to the file to write
+	nx, ny:         int; mesh cells across
+	nzs:            iterable of int; axial cells in each mesh
+	seed:           int, optional; random seed
+	                [Default: 0]
+	"""
+	rng = np.random.RandomState(seed)
+	nreal = 100
+	with h5py.File(fname, 'w') as f:
+		f.create_dataset("k_combined", data=np.array([1.0, 1E-4]))
+		f.create_dataset("n_realizations", data=nreal)
+		tallies = f.create_group("tallies")
+		ids = np.arange(1, len(nzs) + 1)
+		tallies.attrs["ids"] = ids
+		filters = tallies.create_group("filters")
+		for tid, nz in zip(ids, nzs):
+			nbins = nx*ny*nz
+			filt = filters.create_group("filter {}".format(tid))
+			filt.create_dataset("type", data=np.string_("mesh"))
+			filt.create_dataset("n_bins", data=nbins)
+			filt.create_dataset("bins", data=np.array([tid]))
+			tally = tallies.create_group("tally {}".format(tid))
+			tally.create_dataset("name", data=np.string_("mesh {}".format(tid)))
+			tally.create_dataset("n_realizations", data=nreal)
+			tally.create_dataset("filters", data=np.array([tid]))
+			tally.create_dataset("nuclides", data=np.array([b"total"]))
+			tally.create_dataset("score_bins", data=np.array([b"fission"]))
+			sums = rng.uniform(0.5, 1.5, (nbins, 1))*nreal
+			results = np.stack([sums, sums**2/nreal*1.01], axis=-1)
+			tally.create_dataset("results", data=results)
+
+
+def write_results_tree(root, n, ngroups, solver="fsr", seed=0):
+	"""Write a results directory that `plotting.load_results()` can read
+
+	Returns:
+	--------
+	mesh_shape:     tuple of (n, n)
+	"""
+	mesh_shape = (n, n)
+	mesh_name = "{0}x{0}".format(n)
+	path = os.path.join(root, "homogeneous", "{}groups".format(ngroups),
+	                    "cmfd{}-{}".format(mesh_name, solver))
+	os.makedirs(path, exist_ok=True)
+	rng = np.random.RandomState(seed)
+	shape = (len(REACTIONS), ngroups, n, n)
+	with ResultsFile(os.path.join(path, constants.RESULTS_FILE), 'w') as results_file:
+		for code in ("moc", "montecarlo"):
+			results_file.write_fission_rates(code, mesh_name, rng.uniform(0.5, 1.5, mesh_shape))
+			results_file.write_rates(code, mesh_name, list(REACTIONS), rng.uniform(0.5, 1.5, shape))
+	return mesh_shape
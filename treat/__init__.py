@@ -1,8 +1,28 @@
+# TREAT
+#
+# Subpackages which need OpenMC, OpenMOC, or matplotlib are only imported
+# when first used, so that scripts (and `--help`) start quickly.
+
+import importlib
+
 from . import constants
 from . import argparse
-from . import elements
-from . import materials
-from . import mesh
-from . import moc
-from .treat_lattice import TreatLattice
-from .core_builder import CoreBuilder
+
+_LAZY_MODULES = ("elements", "materials", "mesh", "moc")
+_LAZY_ATTRIBUTES = {"TreatLattice": ".treat_lattice",
+                    "CoreBuilder": ".core_builder"}
+
+
+def __getattr__(name):
+	if name in _LAZY_MODULES:
+		return importlib.import_module("." + name, __name__)
+	if name in _LAZY_ATTRIBUTES:
+		module = importlib.import_module(_LAZY_ATTRIBUTES[name], __name__)
+		value = getattr(module, name)
+		globals()[name] = value
+		return value
+	raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
+
+
+def __dir__():
+	return sorted(set(globals()) | set(_LAZY_MODULES) | set(_LAZY_ATTRIBUTES))
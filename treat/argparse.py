@@ -3,7 +3,7 @@
 # Parse command line arguments
 
 import sys
-from .moc.standard import NAZIM, DAZIM
+from .moc.constants import NAZIM, DAZIM
 
 
 _OPTS = ("--cmfdmesh", "--fuelmesh", "--reflmesh", "--crdmesh",
@@ -19,3 +19,8 @@ DEFAULT_DIVISIONS = (1, 2, 4, 5)
 # File names
 IDS_PICKLE = "ids_to_keys.pkl"
 SPH_ARRAY = "sph_results.txt"
+WARM_START_FILE = "fluxes.h5"
+CACHE_RECORD = "run_cache.json"
+RESULTS_FILE = "results.h5"
+TIMINGS_FILE = "timings.json"
+MGXS_FILE = "mgxs.h5"
@@ -27,6 +27,9 @@ class CoreBuilder:
 	lattice:        treat.TreatLattice; will be set up by self._populate_core_lattice()
 	bc:             list of str in {"reflective", "vacuum", "periodic"}, length=4;
 	                boundary conditions in the order (e, w, n, s)
+	symmetry:       int or "auto"; 1 for the full core, 2 for the east half, 4 for the
+	                northeast quarter, or "auto" to detect it from the lattice.
+	                [Default: 1]
 	
 	"""
 	def __init__(self, material_lib, n, name=""):
@@ -35,6 +38,7 @@ class CoreBuilder:
 		self.lattice = TreatLattice(n, material_lib, name)
 		self.axially_finite = False
 		self.bc = DEFAULT_BC
+		self.symmetry = 1
 		# TODO: Remove _lattice_is_populated OR _populate_core_lattice()
 		self._lattice_is_populated = False
 		self._populate_core_lattice()
@@ -51,6 +55,12 @@ class CoreBuilder:
 	def get_core_geometry(self):
 		if not self._lattice_is_populated:
 			raise ValueError("You must set the core lattice universes first!")
-		return self.lattice.get_openmc_geometry(self.bc, self.axially_finite)
+		return self.lattice.get_openmc_geometry(self.bc, self.axially_finite, self.symmetry)
+	
+	def get_symmetry(self):
+		"""Get the symmetry of the core geometry, detecting it from the lattice if "auto"."""
+		if self.symmetry == "auto":
+			return self.lattice.get_symmetry()
+		return self.symmetry
 		
 		
\ No newline at end of file
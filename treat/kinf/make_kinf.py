@@ -1,12 +1,19 @@
 # Make kinf
 #
 # Analyze the fuel materials from different libraries
+#
+# k-inf and the absorption by nuclide are found deterministically, from the
+# microscopic MGXS and spectrum of an infinite medium of fuel cached by
+# ../moc/kinf/make_kinf.py, instead of with one OpenMC run per library.
 
 import numpy as np
-import openmc
 import os
 import sys; sys.path.append("..")
 import materials
+from moc.infinite_medium import InfiniteMediumXS
+
+LIBRARIES = ("Serpent", "NRL", "BATMAN")
+CACHE_FILE = "../moc/kinf/BATMAN/infinite_medium_11.h5"
 
 
 def _get_fuel(library):
@@ -16,88 +23,78 @@ def _get_fuel(library):
 		fuel = library.get_material("fuel 7.6 ppm")
 	return fuel
 
-def get_geometry(fuel):
-	root_cell = openmc.Cell(name="root cell")
-	root_cell.fill = fuel
-	w = openmc.XPlane(x0=-10, boundary_type="periodic")
-	e = openmc.XPlane(x0=+10, boundary_type="periodic")
-	s = openmc.YPlane(y0=-10, boundary_type="periodic")
-	n = openmc.YPlane(y0=+10, boundary_type="periodic")
-	b = openmc.ZPlane(z0=-10, boundary_type="periodic")
-	t = openmc.ZPlane(z0=+10, boundary_type="periodic")
-	root_cell.region = +w & -e & +s & -n & +b & -t
-	root_universe = openmc.Universe(0, "root universe", [root_cell])
-	g = openmc.Geometry()
-	g.root_universe = root_universe
-	return g
-
-def get_materials(library):
-	openmc_mats = library.toOpenmcMaterials()
-	return openmc_mats
-
-def get_settings():
-	s = openmc.Settings()
-	s.particles = int(1E6)
-	s.batches = 100
-	s.inactive = 25
-	return s
-
-def get_tallies(fuel):
-	tallies = openmc.Tallies()
-	tal1 = openmc.Tally()
-	tal1.scores = ["absorption"]
-	nucs = list(np.array(fuel.nuclides)[:,0])
-	tal1.nuclides = nucs
-	tallies.extend([tal1])
-	return tallies
-	
 
-def export_to_xml(export_path, s, g, m, t=None):
-	assert isinstance(s, openmc.Settings)
-	assert isinstance(g, openmc.Geometry)
-	assert isinstance(m, openmc.Materials)
-	if t is not None:
-		assert isinstance(t, openmc.Tallies)
-		t.export_to_xml(export_path + "/tallies.xml")
-	
-	s.export_to_xml(export_path + "/settings.xml")
-	g.export_to_xml(export_path + "/geometry.xml")
-	m.export_to_xml(export_path + "/materials.xml")
+def get_atom_densities(lib):
+	"""Get the nuclide atom densities of a library's fuel
 
-def build_model(lib):
-	matlib = materials.get_library(lib)
-	if not os.path.isdir(lib):
-		# Standard PermissionError is exactly what we want
-		os.mkdir(lib)
-	print("Exporting to:", lib)
-	fuel = _get_fuel(matlib)
-	
+	Returns:
+	--------
+	OrderedDict of {nuclide name: atom/b-cm}
+	"""
+	fuel = _get_fuel(materials.get_library(lib))
 	# replace natural elements to nuclides
-	# Note: I think this can be done with "fuel.get_nuclide_densities()"
 	all_elements = fuel.elements[:]
 	for el in all_elements:
 		elem, etype, efrac = el[0:3]
 		for nuc, nfrac, ntype in elem.expand(etype, efrac):
 			fuel.add_nuclide(nuc, nfrac, ntype)
 		fuel.remove_element(elem)
-	
-	mats = get_materials(matlib)
-	sets = get_settings()
-	geom = get_geometry(fuel)
-	tals = get_tallies(fuel)
+	atom_densities = fuel.get_nuclide_atom_densities()
+	for nuc, value in atom_densities.items():
+		# Older versions of OpenMC return (Nuclide, density) pairs
+		if isinstance(value, tuple):
+			atom_densities[nuc] = value[1]
+	return atom_densities
 
-	export_to_xml(lib, sets, geom, mats, tals)
-	
-	# Extract the nuclide number densities
-	fuel_atoms = fuel.get_nuclide_atom_densities()
-	nuclide_results = np.array(list(fuel_atoms.values()))
-	nuclides = np.array([n.name for n in nuclide_results[:, 0]])
+
+def export_results(lib, xs, atom_densities, kinf, absorption):
+	if not os.path.isdir(lib):
+		# Standard PermissionError is exactly what we want
+		os.mkdir(lib)
+	print("Exporting to:", lib)
+	nuclides = np.array(list(atom_densities.keys()))
 	np.savetxt(lib + "/nuclides.txt", nuclides, fmt='%s')
-	atom_dens = nuclide_results[:, 1]
+	atom_dens = np.array(list(atom_densities.values()))
 	np.savetxt(lib + "/atom_dens.txt", atom_dens)
 	atom_frac = atom_dens / atom_dens.sum()
 	np.savetxt(lib + "/atom_frac.txt", atom_frac)
+	# Only the cached nuclides have absorption fractions
+	cached = [nuc for nuc in nuclides if nuc in xs.nuclides]
+	rows = [xs.nuclides.index(nuc) for nuc in cached]
+	np.savetxt(lib + "/absorption_nuclides.txt", np.array(cached), fmt='%s')
+	np.savetxt(lib + "/absorption_frac.txt", absorption[rows])
+	np.savetxt(lib + "/kinf.txt", [kinf])
+
+
+def compare_libraries(libraries=LIBRARIES, cache_file=CACHE_FILE):
+	"""Find k-inf of the fuel of every library, in one batch
+
+	Returns:
+	--------
+	kinfs:          array of floats; k-inf of each library's fuel
+	absorption:     array of floats, shape (nlibs, nnuclides); absorption fractions
+	                of the cached nuclides in each library's fuel
 	
+	Nuclides of a library's fuel that are not in the cache (e.g., O17, when
+	the reference fuel only has O16) are left out, and reported.
+	"""
+	xs = InfiniteMediumXS.from_hdf5(cache_file)
+	all_densities = [get_atom_densities(lib) for lib in libraries]
+	for lib, d in zip(libraries, all_densities):
+		missing = [nuc for nuc in d if nuc not in xs.nuclides]
+		if missing:
+			print("{}: no cached MGXS for {}; they are left out.".format(lib, ", ".join(missing)))
+	densities = np.array([xs.get_densities(d, strict=False) for d in all_densities])
+	kinfs, _, absorption = xs.solve(densities)
+	print("{:10s} {:>8s}".format("Library", "k-inf") +
+	      "".join("{:>10s}".format(nuc) for nuc in xs.nuclides))
+	for lib, k, fracs in zip(libraries, kinfs, absorption):
+		print("{:10s} {:8.5f}".format(lib, k) +
+		      "".join("{:10.3E}".format(f) for f in fracs))
+	for lib, d, k, fracs in zip(libraries, all_densities, kinfs, absorption):
+		export_results(lib, xs, d, k, fracs)
+	return kinfs, absorption
+
 
 if __name__ == "__main__":
-	build_model("Serpent")
+	compare_libraries()
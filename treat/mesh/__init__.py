@@ -1,4 +1,5 @@
 from .meshes import *
 from .tallies import build_tallies
+from .tally_reader import TallyReader
 from . import cuts
 from . import plot
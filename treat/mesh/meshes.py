@@ -4,6 +4,7 @@
 
 import openmc
 import numpy as np
+from .tally_reader import open_reader
 
 _len_err_str = "The length of `nzs` must match the length of `dzs`."
 
@@ -181,7 +182,8 @@ class MeshGroup(object):
 
     Parameters:
     -----------
-    state:      openmc.StatePoint with this Mesh_Group's tally results
+    state:      openmc.StatePoint, TallyReader, or str path to the statepoint
+                with this Mesh_Group's tally results
     eps:        tolerance for a tally to be considered 0 or NaN
                 [Default: 0]
 
@@ -191,20 +193,21 @@ class MeshGroup(object):
     zlist:      array of z-values (height), in cm
     """
     self.__assert_nzs_dzs()
-    zlist = np.zeros(sum(self.nzs))
-    xlist = np.zeros(sum(self.nzs))
-    z = 0
-    k = 0
-    for i in range(self.n):
-      nz = self._nzs[i]
-      dz = self._dzs[i]
-      talvalsi = state.get_tally(id=i + 1).get_values()
-      talvalsi.shape = (self._nx, self._ny, nz)
-      for j in range(nz):
-        z += dz
-        zlist[k] = z
-        xlist[k] = talvalsi[:, :, j].sum()/dz
-        k += 1
+    with open_reader(state) as state:
+      zlist = np.zeros(sum(self.nzs))
+      xlist = np.zeros(sum(self.nzs))
+      z = 0
+      k = 0
+      for i in range(self.n):
+        nz = self._nzs[i]
+        dz = self._dzs[i]
+        talvalsi = state.get_tally(id=i + 1).get_values()
+        talvalsi.shape = (self._nx, self._ny, nz)
+        for j in range(nz):
+          z += dz
+          zlist[k] = z
+          xlist[k] = talvalsi[:, :, j].sum()/dz
+          k += 1
 
     xlist[xlist <= eps] = np.NaN
     xlist /= np.nanmean(xlist)
@@ -215,7 +218,8 @@ class MeshGroup(object):
 
     Parameters:
     -----------
-    state:          openmc.StatePoint with this Mesh_Group's tally results
+    state:          openmc.StatePoint, TallyReader, or str path to the statepoint
+                    with this Mesh_Group's tally results
     tally_id:       int; id of the desired openmc.Tally
     index:          int; index of the z-layer within the Tally's mesh.
                     If the index is None, the sum of all the Tally's
@@ -226,8 +230,8 @@ class MeshGroup(object):
     --------
     xyarray:        numpy.array of the radial power profile
     """
-    tally = state.tallies[tally_id]
-    talvals = tally.get_values()
+    with open_reader(state) as state:
+      talvals = state.tallies[tally_id].get_values()
     nz = len(talvals)//(self._nx*self._ny)
     talvals.shape = (nz, self._ny, self._nx)
     talvals = np.flip(talvals, 1)
@@ -293,7 +297,8 @@ class MeshGroup(object):
 
     Parameters
     ----------
-    state:          openmc.StatePoint with this Mesh_Group's tally results
+    state:          openmc.StatePoint, TallyReader, or str path to the statepoint
+                    with this Mesh_Group's tally results
     zval:           float; z-value (cm) to find the closest layer's relative power
                     If it is exactly on a cut, the lower level will be returned.
                     [Default: None]
@@ -314,46 +319,47 @@ class MeshGroup(object):
     xyarray:        numpy.array containing the
     """
     self.__assert_nzs_dzs()
-    if (zval is not None) and (index is None):
-      index = self.get_index_by_z(zval)
-
-    if index:
-      max_i = sum(self._nzs)
-      errstr = "Index {} out of {} does not exist".format(index, max_i)
-      assert index <= max_i, errstr
-
-    if tally_id:
-      if (index is None) and (not tally_total):
-        errstr = "An index is required for tally {}\
+    with open_reader(state) as state:
+      if (zval is not None) and (index is None):
+        index = self.get_index_by_z(zval)
+
+      if index:
+        max_i = sum(self._nzs)
+        errstr = "Index {} out of {} does not exist".format(index, max_i)
+        assert index <= max_i, errstr
+
+      if tally_id:
+        if (index is None) and (not tally_total):
+          errstr = "An index is required for tally {}\
 				 unless the total is desired".format(tally_id)
-        raise MeshError(errstr)
-      else:
-        xyarray = self.get_radial_power_by_tally(state, tally_id, index)
-    else:
-      if (zval is None) and (index is None):
-        if tally_total:
-          # The entire profile is requested!
-          for i in range(self.n):
-            xyarray = np.zeros((self._nx, self._ny))
-            xyarray += self.get_radial_power_by_tally(state, tally_id=self.id0 + i)
-        else:
-          errstr = "You have not specified a z-value, index, " \
-                   "or tally id to find the power at."
           raise MeshError(errstr)
+        else:
+          xyarray = self.get_radial_power_by_tally(state, tally_id, index)
       else:
-        tid = self.get_tally_id_by_index(index)
-        tally = state.tallies[tid]
-        for i in range(self.n):
-          if sum(self.nzs[:i + 1]) >= index:
-            break
-        if i:
-          tally_index = index - sum(self.nzs[:i + 1])
+        if (zval is None) and (index is None):
+          if tally_total:
+            # The entire profile is requested!
+            for i in range(self.n):
+              xyarray = np.zeros((self._nx, self._ny))
+              xyarray += self.get_radial_power_by_tally(state, tally_id=self.id0 + i)
+          else:
+            errstr = "You have not specified a z-value, index, " \
+                     "or tally id to find the power at."
+            raise MeshError(errstr)
         else:
-          tally_index = index
-        talvals = tally.get_values()
-        nz = len(talvals)//(self._nx*self._ny)
-        talvals.shape = (self._nx, self._ny, nz)
-        xyarray = talvals[:, :, tally_index]
+          tid = self.get_tally_id_by_index(index)
+          tally = state.tallies[tid]
+          for i in range(self.n):
+            if sum(self.nzs[:i + 1]) >= index:
+              break
+          if i:
+            tally_index = index - sum(self.nzs[:i + 1])
+          else:
+            tally_index = index
+          talvals = tally.get_values()
+          nz = len(talvals)//(self._nx*self._ny)
+          talvals.shape = (self._nx, self._ny, nz)
+          xyarray = talvals[:, :, tally_index]
 
     # Replace things below the tolerance with NaNs before normalizing
     xyarray[xyarray <= eps] = np.NaN
@@ -0,0 +1,272 @@
+# Tally Reader
+#
+# Lightweight reader for the tally results in an OpenMC statepoint
+
+from contextlib import contextmanager
+import h5py
+import numpy as np
+
+_VALUES = ("mean", "std_dev", "rel_err", "sum", "sum_sq")
+
+
+def _read_strings(group, key):
+  """Read a dataset (or attribute) of byte strings as a list of str"""
+  if key in group:
+    raw = group[key][()]
+  else:
+    raw = group.attrs[key]
+  return [r.decode() if isinstance(r, bytes) else str(r) for r in np.atleast_1d(raw)]
+
+
+def _read_scalar(group, key, default=None):
+  """Read a scalar dataset or attribute"""
+  if key in group:
+    value = group[key][()]
+  elif key in group.attrs:
+    value = group.attrs[key]
+  else:
+    return default
+  if isinstance(value, bytes):
+    return value.decode()
+  if isinstance(value, np.ndarray) and value.size == 1:
+    return value.item()
+  return value
+
+
+class ReaderTally(object):
+  """A single tally in a statepoint, read on demand
+
+  Mimics the parts of openmc.Tally used for post-processing:
+  `get_values()`, `mean`, and `std_dev`. Only the metadata is read
+  when the tally is found; results are read only when requested,
+  and only the requested scores and nuclides.
+
+  Parameters:
+  -----------
+  h5file:         h5py.File; the open statepoint
+  tally_id:       int; id of the tally
+  """
+
+  def __init__(self, h5file, tally_id):
+    self._file = h5file
+    self.id = tally_id
+    self._group = h5file["tallies/tally {}".format(tally_id)]
+    self.name = _read_scalar(self._group, "name", "")
+    self.scores = _read_strings(self._group, "score_bins" if "score_bins" in self._group
+                                else "scores")
+    self.nuclides = _read_strings(self._group, "nuclides")
+    filter_ids = _read_scalar(self._group, "filters")
+    if filter_ids is None:
+      filter_ids = []
+    self.filter_ids = [int(f) for f in np.atleast_1d(filter_ids)]
+    n = _read_scalar(self._group, "n_realizations")
+    if n is None:
+      n = _read_scalar(h5file, "n_realizations")
+    self.num_realizations = int(n)
+
+  def _get_filter_group(self, index):
+    return self._file["tallies/filters/filter {}".format(self.filter_ids[index])]
+
+  def get_filter_type(self, index):
+    """Get the type (e.g., 'mesh' or 'energy') of the filter at `index`"""
+    return _read_scalar(self._get_filter_group(index), "type")
+
+  def get_filter_bins(self, index):
+    """Get the bins (e.g., universe ids or energy edges) of the filter at `index`"""
+    return self._get_filter_group(index)["bins"][()]
+
+  @property
+  def filter_shape(self):
+    """tuple of ints; the number of bins in each filter"""
+    return tuple(int(_read_scalar(self._get_filter_group(i), "n_bins"))
+                 for i in range(len(self.filter_ids)))
+
+  @property
+  def mean(self):
+    return self.get_values(value="mean")
+
+  @property
+  def std_dev(self):
+    return self.get_values(value="std_dev")
+
+  def _get_columns(self, scores, nuclides):
+    """Get the result columns of the requested nuclides and scores"""
+    if scores is None:
+      scores = self.scores
+    if nuclides is None:
+      nuclides = self.nuclides
+    nscores = len(self.scores)
+    columns = []
+    for nuclide in nuclides:
+      for score in scores:
+        columns.append(self.nuclides.index(nuclide)*nscores + self.scores.index(score))
+    return np.array(columns), (len(nuclides), len(scores))
+
+  def get_values(self, scores=None, nuclides=None, value="mean", reshape=False):
+    """Get the results of (some of) the tally's scores and nuclides
+
+    Parameters:
+    -----------
+    scores:         list of str, optional; scores to read
+                    [Default: None --> all scores]
+    nuclides:       list of str, optional; nuclides to read
+                    [Default: None --> all nuclides]
+    value:          str, optional; one of "mean", "std_dev", "rel_err", "sum", "sum_sq"
+                    [Default: "mean"]
+    reshape:        bool, optional; whether to split the filter bins into one axis
+                    per filter. Otherwise, they are flattened, like openmc.Tally.
+                    [Default: False]
+
+    Returns:
+    --------
+    array of floats with shape (filter bins, nuclides, scores)
+    """
+    assert value in _VALUES, "`value` must be one of: {}".format(_VALUES)
+    columns, shape = self._get_columns(scores, nuclides)
+    results = self._group["results"]
+    # h5py only reads increasing, unique columns; put them back in order after.
+    unique, inverse = np.unique(columns, return_inverse=True)
+    need_sum = value != "sum_sq"
+    need_sum_sq = value in ("std_dev", "rel_err", "sum_sq")
+    if len(unique) == results.shape[1]:
+      column_slice = slice(None)
+    else:
+      column_slice = list(unique)
+    sum_ = sum_sq = None
+    if need_sum:
+      sum_ = results[:, column_slice, 0][:, inverse]
+    if need_sum_sq:
+      sum_sq = results[:, column_slice, 1][:, inverse]
+
+    n = self.num_realizations
+    if value == "sum":
+      values = sum_
+    elif value == "sum_sq":
+      values = sum_sq
+    else:
+      values = sum_/n
+      if value != "mean":
+        # std_dev = sqrt((sum_sq/n - mean^2)/(n - 1)), computed in place
+        mean = values
+        values = sum_sq/n
+        values -= np.square(mean)
+        values /= max(n - 1, 1)
+        np.sqrt(np.maximum(values, 0, out=values), out=values)
+        if value == "rel_err":
+          with np.errstate(divide="ignore", invalid="ignore"):
+            values /= mean
+    values = values.reshape((-1,) + shape)
+    if reshape:
+      values = values.reshape(self.filter_shape + shape)
+    return values
+
+
+class _TallyIndex(object):
+  """Dictionary-like access to the tallies by id, read on demand"""
+
+  def __init__(self, reader):
+    self._reader = reader
+
+  def __getitem__(self, tally_id):
+    return self._reader.get_tally(id=tally_id)
+
+  def __contains__(self, tally_id):
+    return tally_id in self._reader.tally_ids
+
+  def __iter__(self):
+    return iter(self._reader.tally_ids)
+
+  def __len__(self):
+    return len(self._reader.tally_ids)
+
+  def keys(self):
+    return list(self._reader.tally_ids)
+
+
+class TallyReader(object):
+  """Read tally results straight from an OpenMC statepoint with h5py
+
+  Unlike openmc.StatePoint, the summary is never loaded and no filter
+  objects are built. Tallies can be looked up by name or id, like
+  with a StatePoint, and their results are only read when requested.
+  This can be passed to `MeshGroup` methods in place of a StatePoint.
+
+  Parameters:
+  -----------
+  fname:          str; path to the statepoint file
+  """
+
+  def __init__(self, fname):
+    self.fname = fname
+    self._file = h5py.File(fname, "r")
+    self._tallies = {}
+    self._ids_by_name = None
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *args):
+    self.close()
+
+  def close(self):
+    self._file.close()
+
+  @property
+  def tally_ids(self):
+    group = self._file["tallies"]
+    ids = _read_scalar(group, "ids")
+    if ids is None:
+      return []
+    return [int(i) for i in np.atleast_1d(ids)]
+
+  @property
+  def tallies(self):
+    return _TallyIndex(self)
+
+  @property
+  def k_combined(self):
+    """tuple of (mean, std. dev.) of the combined estimate of keff"""
+    k = self._file["k_combined"][()]
+    return k[0], k[1]
+
+  def get_tally(self, name=None, id=None):
+    """Find a tally by its name or id
+
+    Parameters:
+    -----------
+    name:           str, optional; name of the tally
+    id:             int, optional; id of the tally
+
+    Returns:
+    --------
+    ReaderTally
+    """
+    if id is None:
+      assert name is not None, "You must provide a tally name or id."
+      if self._ids_by_name is None:
+        self._ids_by_name = {}
+        for tally_id in self.tally_ids:
+          group = self._file["tallies/tally {}".format(tally_id)]
+          self._ids_by_name[_read_scalar(group, "name", "")] = tally_id
+      if name not in self._ids_by_name:
+        raise LookupError("Unable to get tally: " + name)
+      id = self._ids_by_name[name]
+    elif id not in self.tally_ids:
+      raise LookupError("Unable to get tally: {}".format(id))
+    if id not in self._tallies:
+      self._tallies[id] = ReaderTally(self._file, id)
+    return self._tallies[id]
+
+
+@contextmanager
+def open_reader(state):
+  """Open a TallyReader for a statepoint file name, or pass through a reader or StatePoint
+
+  A reader opened here is closed at the end of the `with` block;
+  one that was passed in is left open.
+  """
+  if isinstance(state, str):
+    with TallyReader(state) as reader:
+      yield reader
+  else:
+    yield state
@@ -1,18 +1,60 @@
 # MOC
 #
 # Sub-module for TREAT method of characeteristics stuff
+#
+# Submodules and classes are imported when first used, so that
+# OpenMC, OpenMOC, and matplotlib are only loaded if needed.
+
+import importlib
 
 from . import constants
-from . import energy_groups
-from . import plotting
-from . import superhomogeneisation
-from . import cmm
-from .core import Core
-from .element import Element, Element2D, Element3D
-from .base_case import BaseCase
-from . import standard
-from .standard import StandardCase
-from .simulation import Simulation
-from .sph_iterator import SphIterator
-from .executor import Executor
-from .automator import Automator
+
+_LAZY_MODULES = ("energy_groups", "plotting", "condensation", "superhomogeneisation",
+                 "cmm", "standard", "backends", "pipeline", "profiling", "results",
+                 "run_cache", "symmetry", "diffusion",
+                 "infinite_medium", "mg_export",
+                 "correction_operator", "cmfd_config")
+_LAZY_ATTRIBUTES = {
+	"MgxsArrays": ".mgxs_arrays",
+	"Core": ".core",
+	"CmfdSettings": ".cmfd_config",
+	"CorrectionOperator": ".correction_operator",
+	"DiffusionSolver": ".diffusion",
+	"InfiniteMediumXS": ".infinite_medium",
+	"MultigroupExport": ".mg_export",
+	"WarmStart": ".warm_start",
+	"Element": ".element",
+	"Element2D": ".element",
+	"Element3D": ".element",
+	"BaseCase": ".base_case",
+	"StandardCase": ".standard",
+	"Simulation": ".simulation",
+	"Batch": ".batch",
+	"CaseSpec": ".batch",
+	"SphIterator": ".sph_iterator",
+	"AndersonMixer": ".sph_iterator",
+	"QsubBackend": ".backends",
+	"LocalBackend": ".backends",
+	"JobResult": ".backends",
+	"Executor": ".executor",
+	"Automator": ".automator",
+	"Pipeline": ".pipeline",
+	"Task": ".pipeline",
+	"CommandTask": ".pipeline",
+	"JobTask": ".pipeline",
+}
+
+
+def __getattr__(name):
+	if name in _LAZY_MODULES:
+		return importlib.import_module("." + name, __name__)
+	if name in _LAZY_ATTRIBUTES:
+		module = importlib.import_module(_LAZY_ATTRIBUTES[name], __name__)
+		value = getattr(module, name)
+		globals()[name] = value
+		return value
+	raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
+
+
+def __dir__():
+	return sorted(set(globals()) | set(_LAZY_MODULES) | set(_LAZY_ATTRIBUTES))
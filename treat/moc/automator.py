@@ -1,7 +1,7 @@
 
 import itertools
-from openmoc import checkvalue as cv
-from collections import Iterable, OrderedDict
+from collections import OrderedDict
+from collections.abc import Iterable
 from .executor import Executor
 
 
@@ -36,8 +36,10 @@ class Automator:
 		var:        str; name of the variable
 		values:     Iterable; all values. Must be of len() >= 2
 		"""
-		cv.check_type("values", values, Iterable)
-		cv.check_length("values", values, 2, 1000)
+		if not isinstance(values, Iterable):
+			raise TypeError("values of {} must be Iterable.".format(var))
+		if not 2 <= len(values) <= 1000:
+			raise ValueError("{} must have between 2 and 1000 values.".format(var))
 		if var in self._constants:
 			del self._constants[var]
 		# TODO: Verify value types. And that values is iterable.
@@ -73,27 +75,18 @@ class Automator:
 					return False
 		return True
 
-	def create_jobs(self, workdir, script_file, minutes, execute=False):
-		"""Create, and optionally execute, the job scripts
-		
-		The default run mode for `create_jobs(...)` is a dry run. Automator will write
-		the qsub scripts to disk if possible, but will not execute them.
-		Calling `create_jobs(..., execute=True)` will execute qsub.
-		
-		Parameters:
-		-----------
-		workdir:        str; directory the script_file is in
-		script_file:    str; Python script to call inside the qsub script
-		minutes:        int; number of minutes to request on the cluster
-		execute:        bool, optional; whether to execute the script after creating.
-		                [Default: False]
+	def get_cases(self):
+		"""Get every combination of the variables, with the constants
 		
+		Returns:
+		--------
+		OrderedDict of {case_name: dict of {variable: value}}
 		"""
 		if not self.is_ready():
 			missing = set(self.enforce) - self.all_available
 			errstr = "Some enforced variables are not set:\n{}".format(missing)
 			raise ValueError(errstr)
-		all_var_dicts = {}
+		all_var_dicts = OrderedDict()
 		keys = tuple(self._variables.keys())
 		n = len(keys)
 		combos = itertools.product(*(val for v, val in self._variables.items()))
@@ -106,18 +99,69 @@ class Automator:
 				vdict[var] = val
 				vkeys[i] = "{}{}".format(keys[i], ck[i])
 			vstr = "_".join(vkeys)
-			all_var_dicts[vstr] = vdict
-		
-		for case_name, var_dict in all_var_dicts.items():
 			case_vars = dict(self._constants)
-			case_vars.update(var_dict)
-			ex = Executor(script_file, minutes, case_vars["geneity"],
-			              case_vars["ngroups"], case_vars["divmesh"])
-			ex.job_name = case_name
-			ex.postsuffix = case_name
-			ex.load_template()
+			case_vars.update(vdict)
+			all_var_dicts[vstr] = case_vars
+		return all_var_dicts
+	
+	@staticmethod
+	def get_executor(case_name, case_vars, script_file, minutes, backend=None):
+		"""Create the Executor for one case, with its template loaded
+		
+		Parameters:
+		-----------
+		case_name:      str; name of the case, from `get_cases()`
+		case_vars:      dict; variables of the case, from `get_cases()`
+		script_file:    str; Python script to call inside the qsub script
+		minutes:        int; number of minutes to request on the cluster
+		backend:        QsubBackend or LocalBackend, optional; how to execute it
+		                [Default: None --> submit it with qsub]
+		
+		Returns:
+		--------
+		Executor
+		"""
+		ex = Executor(script_file, minutes, case_vars["geneity"],
+		              case_vars["ngroups"], case_vars["divmesh"], backend=backend)
+		if getattr(backend, "nproc", None):
+			ex.nproc = backend.nproc
+		ex.job_name = case_name
+		ex.postsuffix = case_name
+		ex.load_template()
+		return ex
+
+	def create_jobs(self, workdir, script_file, minutes, execute=False, backend=None):
+		"""Create, and optionally execute, the job scripts
+		
+		The default run mode for `create_jobs(...)` is a dry run. Automator will write
+		the qsub scripts to disk if possible, but will not execute them.
+		Calling `create_jobs(..., execute=True)` will execute qsub, or
+		run them with `backend` if one is given.
+		
+		Parameters:
+		-----------
+		workdir:        str; directory the script_file is in
+		script_file:    str; Python script to call inside the qsub script
+		minutes:        int; number of minutes to request on the cluster
+		execute:        bool, optional; whether to execute the script after creating.
+		                [Default: False]
+		backend:        QsubBackend or LocalBackend, optional; how to execute them.
+		                A LocalBackend runs the jobs within its thread budget,
+		                and this waits for all of them to finish.
+		                [Default: None --> submit them with qsub]
+		
+		Returns:
+		--------
+		list of JobResult if the jobs were run locally; otherwise, an empty list
+		"""
+		all_var_dicts = self.get_cases()
+		for case_name, case_vars in all_var_dicts.items():
+			ex = self.get_executor(case_name, case_vars, script_file, minutes, backend)
 			shell_script = "{}/run_{}.sh".format(workdir, case_name)
 			ex.write_script(shell_script, **case_vars)
 			if execute:
 				ex.execute_script(shell_script)
+		if execute and backend is not None:
+			return backend.wait()
+		return []
 
@@ -0,0 +1,250 @@
+# Backends
+#
+# Ways to execute the job scripts written by an Executor
+
+import os
+import re
+import time
+import threading
+import subprocess
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+
+# Threads per job on the cluster: one full TREAT node
+DEFAULT_NPROC = 36
+
+
+def parse_pbs_directives(script):
+	"""Read the resource requests from the #PBS lines of a job script
+
+	Parameter:
+	----------
+	script:         str; contents of the job script
+
+	Returns:
+	--------
+	dict with the keys (when present):
+		"walltime":     float; requested walltime, in seconds
+		"ncpus":        int; requested number of CPUs
+		"name":         str; job name
+	"""
+	directives = {}
+	for line in script.splitlines():
+		if not line.startswith("#PBS"):
+			continue
+		match = re.search(r"walltime=(?:(\d+) days?, )?(\d+):(\d+):(\d+)", line)
+		if match:
+			days, h, m, s = (int(x) if x else 0 for x in match.groups())
+			directives["walltime"] = float(((days*24 + h)*60 + m)*60 + s)
+		match = re.search(r"ncpus=(\d+)", line)
+		if match:
+			directives["ncpus"] = int(match.group(1))
+		match = re.search(r"-N\s+(\S+)", line)
+		if match:
+			directives["name"] = match.group(1)
+	return directives
+
+
+class JobResult:
+	"""Outcome of a job run by the LocalBackend
+
+	Attributes:
+	-----------
+	name:           str; job name
+	script:         str; path to the job script
+	returncode:     int; exit status of the script (None if it timed out)
+	stdout:         str; path to the file with the job's standard output
+	stderr:         str; path to the file with the job's standard error
+	walltime:       float; seconds the job took
+	"""
+	def __init__(self, name, script, returncode, stdout, stderr, walltime):
+		self.name = name
+		self.script = script
+		self.returncode = returncode
+		self.stdout = stdout
+		self.stderr = stderr
+		self.walltime = walltime
+
+	@property
+	def ok(self):
+		return self.returncode == 0
+
+	def __repr__(self):
+		if self.returncode is None:
+			status = "timed out"
+		else:
+			status = "exit {}".format(self.returncode)
+		return "JobResult({}: {} after {:.1f} s)".format(self.name, status, self.walltime)
+
+
+class QsubBackend:
+	"""Submit job scripts to a PBS queue with `qsub`"""
+	def get_nproc(self, nproc=None):
+		"""Get the number of threads a job should request
+
+		Parameter:
+		----------
+		nproc:          int, optional; threads requested for the job
+		                [Default: None --> DEFAULT_NPROC, a full node]
+		"""
+		if nproc is None:
+			return DEFAULT_NPROC
+		return nproc
+
+	def submit(self, script, job_name, nproc=None):
+		"""Call 'qsub' on the shell script.
+
+		Parameters:
+		-----------
+		script:         str; shell script to submit
+		job_name:       str; what to call the job in the queue
+		nproc:          int, optional; unused. The script requests its own CPUs.
+
+		Returns:
+		--------
+		subprocess.Popen of the qsub call
+		"""
+		argument = ['qsub', '-N', job_name, script]
+		print(" ".join(argument))
+		return subprocess.Popen(argument)
+
+	def wait(self):
+		"""Jobs run on the cluster, so there is nothing to wait for."""
+		return []
+
+
+class LocalBackend:
+	"""Run job scripts on this machine, in a bounded pool of processes
+
+	This stands in for PBS: the same job scripts are run with `sh`, with
+	the PBS_O_WORKDIR and PBS_O_PATH variables the scripts expect, and
+	their #PBS walltime is enforced. Standard output and error go to
+	"{job_name}.o" and "{job_name}.e" next to the script, as with `qsub -k eo`.
+	
+	Each job holds `nproc` threads of the budget while it runs, so at most
+	max_threads // nproc jobs run at once.
+
+	Parameters:
+	-----------
+	max_threads:    int, optional; total number of threads to use across all jobs.
+	                [Default: None --> the number of CPUs on this machine]
+	nproc:          int, optional; threads for each job (OMP_NUM_THREADS)
+	                [Default: None --> the job script's #PBS ncpus request, or 1]
+	workdir:        str, optional; directory to run the jobs in
+	                [Default: None --> the current directory]
+	"""
+	def __init__(self, max_threads=None, nproc=None, workdir=None):
+		if max_threads is None:
+			max_threads = os.cpu_count() or 1
+		self.max_threads = max_threads
+		self.nproc = nproc
+		self.workdir = workdir
+		self._jobs = []
+		self._pool = None
+		self._free_threads = max_threads
+		self._budget = threading.Condition()
+
+	def get_nproc(self, nproc=None):
+		"""Get the number of threads a job should request
+
+		Parameter:
+		----------
+		nproc:          int, optional; threads requested for the job
+		                [Default: None --> this backend's `nproc`, or as many as
+		                DEFAULT_NPROC that fit in `max_threads`]
+		"""
+		if nproc is None:
+			nproc = self.nproc
+		if nproc is None:
+			nproc = min(DEFAULT_NPROC, self.max_threads)
+		return nproc
+
+	def _get_pool(self):
+		if self._pool is None:
+			self._pool = ThreadPoolExecutor(max_workers=self.max_threads)
+		return self._pool
+
+	@contextmanager
+	def _reserve(self, nproc):
+		"""Hold `nproc` threads of the budget"""
+		with self._budget:
+			self._budget.wait_for(lambda: self._free_threads >= nproc)
+			self._free_threads -= nproc
+		try:
+			yield
+		finally:
+			with self._budget:
+				self._free_threads += nproc
+				self._budget.notify_all()
+
+	def _run(self, script, job_name, nproc, walltime):
+		workdir = self.workdir or os.getcwd()
+		env = dict(os.environ)
+		env.update(PBS_O_WORKDIR=workdir, PBS_O_PATH=env.get("PATH", ""),
+		           PBS_JOBNAME=job_name, OMP_NUM_THREADS=str(nproc))
+		prefix = os.path.join(os.path.dirname(os.path.abspath(script)), job_name)
+		stdout, stderr = prefix + ".o", prefix + ".e"
+		with self._reserve(nproc):
+			t0 = time.time()
+			with open(stdout, 'w') as out, open(stderr, 'w') as err:
+				try:
+					returncode = subprocess.call(["sh", script], cwd=workdir, env=env,
+					                             stdout=out, stderr=err, timeout=walltime)
+				except subprocess.TimeoutExpired:
+					err.write("\nJob exceeded its walltime.\n")
+					returncode = None
+			walltime = time.time() - t0
+		result = JobResult(job_name, script, returncode, stdout, stderr, walltime)
+		print(result)
+		return result
+
+	def submit(self, script, job_name, nproc=None):
+		"""Queue a job script to run as soon as the thread budget allows
+
+		Parameters:
+		-----------
+		script:         str; shell script to run
+		job_name:       str; name of the job, used for its output files
+		nproc:          int, optional; threads for this job
+		                [Default: None --> this backend's `nproc`]
+
+		Returns:
+		--------
+		concurrent.futures.Future of the JobResult
+		"""
+		with open(script, 'r') as f:
+			directives = parse_pbs_directives(f.read())
+		if nproc is None:
+			nproc = self.nproc
+		if nproc is None:
+			nproc = directives.get("ncpus", 1)
+		if nproc > self.max_threads:
+			errstr = "A job with {} threads does not fit in a budget of {} threads."
+			raise ValueError(errstr.format(nproc, self.max_threads))
+		print("Queued locally:", job_name)
+		future = self._get_pool().submit(self._run, script, job_name, nproc,
+		                                 directives.get("walltime"))
+		self._jobs.append(future)
+		return future
+
+	def shutdown(self):
+		"""Wait for the running jobs, then release the pool and forget the jobs"""
+		if self._pool is not None:
+			self._pool.shutdown()
+			self._pool = None
+		self._jobs = []
+
+	def wait(self):
+		"""Wait for every submitted job to finish
+
+		Returns:
+		--------
+		list of JobResult, in the order the jobs were submitted
+		"""
+		results = [future.result() for future in self._jobs]
+		self.shutdown()
+		failed = [r for r in results if not r.ok]
+		print("{} of {} jobs succeeded.".format(len(results) - len(failed), len(results)))
+		for r in failed:
+			print("\tFAILED:", r, "--> see", r.stderr)
+		return results
@@ -3,6 +3,7 @@
 # Container to facilitate the conversion of models from OpenMC to OpenMOC
 
 import openmc
+import openmc.stats
 from openmc import mgxs
 from openmc import openmoc_compatible
 import openmoc
@@ -10,11 +11,75 @@ import openmoc.plotter as moc_plt
 import openmoc.checkvalue as cv
 import numpy as np
 import os
+import copy
+import threading
+from collections.abc import MutableMapping
 from warnings import warn
 from . import energy_groups
 from . import constants
+from . import condensation
+from . import symmetry as symm
 from . import Core
+from .mgxs_arrays import MgxsArrays
+from .cmfd_config import CmfdSettings
+from . import cmfd_config
+from .diffusion import DiffusionSolver, get_boundary_conditions
+from .mg_export import MultigroupExport
 from .plotting import project_array
+from .warm_start import WarmStart
+from .run_cache import hash_file
+from .results import ResultsFile
+from .profiling import StageTimer
+from ..mesh.tally_reader import TallyReader
+
+
+class _LazyLibraries(MutableMapping):
+	"""Dictionary of MGXS Libraries, keyed by number of groups, that are loaded on demand
+	
+	A loader registered with `set_loader()` is only called the first time
+	its Library is accessed, even when several threads access it at once.
+	"""
+	def __init__(self):
+		self._libraries = {}
+		self._loaders = {}
+		self._lock = threading.RLock()
+	
+	def set_loader(self, key, loader):
+		"""Register a function (taking no arguments) which returns the Library for `key`"""
+		self._libraries.pop(key, None)
+		self._loaders[key] = loader
+	
+	def is_loaded(self, key):
+		return key in self._libraries
+	
+	def __getitem__(self, key):
+		with self._lock:
+			if key not in self._libraries:
+				if key not in self._loaders:
+					raise KeyError(key)
+				# Only forget the loader once it has succeeded, so it can be retried
+				self._libraries[key] = self._loaders[key]()
+				del self._loaders[key]
+			return self._libraries[key]
+	
+	def __setitem__(self, key, library):
+		self._loaders.pop(key, None)
+		self._libraries[key] = library
+	
+	def __delitem__(self, key):
+		if key not in self:
+			raise KeyError(key)
+		self._libraries.pop(key, None)
+		self._loaders.pop(key, None)
+	
+	def __contains__(self, key):
+		return key in self._libraries or key in self._loaders
+	
+	def __iter__(self):
+		return iter(set(self._libraries) | set(self._loaders))
+	
+	def __len__(self):
+		return len(set(self._libraries) | set(self._loaders))
 
 
 class BaseCase(object):
@@ -36,6 +101,27 @@ class BaseCase(object):
 	isotropic:      bool; whether to use isotropic_in_lab mode
 					[Default: False]
 	
+	condense_groups: bool; whether to tally only the finest group structure in OpenMC,
+					and derive the MGXS and reaction rates of the coarser structures
+					by flux-weighted collapse. Structures that do not nest within the
+					finest one are still tallied directly.
+					[Default: False]
+	
+	condense_meshes: bool; whether to tally reaction rates in OpenMC only on the
+					finest mesh of each chain of `mesh_shapes` that nest within
+					each other, and sum them onto the coarser meshes when the
+					results are saved. See `condensation.get_tallied_mesh_shapes()`.
+					[Default: False]
+	
+	symmetry:       int or "auto"; 1 for a full core, 2 for the east half, or 4 for the
+					northeast quarter. The geometry must have been cut down the same
+					way (see `TreatLattice.get_openmc_geometry()`). The meshes are
+					still given by their full-core shapes; only their symmetric part is
+					tallied and solved, and the results are unfolded when saved.
+					Meshes with an odd number of cells are cut through their center cells.
+					"auto" detects the symmetry of the lattice with `get_symmetry()`.
+					[Default: 1]
+	
 	Attributes:
 	-----------
 	domains
@@ -46,8 +132,14 @@ class BaseCase(object):
 	materials_xml:  openmc.Materials
 	energy_groups:  dict of {int: openmc.EnergyGroups}
 					used to tally cross sections over
+	tallied_groups: dict of {int: int}; the number of groups actually tallied
+					for each group structure
+	tallied_meshes: dict of {tuple: tuple}; the mesh shape actually tallied
+					for each mesh shape
+	symmetry
 	"""
-	def __init__(self, geometry, nums_groups, domains, mesh_shapes=None, isotropic=False):
+	def __init__(self, geometry, nums_groups, domains, mesh_shapes=None, isotropic=False,
+	             condense_groups=False, condense_meshes=False, symmetry=1):
 		cv.check_type("geometry", geometry, openmc.Geometry)
 		cv.check_iterable_type("nums_groups", nums_groups, int)
 		self._domains = domains
@@ -58,6 +150,13 @@ class BaseCase(object):
 		if lats:
 			if constants.ROOT_LATTICE in lats:
 				self.lattice = lats[constants.ROOT_LATTICE]
+		if symmetry == "auto":
+			assert hasattr(self.lattice, "get_symmetry"), \
+				"Detecting the symmetry requires a TreatLattice."
+			symmetry = self.lattice.get_symmetry()
+			print("Detected symmetry:", symmetry)
+		symm.check_symmetry(symmetry)
+		self.symmetry = symmetry
 		self.materials = self.geometry.get_all_materials().values()
 		self.materials_xml = openmc.Materials(self.materials)
 		if isotropic:
@@ -65,10 +164,10 @@ class BaseCase(object):
 		
 		self.energy_groups = {}
 		self.energy_filters = {}
-		self._material_libraries = {}
-		self._cell_libraries = {}
-		self._mesh_libraries = {}
-		self._universe_libraries = {}
+		self._material_libraries = _LazyLibraries()
+		self._cell_libraries = _LazyLibraries()
+		self._mesh_libraries = _LazyLibraries()
+		self._universe_libraries = _LazyLibraries()
 		self._lib_dict = \
 			{"mesh"    : self._mesh_libraries,
 			 "cell"    : self._cell_libraries,
@@ -76,14 +175,23 @@ class BaseCase(object):
 			 "universe": self._universe_libraries}
 		
 		for g in nums_groups:
-			assert g in energy_groups.ALL_GROUP_NUMBERS
-			if g == 11:
-				eg = energy_groups.treat["11-group"]
+			eg = energy_groups.get_energy_groups(g)
+			# Copy, so that every case in this process gets the tables in eV
+			self.energy_groups[g] = mgxs.EnergyGroups(eg.group_edges*1E6)
+		
+		# Decide which group structures OpenMC actually has to tally
+		self.tallied_groups = {}
+		finest = max(self.energy_groups)
+		fine_edges = self.energy_groups[finest].group_edges
+		for g, eg in self.energy_groups.items():
+			if condense_groups and condensation.groups_nest(fine_edges, eg.group_edges):
+				self.tallied_groups[g] = finest
 			else:
-				key = "{}-group".format(g)
-				eg = energy_groups.casmo[key]
-			eg.group_edges *= 1E6
-			self.energy_groups[g] = eg
+				self.tallied_groups[g] = g
+		
+		for g, eg in self.energy_groups.items():
+			if self.tallied_groups[g] != g:
+				continue
 			self.energy_filters[g] = openmc.EnergyFilter(eg.group_edges)
 			
 			if "material" in domains:
@@ -107,6 +215,7 @@ class BaseCase(object):
 		self._meshes = {}
 		self._mesh_filters = {}
 		self._mesh_names = {}
+		self._mesh_dimensions = {}
 		if mesh_shapes is None:
 			if self.lattice:
 				latshape = self.lattice.shape
@@ -118,37 +227,68 @@ class BaseCase(object):
 				                     "no lattice shape to default to.")
 				
 		for shape in mesh_shapes:
-			(self._meshes[shape], self._mesh_filters[shape]) = \
-				self._get_mesh_and_filter(shape, False)
-			self._mesh_names[shape] = self.shape_to_string(shape)
+			self._add_mesh(shape)
 		self._mesh_shapes = mesh_shapes
 		
+		# Decide which meshes OpenMC actually has to tally
+		self.tallied_meshes = {shape: shape for shape in mesh_shapes}
+		if condense_meshes:
+			# The tallied meshes are among `mesh_shapes`, so they already exist.
+			self.tallied_meshes = condensation.get_tallied_mesh_shapes(mesh_shapes)
+		
 		self._tallies = openmc.Tallies()
 		self._reaction_tallies = {}
+		self._mesh_tallies = {}
+		self._xs_arrays = {}
+		self._xs_lock = threading.Lock()
+		self._moc_universes = {}
 		self._sph_ids = None
 		self._sp = None
+		self._tally_reader = None
+		self._statepoint_file = None
+		self._library_path = None
 		self._moc_geom = None
+		self._core = None
+		self._track_generator = None
 		self._solver = None
+		self._cmfd = None
+		self._cmfd_settings = None
+		self._cmfd_tuned = False
 		self._prepped = False
 		self._run = False
+		self._timer = StageTimer()
+	
+	
+	def _add_mesh(self, shape):
+		"""Make the mesh (over the symmetric part of the core) for a full-core mesh shape"""
+		dimension = symm.get_reduced_shape(shape, self.symmetry)
+		offsets = symm.get_cut_offsets(shape, self.symmetry)
+		(self._meshes[shape], self._mesh_filters[shape]) = \
+			self._get_mesh_and_filter(dimension, self.symmetry, offsets)
+		self._mesh_names[shape] = self.shape_to_string(shape)
+		self._mesh_dimensions[shape] = dimension
 	
 	
-	def _get_mesh_and_filter(self, mesh_shape, symmetry):
+	def _get_mesh_and_filter(self, mesh_shape, symmetry, offsets=(0.0, 0.0)):
 		mesh = openmc.Mesh()
 		if self.lattice:
-			if not symmetry:
-				dx = 0
-				dy = 0
-			elif symmetry == 2:
-				dx = self.lattice.pitch[0]/ 2.0
-				dy = 0
-			elif symmetry == 4:
-				dx, dy = self.lattice.pitch/2.0
-			else:
-				raise NotImplementedError("Symmetry: {}".format(symmetry))
-			mesh.lower_left  = self.lattice.lower_left + np.array([dx, dy])
 			width = self.lattice.pitch*self.lattice.shape
+			center = self.lattice.lower_left + width/2.0
+			lower_left = np.array(self.lattice.lower_left, dtype=float)
+			# Symmetric meshes start at the cut planes through the center,
+			# or half a cell before them if the center cells are cut in half.
+			upper_right = lower_left + width
+			cell_width = (upper_right - center)/(np.array(mesh_shape[:2]) - np.array(offsets))
+			if symmetry in (2, 4):
+				lower_left[0] = center[0] - offsets[0]*cell_width[0]
+			if symmetry == 4:
+				lower_left[1] = center[1] - offsets[1]*cell_width[1]
+			elif symmetry not in (None, 0, 1, 2):
+				raise NotImplementedError("Symmetry: {}".format(symmetry))
+			mesh.lower_left = lower_left
 			mesh.upper_right = self.lattice.lower_left + width
+		elif symmetry in (2, 4):
+			raise ValueError("Symmetric meshes need a core lattice to find the center.")
 		else:
 			warn("No lattice present; using entire geometry with no symmetry.")
 			lleft, uright = self.geometry.bounding_box
@@ -161,8 +301,18 @@ class BaseCase(object):
 	
 	@property
 	def sp(self):
+		"""openmc.StatePoint; opened on first access after `load_openmc_statepoint()`"""
+		if self._sp is None and self._statepoint_file is not None:
+			self._sp = openmc.StatePoint(self._statepoint_file)
 		return self._sp
 	
+	@property
+	def tally_reader(self):
+		"""mesh.TallyReader on the statepoint; much cheaper than `sp` for reading tallies"""
+		if self._tally_reader is None and self._statepoint_file is not None:
+			self._tally_reader = TallyReader(self._statepoint_file)
+		return self._tally_reader
+	
 	@property
 	def domains(self):
 		return self._domains
@@ -187,8 +337,20 @@ class BaseCase(object):
 	def meshes(self):
 		return self._meshes
 	
+	@property
+	def timings(self):
+		"""dict of the stage times, memory use, and problem sizes of the last OpenMOC run"""
+		return self._timer.as_dict()
+	
+	@property
+	def last_solution(self):
+		"""WarmStart with the fluxes and keff of the last OpenMOC run, if any"""
+		if not self._run:
+			return None
+		return WarmStart.from_solver(self._solver, self._moc_geom, self._track_generator)
+	
 	def _assert_statepoint(self):
-		assert self._sp is not None, \
+		assert self._statepoint_file is not None, \
 			"You need to load a StatePoint first!"
 	
 	@staticmethod
@@ -226,6 +388,7 @@ class BaseCase(object):
 		assert isinstance(library, mgxs.Library)
 		ngroups = library.energy_groups.num_groups
 		self._lib_dict[library.domain_type][ngroups] = library
+		self._xs_arrays.pop((library.domain_type, ngroups), None)
 		try:
 			library.add_to_tallies_file(self._tallies)
 		except KeyError:
@@ -313,11 +476,12 @@ class BaseCase(object):
 			zirc_tally.nuclides = list(np.array(zirc.nuclides)[:, 0])
 			self._tallies.append(zirc_tally)
 		
+		tallied_shapes = set(self.tallied_meshes.values())
 		# Power distribution (fission) tallies
-		for mesh_shape, mesh_filter in self._mesh_filters.items():
+		for mesh_shape in tallied_shapes:
 			name = "{} mesh tally".format(self._mesh_names[mesh_shape])
 			power_tally = openmc.Tally(name=name)
-			power_tally.filters = [mesh_filter]
+			power_tally.filters = [self._mesh_filters[mesh_shape]]
 			power_tally.scores = ["fission"]
 			self._tallies.append(power_tally)
 			
@@ -327,19 +491,24 @@ class BaseCase(object):
 		elif 'flux' not in reactions:
 			reactions.append('flux')
 		for ngroups, energy_filter in self.energy_filters.items():
-			# Reaction rate (and flux) tallies
+			# Reaction rate (and flux) tallies: one tally with every score
+			# per mesh, so OpenMC only searches the filter bins once.
+			for mesh_shape in tallied_shapes:
+				shape_name = self._mesh_names[mesh_shape]
+				name = "reaction {} mesh tally {}".format(shape_name, ngroups)
+				tally = openmc.Tally(name=name)
+				tally.filters = [self._mesh_filters[mesh_shape], energy_filter]
+				tally.scores = list(reactions)
+				self._mesh_tallies[ngroups, shape_name] = tally
+				self._tallies.append(tally)
+			# {reaction: {mesh name: merged tally}}; coarser meshes reuse the fine tallies
 			self._reaction_tallies[ngroups] = {}
 			for rxn_type in reactions:
 				self._reaction_tallies[ngroups][rxn_type] = {}
-				for mesh_shape, mesh_filter in self._mesh_filters.items():
-					shape_name = self._mesh_names[mesh_shape]
-					name = "{} {} mesh tally {}".format(
-						rxn_type, shape_name, ngroups)
-					tally = openmc.Tally(name=name)
-					tally.filters = [mesh_filter, energy_filter]
-					tally.scores = [rxn_type]
-					self._reaction_tallies[ngroups][rxn_type][shape_name] = tally
-					self._tallies.append(tally)
+				for mesh_shape, tallied in self.tallied_meshes.items():
+					key = (ngroups, self._mesh_names[tallied])
+					self._reaction_tallies[ngroups][rxn_type][self._mesh_names[mesh_shape]] = \
+						self._mesh_tallies[key]
 			
 			# Flux tallies for SPH -- only valid on "universe" domain.
 			if "universe" in self.domains:
@@ -373,6 +542,11 @@ class BaseCase(object):
 				group_lib.by_nuclide = False
 				group_lib.build_library()
 				group_lib.add_to_tallies_file(self._tallies)
+		
+		# Condensed group structures reuse the fine tallies
+		for ngroups, tallied in self.tallied_groups.items():
+			if ngroups != tallied:
+				self._reaction_tallies[ngroups] = self._reaction_tallies[tallied]
 	
 	def export_to_xml(self, path="./"):
 		"""Export the geometry, materials, and tallies for this model to XML.
@@ -419,39 +593,74 @@ class BaseCase(object):
 		"""
 		if path[-1] != "/":
 			path += "/"
-		try:
-			self._sp = openmc.StatePoint(path + statepoint)
-		except OSError as err:
+		if not os.path.isfile(path + statepoint):
+			err = FileNotFoundError("No such statepoint: " + path + statepoint)
 			warn("Could not load statepoint:" + str(err))
-			raise
+			raise err
+		self._sp = None
+		if self._tally_reader is not None:
+			self._tally_reader.close()
+			self._tally_reader = None
+		self._statepoint_file = path + statepoint
+		self._library_path = path
+		self._xs_arrays = {}
+		# The libraries are loaded from disk and the statepoint on first access.
+		for n, tallied in self.tallied_groups.items():
+			for dom in self.domains:
+				if n == tallied:
+					loader = self._get_library_loader(dom, n)
+				else:
+					loader = self._get_condensed_library_loader(dom, n)
+				self._lib_dict[dom].set_loader(n, loader)
+	
+	def _get_library_loader(self, domain, ngroups):
+		"""Get a function that loads a tallied MGXS Library from disk and the statepoint"""
+		def load_library():
+			fname = "{}_lib_{}".format(domain, ngroups)
+			library = mgxs.Library.load_from_file(filename=fname, directory=self._library_path)
+			library.load_from_statepoint(self.sp)
+			return library
+		return load_library
+	
+	def _get_condensed_library_loader(self, domain, ngroups):
+		"""Get a function that collapses a fine MGXS Library onto a coarser group structure"""
+		def condense_library():
+			fine_lib = self._lib_dict[domain][self.tallied_groups[ngroups]]
+			return fine_lib.get_condensed_library(self.energy_groups[ngroups])
+		return condense_library
+	
+	def get_cache_inputs(self, domain, ngroups):
+		"""Get the inputs of this case that affect a simulation's results
+		
+		Parameters:
+		-----------
+		domain:         str; domain type of the MGXS Library used
+		ngroups:        int; number of energy groups used
+		
+		Returns:
+		--------
+		dict of {str: value}, including digests of the statepoint and MGXS library files
+		"""
+		self._assert_statepoint()
+		tallied = self.tallied_groups[ngroups]
+		inputs = {"statepoint": hash_file(self._statepoint_file),
+		          "isotropic": self.isotropic,
+		          "symmetry": self.symmetry,
+		          "tallied_groups": tallied}
+		lib_file = self._library_path + "{}_lib_{}.pkl".format(domain, tallied)
+		if os.path.isfile(lib_file):
+			inputs["library"] = hash_file(lib_file)
 		else:
-			for n in self.energy_groups.keys():
-				if "material" in self.domains:
-					fname = "material_lib_{}".format(n)
-					material_lib = mgxs.Library.load_from_file(
-						filename=fname, directory=path)
-					material_lib.load_from_statepoint(self._sp)
-					self._material_libraries[n] = material_lib
-				if "universe" in self.domains:
-					fname = "universe_lib_{}".format(n)
-					universe_lib = mgxs.Library.load_from_file(
-						filename=fname, directory=path)
-					universe_lib.load_from_statepoint(self._sp)
-					self._universe_libraries[n] = universe_lib
-				if "cell" in self.domains:
-					fname = "cell_lib_{}".format(n)
-					cell_lib = mgxs.Library.load_from_file(
-						filename=fname, directory=path)
-					cell_lib.load_from_statepoint(self._sp)
-					self._cell_libraries[n] = cell_lib
-				if "mesh" in self.domains:
-					fname = "mesh_lib_{}".format(n)
-					mesh_lib = mgxs.Library.load_from_file(
-						filename=fname, directory=path)
-					mesh_lib.load_from_statepoint(self._sp)
-					self._mesh_libraries[n] = mesh_lib
+			inputs["library"] = None
+		return inputs
 	
 	
+	def _get_group_mapping(self, ngroups):
+		"""Map the tallied groups onto a condensed group structure (OpenMC order)"""
+		tallied = self.tallied_groups[ngroups]
+		return condensation.get_group_mapping(self.energy_groups[tallied].group_edges,
+		                                      self.energy_groups[ngroups].group_edges)
+	
 	def _get_reference_fluxes(self, ngroups, universe_ids):
 		"""Load the groupwise scalar fluxes from the OpenMC statepoint.
 		
@@ -466,15 +675,20 @@ class BaseCase(object):
 		universe_ids:   iterable of int; universe IDs to include in this tally
 		
 		"""
-		assert self._sp, "You need to load a StatePoint first."
+		self._assert_statepoint()
 		assert "universe" in self.domains, "No homogenized data was tallied."
 		cv.check_iterable_type("universe_ids", universe_ids, int)
-		bins = [tuple(universe_ids)]
-		tal = self._sp.get_tally(name="SPH tally {}".format(ngroups))
-		sli = tal.get_slice(filters=[openmc.UniverseFilter], filter_bins=bins)
-		fluxes = np.flip(sli.mean.reshape((len(universe_ids), ngroups)).sum(axis=0))
+		tallied = self.tallied_groups[ngroups]
+		tal = self.tally_reader.get_tally(name="SPH tally {}".format(tallied))
+		# Filters are [UniverseFilter, EnergyFilter]
+		all_fluxes = tal.get_values(scores=["flux"], reshape=True)[..., 0, 0]
+		selected = np.isin(tal.get_filter_bins(0), list(universe_ids))
+		fluxes = all_fluxes[selected].sum(axis=0)
+		if tallied != ngroups:
+			fluxes = condensation.condense_groups(fluxes, self._get_group_mapping(ngroups))
+		fluxes = np.flip(fluxes)
 		# Normalize by the total flux.
-		fluxes /= tal.mean.sum()
+		fluxes /= all_fluxes.sum()
 		return fluxes
 	
 	def _get_simulation_fluxes(self, ngroups, universe_ids, flux_mesh):
@@ -490,29 +704,57 @@ class BaseCase(object):
 		--------
 		"""
 		flux_array = flux_mesh.tally_reaction_rates_on_mesh(self._solver, "flux", energy="by_group")
-		indices = []
-		for index, u in np.ndenumerate(self.lattice.universes):
-			if u.id in universe_ids:
-				indices.append(index)
 		shape = self.lattice.shape + (ngroups,)
 		# If the CMFD mesh isn't the core shape, project it onto the lattice mesh.
 		if flux_array.shape != shape:
-			new_flux_array = np.zeros(shape)
-			template_array = np.zeros(self.lattice.shape, dtype=int)
-			for g in range(ngroups):
-				new_flux_array[:, :, g] = project_array(fine=flux_array[:, :, g],
-				                                        coarse=template_array)
-			flux_array = new_flux_array
+			template_array = np.zeros(self.lattice.shape)
+			flux_array = project_array(fine=flux_array, coarse=template_array)
 			del template_array
 		# Tally the appropriate universe fluxes
-		uflux = np.zeros(ngroups)
-		for i, j in indices:
-			uflux += flux_array[i, j, :]
+		in_universes = np.zeros(self.lattice.shape, dtype=bool)
+		for index, u in np.ndenumerate(self.lattice.universes):
+			in_universes[index] = u.id in universe_ids
+		uflux = flux_array[in_universes].sum(axis=0)
 		uflux /= flux_array.sum()
 		return uflux
 	
 	
-	def _save_simulation_results(self, ngroups, export_path, save_uncertainty):
+	def get_sph_factors(self, ngroups, keys, cmfd_mesh):
+		"""Get an independent set of SPH factors for each element key (or set of keys)
+		
+		The factors are the ratio of the OpenMC reference flux to the flux of the
+		last OpenMOC run, over all the universes of each key.
+		
+		Parameters:
+		-----------
+		ngroups:        int; number of energy groups of the last run
+		keys:           iterable of str, or of tuples of str; the element keys
+		                to get SPH factors for. The keys in a tuple share one set.
+		cmfd_mesh:      tuple of (int, int); CMFD mesh shape of the last run
+		
+		Returns:
+		--------
+		dict of {key (or tuple of keys): array of floats}; the SPH factors
+		of each, sorted by group
+		"""
+		assert self._run, "You must run a simulation first."
+		if self.symmetry != 1:
+			raise NotImplementedError("SPH factors with symmetry {}".format(self.symmetry))
+		moc_mesh = self._moc_meshes[cmfd_mesh]
+		factors = {}
+		for key in keys:
+			if isinstance(key, str):
+				ids = self._core.get_universe_ids([key])
+			else:
+				ids = self._core.get_universe_ids(key)
+			mcflux = self._get_reference_fluxes(ngroups, ids)
+			simflux = self._get_simulation_fluxes(ngroups, ids, moc_mesh)
+			factors[key] = mcflux/simflux
+		return factors
+	
+	
+	def _save_simulation_results(self, ngroups, export_path, save_uncertainty,
+	                             results_file, save_text=False):
 		"""Save the results of a recently completed simulation
 		
 		Parameters:
@@ -520,6 +762,10 @@ class BaseCase(object):
 		ngroups:            int; the number of energy groups used for the simulation
 		export_path:        str; directory to save the results to
 		save_uncertainty:   bool; whether to save Monte Carlo uncertainties as well
+		results_file:       moc.results.ResultsFile; open file to write the results to
+		save_text:          bool, optional; whether to also write the legacy text files,
+		                    one per group, reaction, and mesh.
+		                    [Default: False]
 		"""
 		if not self._run:
 			warn("You must run a simulation to save its results.")
@@ -529,88 +775,152 @@ class BaseCase(object):
 			if moc_mesh is None:
 				continue
 			mname = self._mesh_names[mesh_shape]
-			tal_name = "{} mesh tally".format(mname)
+			tallied = self.tallied_meshes.get(mesh_shape, mesh_shape)
+			tal_name = "{} mesh tally".format(self._mesh_names[tallied])
 			try:
 				# Total fission rate tally
-				fission_tally = self._sp.get_tally(name=tal_name)
+				fission_tally = self.tally_reader.get_tally(name=tal_name)
 				vals = fission_tally.get_values(scores=["fission"])
-				fission_rates = vals[:, 0, 0]
+				# Mesh bins run fastest in x, so this is indexed [y, x]
+				fission_rates = vals[:, 0, 0].reshape(self._mesh_dimensions[tallied][::-1])
+				fission_rates = np.flipud(fission_rates)
+				# Unfold before condensing: the reduced meshes need not nest.
+				fission_rates = symm.unfold(fission_rates, self.symmetry, tallied)
+				if tallied != mesh_shape:
+					fission_rates = condensation.condense_mesh(fission_rates, mesh_shape[::-1])
 				fission_rates[fission_rates == 0] = np.NaN
-				fission_rates.shape = moc_mesh.dimension
 				fission_rates /= np.nanmean(fission_rates)
-				fission_rates = np.flipud(fission_rates)
-				fname = export_path + \
-				        "{}groups_montecarlo_fission_rates_{}".format(ngroups, mname)
-				np.savetxt(fname, fission_rates)
-				print("OpenMC {} mesh tally exported to {}".format(mname, fname))
+				results_file.write_fission_rates("montecarlo", mname, fission_rates)
+				if save_text:
+					fname = export_path + \
+					        "{}groups_montecarlo_fission_rates_{}".format(ngroups, mname)
+					np.savetxt(fname, fission_rates)
+				print("OpenMC {} mesh tally exported to {}".format(mname, results_file.fname))
 			except (LookupError, ValueError) as err:
 				warnstr = "{} : {}".format(str(err), tal_name)
 				warn(warnstr)
 			# Groupwise reaction tallies
+			rxn_types = []
+			all_mc_rates = []
+			all_mc_uncert = []
+			all_moc_rates = []
 			for rxn_type in self._reaction_tallies[ngroups]:
 				try:
-					self._save_groupwise_mesh_tally(
-						ngroups, rxn_type, moc_mesh, mname, export_path, save_uncertainty)
+					mc_rates, mc_uncert, moc_rates = self._get_groupwise_mesh_tally(
+						ngroups, rxn_type, moc_mesh, mesh_shape, save_uncertainty)
 				except (LookupError, KeyError) as err:
 					warnstr = "{} : self._reaction_tallies[{}][{}][{}]".\
 						format(str(err), ngroups, rxn_type, mname)
 					warn(warnstr)
+					continue
+				rxn_types.append(rxn_type)
+				all_mc_rates.append(mc_rates)
+				all_mc_uncert.append(mc_uncert)
+				all_moc_rates.append(moc_rates)
+				if save_text:
+					self._save_groupwise_text(ngroups, rxn_type, mname, export_path,
+					                          mc_rates, mc_uncert, moc_rates)
+			if rxn_types:
+				if not save_uncertainty:
+					all_mc_uncert = None
+				results_file.write_rates("montecarlo", mname, rxn_types,
+				                         all_mc_rates, all_mc_uncert)
+				results_file.write_rates("moc", mname, rxn_types, all_moc_rates)
+				print("{} rates exported to {}".format(rxn_types, results_file.fname))
 	
 	
-	def _save_groupwise_mesh_tally(self, ngroups, rxn_type, moc_mesh, mesh_name,
-	                               export_path, save_uncertainty):
-		"""Save the reaction rate tallies from the OpenMC and OpenMOC meshes
+	def _get_groupwise_mesh_tally(self, ngroups, rxn_type, moc_mesh, mesh_shape,
+	                              get_uncertainty):
+		"""Get the reaction rate tallies from the OpenMC and OpenMOC meshes
 		
 		Parameters:
 		-----------
 		ngroups:            int; the number of energy groups used for the simulation
 		rxn_type:           str; the reaction whose rates we are saving
 		moc_mesh:           openmoc.process.Mesh; the mesh reaction rates were tallied on
-		mesh_name:          str; the mesh name in the format {NX}x{NY}, e.g., "3x3"
-		export_path:        str; directory to save the results to
-		save_uncertainty:   bool; whether to save Monte Carlo uncertainties as well
+		mesh_shape:         tuple of (nx, ny); the full-core shape of that mesh
+		get_uncertainty:    bool; whether to get the Monte Carlo uncertainties as well
+		
+		Returns:
+		--------
+		All arrays are full-core maps indexed by [group, y (descending), x],
+		with the fastest group first.
+		mc_rates:           array of the OpenMC reaction rates
+		mc_uncert:          array of the OpenMC standard deviations, or None
+		moc_rates:          array of the OpenMOC reaction rates
 		"""
-		if not self._run:
-			warn("You must run a simulation to save its results.")
-			return
-		# Monte Carlo
+		# Monte Carlo: slice this reaction's score out of the merged tally
+		mesh_name = self._mesh_names[mesh_shape]
 		rxn_tally = self._reaction_tallies[ngroups][rxn_type][mesh_name]
-		# I think I have to do this instead because some tallies may merge...
-		vals = self._sp.get_tally(name=rxn_tally.name).get_values(scores=[rxn_type])
-		vals[vals == 0] = np.NaN
-		rxn_rates = vals[:, 0, 0]
-		if save_uncertainty:
-			vals = self._sp.tallies[rxn_tally.id].get_values(scores=[rxn_type])
-			uncertain = vals[:, 0, 1]
-		rxn_rates.shape = np.append(moc_mesh.dimension, ngroups)
+		sp_tally = self.tally_reader.get_tally(name=rxn_tally.name)
+		tallied = self.tallied_groups[ngroups]
+		tallied_mesh = self.tallied_meshes.get(mesh_shape, mesh_shape)
+		# Mesh bins run fastest in x, and energy bins faster still: [y, x, group]
+		shape = self._mesh_dimensions[tallied_mesh][::-1] + (tallied,)
+		
+		def arrange(values, std_dev=False):
+			values = values[:, 0, 0].reshape(shape)
+			if tallied != ngroups:
+				values = condensation.condense_groups(
+					values, self._get_group_mapping(ngroups), std_dev=std_dev)
+			# OpenMC groups are in the opposite order!!
+			values = np.flip(values, axis=-1)
+			values = np.flip(np.moveaxis(values, -1, 0), axis=1)
+			# Unfold before condensing: the reduced meshes need not nest.
+			values = symm.unfold(values, self.symmetry, tallied_mesh)
+			if tallied_mesh != mesh_shape:
+				values = condensation.condense_mesh(
+					np.moveaxis(values, 0, -1), mesh_shape[::-1], std_dev=std_dev)
+				values = np.moveaxis(values, -1, 0)
+			return values
+		
+		mc_rates = arrange(sp_tally.get_values(scores=[rxn_type]))
+		mc_rates[mc_rates == 0] = np.NaN
+		mc_uncert = None
+		if get_uncertainty:
+			vals = sp_tally.get_values(scores=[rxn_type], value="std_dev")
+			mc_uncert = arrange(vals, std_dev=True)
 		# And then for the MOC results
+		# OpenMOC meshes are indexed [x, y, group]; put them in the same order.
 		moc_rates = moc_mesh.tally_reaction_rates_on_mesh(
 			self._solver, rxn_type, energy="by_group")
+		moc_rates = np.flip(np.moveaxis(moc_rates, -1, 0).swapaxes(1, 2), axis=1)
+		moc_rates = symm.unfold(moc_rates, self.symmetry, mesh_shape)
+		return mc_rates, mc_uncert, moc_rates
+	
+	
+	@staticmethod
+	def _save_groupwise_text(ngroups, rxn_type, mesh_name, export_path,
+	                         mc_rates, mc_uncert, moc_rates):
+		"""Save groupwise reaction rates as text files, one per group
+		
+		Parameters:
+		-----------
+		ngroups:            int; the number of energy groups used for the simulation
+		rxn_type:           str; the reaction whose rates we are saving
+		mesh_name:          str; the mesh name in the format {NX}x{NY}, e.g., "3x3"
+		export_path:        str; directory to save the results to
+		mc_rates, mc_uncert, moc_rates:
+		                    arrays from `_get_groupwise_mesh_tally()`
+		"""
 		for g in range(ngroups):
-			# Monte Carlo. OpenMC groups are in the opposite order!!
-			group_rates = rxn_rates[:, :, ngroups - (g + 1)]
-			group_rates = np.flipud(group_rates)
+			# Monte Carlo
 			fname = export_path + "montecarlo_{}_{:02d}-of-{}_{}". \
 				format(rxn_type, g + 1, ngroups, mesh_name)
-			np.savetxt(fname, group_rates)
-			if save_uncertainty:
-				group_uncert = uncertain[:, :, ngroups - (g + 1)]
-				group_uncert = np.flipud(group_uncert)
+			np.savetxt(fname, mc_rates[g])
+			if mc_uncert is not None:
 				gname = export_path + "montecarlo_{}_uncert_{:02d}-of-{}". \
 					format(rxn_type, g + 1, ngroups)
-				np.savetxt(gname, group_uncert)
-				print(rxn_type, "rates exported to", fname, gname)
+				np.savetxt(gname, mc_uncert[g])
 			# MOC
-			moc_group_rates = moc_rates[:, :, g]
-			moc_group_rates = np.flipud(moc_group_rates)
 			hname = export_path + "moc_{}_{:02d}-of-{}_{}". \
 				format(rxn_type, g + 1, ngroups, mesh_name)
-			np.savetxt(hname, moc_group_rates)
-			if g == 0:
-				print("MOC {} rates exported to {} ...".format(rxn_type, hname))
+			np.savetxt(hname, moc_rates[g])
 	
 	
-	def _prep_openmoc(self, ngroups, domain_type, cmfd_mesh, calculate_sph=None, **kwargs):
+	def _prep_openmoc(self, ngroups, domain_type, cmfd_mesh, calculate_sph=None,
+	                  cmfd_relaxation=1.5, cmfd_knearest=3, cmfd_flux_update=True,
+	                  cmfd_groups=None, **kwargs):
 		"""Prepare the OpenMOC core model for the run
 		
 		Parameters:
@@ -621,21 +931,35 @@ class BaseCase(object):
 		calculate_sph:      list of str, optional; keys for the elements to calculate SPH
 		                    factors on. If not provided, no SPH factors will calculated.
 		                    [Default: None]
+		cmfd_relaxation:    float, optional; SOR relaxation factor of the CMFD solver
+		                    [Default: 1.5]
+		cmfd_knearest:      int, optional; number of nearest CMFD cells for the flux update
+		                    [Default: 3]
+		cmfd_flux_update:   bool, optional; whether CMFD updates the MOC fluxes
+		                    [Default: True]
+		cmfd_groups:        int, optional; number of groups of the tabulated structure
+		                    to condense the CMFD problem onto (e.g., 25 --> 4)
+		                    [Default: None --> the MOC group structure]
 		"""
 		if self._prepped:
 			return
 		domain_type = domain_type.lower()
 		assert domain_type in self.domains
-		assert self._sp is not None, "You need to load a StatePoint first!"
+		self._assert_statepoint()
 		
 		self._moc_geom = openmoc.Geometry()
-		mglib = self._lib_dict[domain_type][ngroups]
-		core = Core(self.lattice, mglib, domain_type, **kwargs)
+		mglib, xs_arrays = self._get_xs_arrays(domain_type, ngroups)
+		core = Core(self.lattice, mglib, domain_type, xs_arrays=xs_arrays,
+		            universe_cache=self._moc_universes, **kwargs)
+		self._core = core
 		if calculate_sph:
+			if self.symmetry != 1:
+				raise NotImplementedError("SPH factors with symmetry {}".format(self.symmetry))
 			self._sph_ids = core.get_universe_ids(calculate_sph)
 		openmc_root_cell = self.geometry.get_cells_by_name(name="root cell")[0]
 		moc_root_region = openmc.openmoc_compatible.get_openmoc_region(openmc_root_cell.region)
-		moc_lat = core.get_moc_lattice()
+		with self._timer.stage("lattice"):
+			moc_lat = core.get_moc_lattice()
 		
 		root_cell = openmoc.Cell(name="root cell")
 		root_cell.setFill(moc_lat)
@@ -646,17 +970,25 @@ class BaseCase(object):
 		
 		if cmfd_mesh:
 			cmfd = openmoc.Cmfd()
-			cmfd.setSORRelaxationFactor(1.5)
+			self._cmfd_settings = CmfdSettings(cmfd_relaxation, cmfd_knearest,
+			                                   cmfd_flux_update, cmfd_groups)
+			self._cmfd_settings.apply(cmfd, self.energy_groups[ngroups].group_edges)
 			# Assumes 2D; will break on 3D.
-			nx, ny = cmfd_mesh
+			nx, ny = self._mesh_dimensions[cmfd_mesh]
 			print("CMFD set to {}x{}".format(nx, ny))
-			cmfd.setLatticeStructure(nx, ny)
-			cmfd.setKNearest(3)
+			mesh = self._meshes[cmfd_mesh]
+			if any(symm.get_cut_offsets(cmfd_mesh, self.symmetry)):
+				# The reflective planes cut the center cells in half,
+				# so the CMFD cells must line up with the tally mesh.
+				cell_width = (np.array(mesh.upper_right) - mesh.lower_left)/(nx, ny)
+				cmfd.setWidths(symm.get_cut_widths(cmfd_mesh, self.symmetry, cell_width))
+			else:
+				cmfd.setLatticeStructure(nx, ny)
 			self._moc_geom.setCmfd(cmfd)
+			self._cmfd = cmfd
 			# Use the CMFD mesh to create an OpenMOC Mesh on which to tally reaction rates
-			mesh = self._meshes[cmfd_mesh]
 			m = openmoc.process.Mesh()
-			m.dimension = np.array(cmfd_mesh)
+			m.dimension = np.array(self._mesh_dimensions[cmfd_mesh])
 			m.lower_left = mesh.lower_left
 			m.upper_right = mesh.upper_right
 			m.width = (m.upper_right - m.lower_left)/m.dimension
@@ -672,8 +1004,8 @@ class BaseCase(object):
 	def run_openmoc(self, ngroups, domain, nazim, dazim, solve_type,
 	                cmfd_mesh, nproc=4, stabilize=0.0,
 	                plot=False, save_results=True, save_uncert=False,
-	                calculate_sph=None,
-	                export_path="moc_data/", **kwargs):
+	                calculate_sph=None, warm_start=None, save_fluxes=False,
+	                save_text=False, export_path="moc_data/", cmfd_tune=False, **kwargs):
 		"""Run a Method Of Characteristics eigenvalue calculation using OpenMOC
 		
 		Parameters:
@@ -699,11 +1031,25 @@ class BaseCase(object):
 		                results to the export_path.
 		save_uncert:    bool, optional; whether to export the OpenMC tally
 		                standard deviations to the export_path.
+		save_text:      bool, optional; whether to export the reaction rates as
+		                text files (one per group, reaction, and mesh), in addition
+		                to the HDF5 results file.
+		                [Default: False]
 		calculate_sph:  list of str, optional; keys for the elements to calculate SPH
 		                factors on. If not provided, no SPH factors will calculated.
 		                [Default: None]
+		warm_start:     WarmStart or str, optional; previous solution (or HDF5 file
+		                containing one) to use as the initial guess for the fluxes.
+		                [Default: None --> flat initial guess]
+		save_fluxes:    bool, optional; whether to export the FSR fluxes and keff
+		                to the export_path, for use as a later `warm_start`.
+		                [Default: False]
 		export_path:    str, optional; directory to export data to.
 		                [Default: "moc_data/"]
+		cmfd_tune:      bool, optional; whether to choose the CMFD settings from
+		                short pilot solves before the first eigenvalue solve
+		                of the prepared model. See `cmfd_config.tune()`.
+		                [Default: False]
 		
 		kwargs:
 		-------
@@ -716,6 +1062,15 @@ class BaseCase(object):
 		elements:           dict of {key : treat.moc.Element}; Elements requesting the features above
 		ids_fname:          str; file name of ids_to_keys pickle
 		                    [Default: consants.IDS_PICKLE --> "ids_to_keys.pkl"]
+		cmfd_relaxation:    float; SOR relaxation factor of the CMFD solver
+		cmfd_knearest:      int; number of nearest CMFD cells for the flux update
+		cmfd_flux_update:   bool; whether CMFD updates the MOC fluxes
+		cmfd_groups:        int; number of groups to condense the CMFD problem onto
+		
+		Returns:
+		--------
+		results:        dict of {str: float}; the OpenMOC keff, and the OpenMC keff,
+		                its uncertainty, and the bias (pcm) when a statepoint is loaded.
 		"""
 		if save_results:
 			if export_path[-1] != "/":
@@ -725,16 +1080,26 @@ class BaseCase(object):
 		solve_type = solve_type.lower()
 		assert solve_type in ("fsr", "flat", "lsr", "linear"), \
 			"Unknown solve type: {}".format(solve_type)
+		self._timer = StageTimer()
 		if not self._prepped:
-			self._prep_openmoc(ngroups, domain, cmfd_mesh, calculate_sph, **kwargs)
-		
-		self._moc_geom.initializeFlatSourceRegions()
-		track_generator = openmoc.TrackGenerator(self._moc_geom, num_azim=nazim, azim_spacing=dazim)
+			with self._timer.stage("prep"):
+				self._prep_openmoc(ngroups, domain, cmfd_mesh, calculate_sph, **kwargs)
 		
-		#track_generator.setZCoord(0.0)
-		track_generator.setNumThreads(nproc)
-		track_generator.generateTracks()
-		print("Tracks generated!")
+		if self._track_generator is None:
+			with self._timer.stage("fsr initialization"):
+				self._moc_geom.initializeFlatSourceRegions()
+			with self._timer.stage("track generation"):
+				track_generator = openmoc.TrackGenerator(self._moc_geom, num_azim=nazim, azim_spacing=dazim)
+				
+				#track_generator.setZCoord(0.0)
+				track_generator.setNumThreads(nproc)
+				track_generator.generateTracks()
+			print("Tracks generated!")
+			self._track_generator = track_generator
+		else:
+			# In-place update (see `update_openmoc_xs()`): the tracks are still valid.
+			track_generator = self._track_generator
+			print("Reusing the existing tracks.")
 		if plot:
 			moc_plt.plot_flat_source_regions(self._moc_geom)
 			moc_plt.plot_materials(self._moc_geom)
@@ -742,18 +1107,35 @@ class BaseCase(object):
 			if plot < 0:
 				return
 		# Run OpenMOC
-		if solve_type in ("flat", "fsr"):
-			self._solver = openmoc.CPUSolver(track_generator)
-		elif solve_type in ("linear", "lsr"):
-			self._solver = openmoc.CPULSSolver(track_generator)
-		else:
-			raise NotImplementedError(solve_type)
-		if stabilize:
-			self._solver.stabilizeTransport(stabilize)
-		self._solver.setNumThreads(nproc)
-		self._solver.computeEigenvalue(max_iters=500)
+		if self._solver is None:
+			if solve_type in ("flat", "fsr"):
+				self._solver = openmoc.CPUSolver(track_generator)
+			elif solve_type in ("linear", "lsr"):
+				self._solver = openmoc.CPULSSolver(track_generator)
+			else:
+				raise NotImplementedError(solve_type)
+			if stabilize:
+				self._solver.stabilizeTransport(stabilize)
+			self._solver.setNumThreads(nproc)
+		if cmfd_tune and self._cmfd is not None and not self._cmfd_tuned:
+			# Tune once per prepared model; in-place reruns keep the chosen settings.
+			with self._timer.stage("cmfd tuning"):
+				self._cmfd_settings, _ = cmfd_config.tune(
+					self._solver, self._cmfd, self.energy_groups[ngroups].group_edges,
+					self._cmfd_settings)
+			self._cmfd_tuned = True
+		if warm_start is not None:
+			if isinstance(warm_start, str):
+				warm_start = WarmStart.from_hdf5(warm_start)
+			warm_start.apply_to_solver(self._solver, self._moc_geom)
+			print("Warm start from a solution with keff = {:8.6f}".format(warm_start.keff))
+		with self._timer.stage("eigenvalue solve"):
+			self._solver.computeEigenvalue(max_iters=500)
 		self._solver.printTimerReport()
 		self._run = True
+		self._timer.count(fsrs=self._moc_geom.getNumFSRs(),
+		                  tracks=track_generator.getNumTracks(),
+		                  iterations=self._solver.getNumIterations())
 		
 		print("With nazim = {}, spacing = {} cm, and {} energy groups".format(
 			track_generator.getNumAzim(),
@@ -761,62 +1143,279 @@ class BaseCase(object):
 			ngroups))
 		keff_moc = self._solver.getKeff()
 		print('OpenMOC keff: {:8.6f}'.format(keff_moc))
+		results = {"keff": float(keff_moc)}
+		with self._timer.stage("export"):
+			if save_results and save_fluxes:
+				fname = export_path + constants.WARM_START_FILE
+				self.last_solution.export_to_hdf5(fname)
+				print("MOC fluxes exported to", fname)
 		
-		# OpenMOC fission rates from the meshes
-		moc_mesh = self._moc_meshes[cmfd_mesh]
-		mname = self._mesh_names[cmfd_mesh]
-		if save_results:
-			moc_fission_rates = \
-				np.array(moc_mesh.tally_fission_rates(self._solver))
-			moc_fission_rates.shape = moc_mesh.dimension
-			moc_fission_rates = np.fliplr(moc_fission_rates).T  # WHY :(
-			fname = export_path + "{}groups_moc_fission_rates_{}".\
-				format(ngroups, mname)
-			np.savetxt(fname, moc_fission_rates)
-			print("MOC {} mesh tally exported to {}\n".format(mname, fname))
-		if self._sp:
-			keff_mc, uncert_mc = self._sp.k_combined
-			bias = (keff_moc - keff_mc)*1E5
-			eigenreport = """\
+			# OpenMOC fission rates from the meshes
+			moc_mesh = self._moc_meshes[cmfd_mesh]
+			mname = self._mesh_names[cmfd_mesh]
+			if save_results:
+				results_file = ResultsFile(export_path + constants.RESULTS_FILE, 'w')
+				results_file.set_attributes(
+					ngroups=ngroups, domain=domain, solve_type=solve_type, nazim=nazim,
+					dazim=dazim, cmfd_mesh=mname, stabilize=stabilize, **results)
+				if self._cmfd_settings is not None:
+					results_file.set_attributes(**{"cmfd_" + key: value for key, value
+					                               in self._cmfd_settings.as_dict().items()})
+				moc_fission_rates = \
+					np.array(moc_mesh.tally_fission_rates(self._solver))
+				moc_fission_rates.shape = moc_mesh.dimension
+				moc_fission_rates = np.fliplr(moc_fission_rates).T  # WHY :(
+				moc_fission_rates = symm.unfold(moc_fission_rates, self.symmetry, cmfd_mesh)
+				results_file.write_fission_rates("moc", mname, moc_fission_rates)
+				if save_text:
+					fname = export_path + "{}groups_moc_fission_rates_{}".\
+						format(ngroups, mname)
+					np.savetxt(fname, moc_fission_rates)
+				print("MOC {} mesh tally exported to {}\n".format(mname, results_file.fname))
+			if self._statepoint_file:
+				keff_mc, uncert_mc = self.tally_reader.k_combined
+				bias = (keff_moc - keff_mc)*1E5
+				results.update(keff_mc=float(keff_mc), uncert_mc=float(uncert_mc), bias=float(bias))
+				eigenreport = """\
 OpenMC keff:  {keff_mc:8.6f} +/- {uncert_mc:8.6f}
 OpenMOC keff: {keff_moc:8.6f}
 OpenMOC bias: {bias:.0f} [pcm]
 """.format(**locals())
-			print(eigenreport)
-			if save_results:
-				fname = export_path + "RESULTS.txt"
-				with open(fname, 'w') as results_file:
-					results_file.write(eigenreport)
-			if calculate_sph:
-				# Get the flux tallies
-				mcflux = self._get_reference_fluxes(ngroups, self._sph_ids)
-				simflux = self._get_simulation_fluxes(ngroups, self._sph_ids, moc_mesh)
-				sph_factors = mcflux/simflux
+				print(eigenreport)
 				if save_results:
-					fname = export_path + constants.SPH_ARRAY
-					np.savetxt(fname, sph_factors)
-					print("SPH factors saved to", fname)
-				else:
-					print("\nSPH factors:\n", sph_factors)
-			if save_results:
-				self._save_simulation_results(ngroups, export_path, save_uncert)
-		elif not self._sp:
-			print("(No OpenMC tally to compare results against.)")
-		elif not save_results:
-			print("Results not saved.")
-		else:
-			print("I forgot an error message for this case.")
-			print("save_results: {};  self._sp: {}".format(save_results, bool(self._sp)))
+					fname = export_path + "RESULTS.txt"
+					with open(fname, 'w') as report_file:
+						report_file.write(eigenreport)
+					results_file.set_attributes(**results)
+				if calculate_sph:
+					# Get the flux tallies
+					mcflux = self._get_reference_fluxes(ngroups, self._sph_ids)
+					simflux = self._get_simulation_fluxes(ngroups, self._sph_ids, moc_mesh)
+					sph_factors = mcflux/simflux
+					if save_results:
+						fname = export_path + constants.SPH_ARRAY
+						np.savetxt(fname, sph_factors)
+						results_file.set_attributes(sph_factors=sph_factors)
+						print("SPH factors saved to", fname)
+					else:
+						print("\nSPH factors:\n", sph_factors)
+				if save_results:
+					self._save_simulation_results(ngroups, export_path, save_uncert,
+					                              results_file, save_text)
+			elif not self._statepoint_file:
+				print("(No OpenMC tally to compare results against.)")
+			elif not save_results:
+				print("Results not saved.")
+			else:
+				print("I forgot an error message for this case.")
+				print("save_results: {};  statepoint: {}".format(save_results, self._statepoint_file))
 		
+			if save_results:
+				results_file.close()
+		print(self._timer.get_report())
+		if save_results:
+			fname = export_path + constants.TIMINGS_FILE
+			self._timer.export_to_json(fname)
+			print("Timings exported to", fname)
 		if plot:
 			openmoc.plotter.plot_spatial_fluxes(self._solver, energy_groups=range(1, ngroups+1))
+		return results
 	
 
+	def _get_xs_arrays(self, domain_type, ngroups):
+		"""Get the (shared) MgxsArrays of a loaded MGXS Library"""
+		with self._timer.stage("library loading"):
+			mglib = self._lib_dict[domain_type][ngroups]
+		with self._xs_lock:
+			if (domain_type, ngroups) not in self._xs_arrays:
+				with self._timer.stage("mgxs extraction"):
+					self._xs_arrays[domain_type, ngroups] = MgxsArrays(mglib, lattice=self.lattice)
+		return mglib, self._xs_arrays[domain_type, ngroups]
+	
+	
+	def run_diffusion(self, ngroups, mesh_shapes=(), division=1, use_cmm=True,
+	                  use_sph=False, elements=None, ids_fname=constants.IDS_PICKLE,
+	                  tolerance=1E-6, save_results=True, save_text=False,
+	                  export_path="diffusion_data/"):
+		"""Run a finite-difference diffusion eigenvalue calculation on the lattice
+		
+		The homogenized ("universe" domain) MGXS are used, so the case must
+		have a universe Library. Symmetric cases are solved on the full core,
+		with the boundary conditions of the outer edges.
+		
+		Parameters:
+		-----------
+		ngroups:        int; number of energy groups to use
+		mesh_shapes:    iterable of tuple of (nx, ny), optional; full-core meshes to
+		                save the fission rates on. Each must nest within the
+		                diffusion mesh (the lattice shape times `division`).
+		                [Default: none]
+		division:       int, optional; number of mesh cells per lattice element
+		                along each axis
+		                [Default: 1]
+		use_cmm:        bool, optional; whether to apply CMM corrections to Elements
+		                that request it
+		                [Default: True]
+		use_sph:        bool, optional; whether to apply SPH factors to Elements that
+		                request it
+		                [Default: False]
+		elements:       dict of {key : treat.moc.Element}, optional; Elements
+		                requesting the features above
+		ids_fname:      str; file name of ids_to_keys pickle
+		                [Default: consants.IDS_PICKLE --> "ids_to_keys.pkl"]
+		tolerance:      float, optional; convergence criterion of the power iteration
+		                [Default: 1E-6]
+		save_results:   bool, optional; whether to export the fission rates to the
+		                results file in the export_path, as the "diffusion" code.
+		                [Default: True]
+		save_text:      bool, optional; whether to export the fission rates as
+		                text files as well
+		                [Default: False]
+		export_path:    str, optional; directory to export data to.
+		                [Default: "diffusion_data/"]
+		
+		Returns:
+		--------
+		results:        dict; the diffusion keff, and the OpenMC keff, its uncertainty,
+		                and the bias (pcm) when a statepoint is loaded.
+		                "fission_rates" has the normalized fission rate map on each
+		                mesh, as dict of {mesh name: array}, in the same format as
+		                the "montecarlo" rates of `run_openmoc()`.
+		"""
+		assert "universe" in self.domains, "Diffusion requires a universe MGXS Library."
+		assert self.lattice is not None, "Diffusion requires a lattice."
+		self._assert_statepoint()
+		if save_results:
+			if export_path[-1] != "/":
+				export_path += "/"
+			if not os.path.isdir(export_path):
+				os.mkdir(export_path)
+		self._timer = StageTimer()
+		_, xs_arrays = self._get_xs_arrays("universe", ngroups)
+		bc = get_boundary_conditions(self.geometry, self.symmetry)
+		solver = DiffusionSolver(self.lattice, xs_arrays, use_cmm=use_cmm, use_sph=use_sph,
+		                         elements=elements, division=division, bc=bc,
+		                         ids_fname=ids_fname)
+		with self._timer.stage("eigenvalue solve"):
+			keff = solver.solve(tolerance=tolerance)
+		self._timer.count(cells=int(np.prod(solver.shape)), iterations=solver.num_iterations)
+		print("Diffusion keff: {:8.6f}".format(keff))
+		results = {"keff": keff}
+		if self._statepoint_file:
+			keff_mc, uncert_mc = self.tally_reader.k_combined
+			bias = (keff - keff_mc)*1E5
+			results.update(keff_mc=float(keff_mc), uncert_mc=float(uncert_mc), bias=float(bias))
+			print("""\
+OpenMC keff:    {:8.6f} +/- {:8.6f}
+Diffusion keff: {:8.6f}
+Diffusion bias: {:.0f} [pcm]
+""".format(keff_mc, uncert_mc, keff, bias))
+		all_fission_rates = {self.shape_to_string(mesh_shape): solver.get_fission_rates(mesh_shape)
+		                     for mesh_shape in mesh_shapes}
+		if save_results:
+			with self._timer.stage("export"):
+				with ResultsFile(export_path + constants.RESULTS_FILE, 'w') as results_file:
+					results_file.set_attributes(ngroups=ngroups, domain="universe",
+					                            division=division, **results)
+					for mname, fission_rates in all_fission_rates.items():
+						results_file.write_fission_rates("diffusion", mname, fission_rates)
+						if save_text:
+							fname = export_path + \
+							        "{}groups_diffusion_fission_rates_{}".format(ngroups, mname)
+							np.savetxt(fname, fission_rates)
+				print("Diffusion results exported to", results_file.fname)
+			fname = export_path + constants.TIMINGS_FILE
+			self._timer.export_to_json(fname)
+		print(self._timer.get_report())
+		results["fission_rates"] = all_fission_rates
+		return results
+	
+	
+	def export_mg_model(self, ngroups, domain, export_path="multigroup/", **kwargs):
+		"""Export the MOC cross sections as an OpenMC multi-group model
+		
+		The MGXS are corrected and the elements subdivided exactly as in
+		`run_openmoc()` with the same kwargs. The model is written as an MGXS
+		HDF5 library with materials, geometry, and settings XML. The settings
+		follow the statepoint's particles and batches.
+		
+		Parameters:
+		-----------
+		ngroups:        int; number of energy groups to use
+		domain:         str, in {"universe", "cell", "material"};
+		                which domain type to use the MGXS Library for
+		export_path:    str, optional; directory to export the model to.
+		                [Default: "multigroup/"]
+		
+		kwargs:
+		-------
+		subdivide, use_sph, use_cmm, elements, ids_fname; see `run_openmoc()`
+		"""
+		domain = domain.lower()
+		assert domain in self.domains
+		self._assert_statepoint()
+		mglib, xs_arrays = self._get_xs_arrays(domain, ngroups)
+		core = Core(self.lattice, mglib, domain, xs_arrays=xs_arrays,
+		            universe_cache=self._moc_universes, **kwargs)
+		export = MultigroupExport(core, self.geometry, self.energy_groups[ngroups])
+		settings = openmc.Settings()
+		settings.particles = self.sp.n_particles
+		settings.batches = self.sp.n_batches
+		settings.inactive = self.sp.n_inactive
+		# Source box over the whole lattice: the exported geometry is the full core,
+		# even when OpenMOC only models the symmetric part of it.
+		width = self.lattice.pitch*self.lattice.shape
+		lower_left = np.array(self.lattice.lower_left, dtype=float)
+		upper_right = lower_left + width
+		bounds = [list(lower_left) + [constants.ZMIN2D], list(upper_right) + [constants.ZMAX2D]]
+		settings.source = openmc.Source(space=openmc.stats.Box(*bounds, only_fissionable=True))
+		export.export_to_xml(export_path, settings)
+		print("Multi-group model exported to", export_path)
+		return export
+	
+	
+	def update_openmoc_xs(self):
+		"""Update the MGXS of the prepared OpenMOC model in place
+		
+		The OpenMOC Geometry, TrackGenerator, and Solver are kept alive, and only
+		the cross sections of the existing Materials are recalculated. Use this
+		instead of `reset()` between runs that differ only in their corrections
+		(e.g., SPH iterations), after updating the Elements' SPH factors.
+		"""
+		assert self._prepped, "There is no prepared OpenMOC model to update."
+		self._core.update_material_xs()
+		self._run = False
+	
+	
+	def fork(self):
+		"""Get a copy of this case to run another simulation alongside this one
+		
+		The copy shares the geometry, tallies, statepoint, and the loaded
+		MGXS libraries and arrays with this case, but has its own OpenMOC model.
+		The converted OpenMOC universes are not shared, because each run
+		fills their cells with its own materials.
+		
+		Returns:
+		--------
+		BaseCase (or subclass), reset
+		"""
+		twin = copy.copy(self)
+		twin._moc_universes = {}
+		twin._timer = StageTimer()
+		twin.reset()
+		return twin
+	
+	
 	def reset(self):
 		"""Reset the variables that were changed when calling Case.run()"""
 		self._moc_geom = None
+		self._core = None
+		self._track_generator = None
 		self._sph_ids = None
 		self._moc_meshes = {}
 		self._solver = None
+		self._cmfd = None
+		self._cmfd_settings = None
+		self._cmfd_tuned = False
 		self._prepped = False
 		self._run = False
@@ -0,0 +1,163 @@
+# Batch
+#
+# Run many MOC simulations of one case in a single process
+
+import threading
+import traceback
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from .simulation import Simulation
+
+
+class CaseSpec:
+	"""Specification of one Simulation in a Batch
+
+	Parameters:
+	-----------
+	name:           str; unique name of the case
+	ngroups:        int; number of energy groups
+	solve_type:     str; "fsr" or "lsr"
+	mesh_shape:     tuple of (nx, ny); CMFD mesh shape
+	homogeneous:    bool; whether to run homogeneous or heterogeneous
+	use_sph:        bool, optional; whether to apply SPH factors
+	                [Default: False]
+	**attributes:   Simulation attributes to set, e.g., `elements`,
+	                `save_suffix`, `nazim`, or `plot`
+	"""
+	def __init__(self, name, ngroups, solve_type, mesh_shape, homogeneous,
+	             use_sph=False, **attributes):
+		self.name = name
+		self.ngroups = ngroups
+		self.solve_type = solve_type
+		self.mesh_shape = tuple(mesh_shape)
+		self.homogeneous = homogeneous
+		self.use_sph = use_sph
+		self.attributes = attributes
+
+	def __repr__(self):
+		return "CaseSpec({})".format(self.name)
+
+	def get_simulation(self, case):
+		"""Create the Simulation of this spec on a (shared) case"""
+		sim = Simulation(case, self.ngroups, self.solve_type, self.mesh_shape,
+		                 self.homogeneous, use_sph=self.use_sph)
+		for attr, value in self.attributes.items():
+			if not hasattr(sim, attr):
+				raise AttributeError("Simulation has no attribute: {}".format(attr))
+			setattr(sim, attr, value)
+		return sim
+
+
+class Batch:
+	"""Run several simulations of one case, sharing everything they can
+
+	Launching one process per simulation re-imports OpenMC and OpenMOC,
+	rebuilds the geometry, and reloads the statepoint and MGXS libraries
+	every time. A Batch does that once: all the simulations share the
+	geometry, the case, its loaded libraries and MGXS arrays, and (when run
+	one at a time) the converted OpenMOC universes.
+
+	With `threads` > 1, each worker thread runs its simulations on its own
+	`case.fork()`, which shares everything but the OpenMOC model. This only
+	speeds things up where the work releases the GIL (e.g., HDF5 reads, or an
+	OpenMOC built with SWIG threads), and uses `threads`*`nproc` threads in all.
+
+	Parameters:
+	-----------
+	case:           BaseCase with its statepoint loaded
+	threads:        int, optional; number of simulations to run at once
+	                [Default: 1 --> one after the other]
+	nproc:          int, optional; number of threads for each OpenMOC solve
+	                [Default: 4]
+	"""
+	def __init__(self, case, threads=1, nproc=4):
+		assert threads >= 1, "threads must be a positive integer."
+		self._case = case
+		self.threads = threads
+		self.nproc = nproc
+		self._specs = OrderedDict()
+		self._local = threading.local()
+		self.results = OrderedDict()
+		self.errors = OrderedDict()
+		self.timings = OrderedDict()
+
+	@property
+	def specs(self):
+		return self._specs
+
+	def add_spec(self, spec):
+		"""Add a CaseSpec to the batch"""
+		if spec.name in self._specs:
+			raise ValueError("A case named {} already exists.".format(spec.name))
+		self._specs[spec.name] = spec
+		return spec
+
+	def add_case(self, name, ngroups, solve_type, mesh_shape, homogeneous, **kwargs):
+		"""Add a case to the batch; see CaseSpec for the parameters"""
+		return self.add_spec(CaseSpec(name, ngroups, solve_type, mesh_shape,
+		                              homogeneous, **kwargs))
+
+	def add_automator_cases(self, automator, get_spec):
+		"""Add every case of an Automator sweep to the batch
+
+		Parameters:
+		-----------
+		automator:      Automator with all its variables set
+		get_spec:       callable of (case_name, case_vars) returning the CaseSpec
+		                of that case. This plays the part of the job script,
+		                turning the sweep variables into simulation settings.
+		"""
+		for case_name, case_vars in automator.get_cases().items():
+			self.add_spec(get_spec(case_name, case_vars))
+
+	def _get_case(self):
+		"""Get the case for this thread"""
+		if self.threads == 1:
+			return self._case
+		if not hasattr(self._local, "case"):
+			self._local.case = self._case.fork()
+		return self._local.case
+
+	def _run_spec(self, spec):
+		case = self._get_case()
+		case.reset()
+		sim = spec.get_simulation(case)
+		results = sim.run(nproc=self.nproc)
+		return results, sim.timings
+
+	def run(self):
+		"""Run every case in the batch
+
+		A case that raises an error is recorded in `errors`,
+		and the rest of the batch carries on.
+
+		Returns:
+		--------
+		OrderedDict of {case name: results of Simulation.run()}
+		"""
+		self.results = OrderedDict()
+		self.errors = OrderedDict()
+		self.timings = OrderedDict()
+		specs = list(self._specs.values())
+		if self.threads == 1:
+			outcomes = [self._try_spec(spec) for spec in specs]
+		else:
+			with ThreadPoolExecutor(max_workers=self.threads) as pool:
+				outcomes = list(pool.map(self._try_spec, specs))
+		for spec, (results, timings, error) in zip(specs, outcomes):
+			if error is None:
+				self.results[spec.name] = results
+				self.timings[spec.name] = timings
+			else:
+				self.errors[spec.name] = error
+		print("{} of {} cases succeeded.".format(len(self.results), len(specs)))
+		for name, error in self.errors.items():
+			print("\tFAILED: {}:\n{}".format(name, error))
+		return self.results
+
+	def _try_spec(self, spec):
+		try:
+			results, timings = self._run_spec(spec)
+		except Exception:
+			return None, None, traceback.format_exc()
+		return results, timings, None
@@ -0,0 +1,205 @@
+# CMFD Configuration
+#
+# Settings of OpenMOC's CMFD acceleration, and a pilot-solve tuner for them
+#
+# CMFD does not need the full MOC group structure: condensing it onto
+# one of the tabulated structures (e.g., 25 --> 4 groups) makes each
+# CMFD solve much cheaper. The coarse structures must nest in the fine one.
+
+import time
+import numpy as np
+from . import energy_groups
+from .condensation import get_group_mapping, groups_nest
+
+
+def get_cmfd_group_structure(fine_edges, coarse_edges):
+	"""Get the fine groups in each coarse CMFD group, for `Cmfd.setGroupStructure()`
+
+	Parameters:
+	-----------
+	fine_edges:     array of floats; ascending energy group edges of the MOC structure
+	coarse_edges:   array of floats; ascending energy group edges of the CMFD structure
+
+	Returns:
+	--------
+	list of lists of int; the (1-indexed) MOC groups of each CMFD group.
+	Both are "descending"; i.e., group 1 is the fastest.
+	"""
+	mapping = get_group_mapping(fine_edges, coarse_edges)
+	ncoarse = mapping[-1] + 1
+	structure = [[] for _ in range(ncoarse)]
+	# Reverse the ascending mapping into OpenMOC's order
+	for g, c in enumerate(mapping[::-1]):
+		structure[ncoarse - 1 - c].append(g + 1)
+	return structure
+
+
+def find_cmfd_groups(fine_edges):
+	"""Find the tabulated group structures that a fine structure condenses onto
+
+	Parameters:
+	-----------
+	fine_edges:     array of floats; ascending energy group edges (eV)
+
+	Returns:
+	--------
+	list of int; the numbers of groups of the coarser tabulated structures
+	that nest in `fine_edges`, from fewest to most groups
+	"""
+	nfine = len(fine_edges) - 1
+	found = []
+	for g in energy_groups.ALL_GROUP_NUMBERS:
+		if g >= nfine:
+			continue
+		coarse_edges = energy_groups.get_energy_groups(g).group_edges*1E6
+		if groups_nest(fine_edges, coarse_edges):
+			found.append(g)
+	return found
+
+
+def get_coarse_edges(fine_edges, cmfd_groups):
+	"""Get the edges (eV) of a tabulated CMFD group structure
+
+	Raises a ValueError if it does not nest in the fine structure.
+	"""
+	available = find_cmfd_groups(fine_edges)
+	if cmfd_groups not in available:
+		errstr = "No tabulated {}-group structure nests in the {}-group structure. " \
+		         "Available: {}"
+		raise ValueError(errstr.format(cmfd_groups, len(fine_edges) - 1, available))
+	return energy_groups.get_energy_groups(cmfd_groups).group_edges*1E6
+
+
+class CmfdSettings:
+	"""Settings of OpenMOC's CMFD acceleration
+
+	Parameters:
+	-----------
+	relaxation:     float, optional; SOR relaxation factor of the CMFD solver
+	                [Default: 1.5]
+	knearest:       int, optional; number of nearest CMFD cells to use
+	                when updating the MOC fluxes
+	                [Default: 3]
+	flux_update:    bool, optional; whether to update the MOC fluxes with
+	                the CMFD solution. Turning it off leaves only the diagnostics.
+	                [Default: True]
+	groups:         int, optional; number of groups of the tabulated structure
+	                to condense the CMFD problem onto
+	                [Default: None --> the MOC group structure]
+	"""
+	def __init__(self, relaxation=1.5, knearest=3, flux_update=True, groups=None):
+		assert relaxation > 0, "The relaxation factor must be positive."
+		assert int(knearest) >= 1, "KNearest must be at least 1."
+		self.relaxation = float(relaxation)
+		self.knearest = int(knearest)
+		self.flux_update = bool(flux_update)
+		self.groups = groups
+
+	def __repr__(self):
+		return "CmfdSettings(relaxation={}, knearest={}, flux_update={}, groups={})".format(
+			self.relaxation, self.knearest, self.flux_update, self.groups)
+
+	def copy(self, **changes):
+		"""Get a copy of these settings, with some of them changed"""
+		kwargs = self.as_dict()
+		kwargs.update(changes)
+		return CmfdSettings(**kwargs)
+
+	def as_dict(self):
+		return {"relaxation": self.relaxation, "knearest": self.knearest,
+		        "flux_update": self.flux_update, "groups": self.groups}
+
+	def apply(self, cmfd, fine_edges):
+		"""Apply these settings to an openmoc.Cmfd
+
+		Parameters:
+		-----------
+		cmfd:           openmoc.Cmfd
+		fine_edges:     array of floats; ascending energy group edges (eV)
+		                of the MOC group structure
+		"""
+		cmfd.setSORRelaxationFactor(self.relaxation)
+		cmfd.setKNearest(self.knearest)
+		cmfd.setFluxUpdateOn(self.flux_update)
+		if self.groups:
+			coarse_edges = get_coarse_edges(fine_edges, self.groups)
+			cmfd.setGroupStructure(get_cmfd_group_structure(fine_edges, coarse_edges))
+		else:
+			cmfd.setGroupStructure([[g + 1] for g in range(len(fine_edges) - 1)])
+
+
+def flatten_fluxes(solver):
+	"""Set a flat initial guess of the fluxes of an OpenMOC solver"""
+	geometry = solver.getGeometry()
+	num_fluxes = geometry.getNumFSRs()*geometry.getNumEnergyGroups()
+	solver.setFluxes(np.ones(num_fluxes))
+
+
+def tune(solver, cmfd, fine_edges, settings, relaxations=(1.0, 1.3, 1.5, 1.7),
+         knearests=(1, 3, 5), groups=None, threshold=1E-3, max_iters=100):
+	"""Choose the fastest CMFD settings from short pilot solves
+
+	The settings are searched one at a time: first the group structure,
+	then the relaxation factor, then KNearest, each keeping the best of the
+	ones before. Every pilot is an eigenvalue solve to a loose `threshold`
+	from a flat flux, timed by its wall time. The solver's convergence threshold
+	and flat fluxes are restored, and the best settings are left applied to `cmfd`.
+
+	Parameters:
+	-----------
+	solver:         openmoc.Solver; solver with the tracks and the CMFD geometry
+	cmfd:           openmoc.Cmfd; the solver geometry's CMFD
+	fine_edges:     array of floats; ascending energy group edges (eV)
+	                of the MOC group structure
+	settings:       CmfdSettings; the starting settings
+	relaxations:    iterable of float, optional; SOR relaxation factors to try
+	                [Default: (1.0, 1.3, 1.5, 1.7)]
+	knearests:      iterable of int, optional; KNearest values to try
+	                [Default: (1, 3, 5)]
+	groups:         iterable of int, optional; CMFD group structures to try.
+	                None keeps the MOC group structure.
+	                [Default: None --> every tabulated structure that nests]
+	threshold:      float, optional; convergence threshold of the pilot solves
+	                [Default: 1E-3]
+	max_iters:      int, optional; maximum number of iterations of a pilot solve
+	                [Default: 100]
+
+	Returns:
+	--------
+	best:           CmfdSettings; the fastest settings
+	trials:         list of (CmfdSettings, wall time (s), iterations) of every pilot
+	"""
+	if groups is None:
+		groups = [None] + find_cmfd_groups(fine_edges)
+	trials = []
+	timings = {}
+
+	def pilot(trial):
+		key = tuple(sorted(trial.as_dict().items()))
+		if key not in timings:
+			trial.apply(cmfd, fine_edges)
+			# Each pilot starts from scratch, not from the last pilot's fluxes
+			flatten_fluxes(solver)
+			wall0 = time.perf_counter()
+			solver.computeEigenvalue(max_iters=max_iters)
+			wall = time.perf_counter() - wall0
+			iterations = solver.getNumIterations()
+			print("CMFD pilot: {} --> {} iterations, {:.2f} s".format(trial, iterations, wall))
+			trials.append((trial, wall, iterations))
+			timings[key] = (wall, iterations)
+		return timings[key]
+
+	original_threshold = solver.getConvergenceThreshold()
+	solver.setConvergenceThreshold(threshold)
+	best = settings
+	try:
+		for name, values in (("groups", groups), ("relaxation", relaxations),
+		                     ("knearest", knearests)):
+			candidates = [best.copy(**{name: value}) for value in values]
+			best = min([best] + candidates, key=pilot)
+	finally:
+		solver.setConvergenceThreshold(original_threshold)
+		flatten_fluxes(solver)
+	best.apply(cmfd, fine_edges)
+	print("CMFD settings chosen:", best)
+	return best, trials
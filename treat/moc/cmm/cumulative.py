@@ -112,10 +112,9 @@ class CumulativeMigrationCorrection(object):
 		"""
 		assert len(transport_xs) == self.ngroups, \
 			"Wrong number of energy groups."
-		new_transport = np.zeros(self.ngroups)
-		for g, xs in enumerate(transport_xs.flatten()):
-			new_transport[g] = self.get_corrected_transport(g, xs)
-		return new_transport.flatten()
+		assert self._corrections is not None, \
+			"You must set the corrections first!"
+		return self._corrections*np.ravel(transport_xs)
 	
 	def get_corrected_scatter_mgxs(self, scatter_matrix_xs, transport_xs):
 		"""Get a CMM-corrected scatter matrix
@@ -133,9 +132,10 @@ class CumulativeMigrationCorrection(object):
 			"Wrong number of energy groups."
 		assert len(transport_xs) == self.ngroups, \
 			"Wrong number of energy groups."
-		new_scatter = np.array(scatter_matrix_xs)
-		for g, xs in enumerate(transport_xs.flatten()):
-			new_scatter[g, g] = self.get_corrected_scatter(
-				g, scatter_matrix_xs[g, g], old_transport=xs)
+		assert self._corrections is not None, \
+			"You must set the corrections first!"
+		new_scatter = np.array(scatter_matrix_xs, dtype=float)
+		diagonal = np.arange(self.ngroups)
+		new_scatter[diagonal, diagonal] += (self._corrections - 1)*np.ravel(transport_xs)
 		return new_scatter
 	
\ No newline at end of file
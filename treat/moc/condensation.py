@@ -0,0 +1,147 @@
+# Condensation
+#
+# Derive coarse-group and coarse-mesh results from fine tallies
+
+import numpy as np
+
+
+def get_group_mapping(fine_edges, coarse_edges, rtol=1E-6):
+	"""Map each fine energy group onto the coarse group containing it
+
+	Every coarse group edge must also be a fine group edge.
+
+	Parameters:
+	-----------
+	fine_edges:     array of floats; ascending energy group edges of the fine structure
+	coarse_edges:   array of floats; ascending energy group edges of the coarse structure
+	rtol:           float, optional; relative tolerance for matching the edges
+	                [Default: 1E-6]
+
+	Returns:
+	--------
+	array of ints, shape (nfine,); the coarse group of each fine group.
+	Groups are indexed the same way as the edges (i.e., ascending).
+	"""
+	fine_edges = np.asarray(fine_edges, dtype=float)
+	coarse_edges = np.asarray(coarse_edges, dtype=float)
+	# Index of the closest fine edge to each coarse edge
+	nearest = np.abs(coarse_edges[:, None] - fine_edges[None, :]).argmin(axis=1)
+	matched = np.isclose(fine_edges[nearest], coarse_edges, rtol=rtol, atol=0)
+	# An edge of 0 eV can only match itself
+	matched |= (fine_edges[nearest] == coarse_edges)
+	if not matched.all():
+		errstr = "Coarse group edges {} are not fine group edges."
+		raise ValueError(errstr.format(coarse_edges[~matched]))
+	if nearest[0] != 0 or nearest[-1] != len(fine_edges) - 1:
+		raise ValueError("The coarse and fine group structures have different bounds.")
+	widths = np.diff(nearest)
+	if (widths <= 0).any():
+		raise ValueError("Coarse group edges must be strictly ascending.")
+	return np.repeat(np.arange(len(widths)), widths)
+
+
+def groups_nest(fine_edges, coarse_edges):
+	"""Check whether a coarse group structure can be condensed from a fine one"""
+	try:
+		get_group_mapping(fine_edges, coarse_edges)
+	except ValueError:
+		return False
+	return True
+
+
+def condense_groups(values, mapping, axis=-1, std_dev=False):
+	"""Sum fine-group values into coarse groups
+
+	Standard deviations are combined in quadrature, which treats the fine
+	groups as uncorrelated.
+
+	Parameters:
+	-----------
+	values:         array of floats; fine-group reaction rates or their standard deviations
+	mapping:        array of ints; coarse group of each fine group,
+	                from `get_group_mapping()`
+	axis:           int, optional; the energy group axis of `values`
+	                [Default: -1]
+	std_dev:        bool, optional; whether `values` are standard deviations
+	                [Default: False]
+
+	Returns:
+	--------
+	array of floats; `values` with the energy axis condensed to the coarse groups
+	"""
+	values = np.moveaxis(np.asarray(values, dtype=float), axis, 0)
+	assert len(values) == len(mapping), \
+		"{} fine groups given for a {}-group mapping.".format(len(values), len(mapping))
+	if std_dev:
+		values = np.square(values)
+	coarse = np.zeros((mapping.max() + 1,) + values.shape[1:])
+	np.add.at(coarse, mapping, values)
+	if std_dev:
+		coarse = np.sqrt(coarse)
+	return np.moveaxis(coarse, 0, axis)
+
+
+def get_tallied_mesh_shapes(mesh_shapes):
+	"""Choose the meshes to tally so that every mesh can be summed from one of them
+
+	The meshes are split into chains that nest within each other, and only
+	the finest mesh of each chain is tallied. Meshes that nest within
+	nothing finer are tallied themselves, instead of a least common multiple
+	mesh with more bins than all the meshes together: e.g., for 19x19, 38x38,
+	76x76, and 95x95, only 76x76 and 95x95 are tallied.
+
+	Parameter:
+	----------
+	mesh_shapes:    iterable of tuples of ints, all with the same number of dimensions
+
+	Returns:
+	--------
+	dict of {mesh shape: the mesh shape to tally and sum it from}
+	"""
+	shapes = [tuple(int(n) for n in shape) for shape in mesh_shapes]
+	# Finest first, so each mesh can find the finest one it nests within
+	tallied = []
+	mapping = {}
+	for shape in sorted(set(shapes), key=lambda s: int(np.prod(s)), reverse=True):
+		for fine in tallied:
+			if all(f % c == 0 for f, c in zip(fine, shape)):
+				mapping[shape] = fine
+				break
+		else:
+			tallied.append(shape)
+			mapping[shape] = shape
+	return mapping
+
+
+def condense_mesh(values, coarse_shape, std_dev=False):
+	"""Sum the values on a fine mesh into the cells of a coarse mesh
+
+	The fine mesh must nest within the coarse mesh. Standard deviations are
+	combined in quadrature, which treats the fine cells as uncorrelated.
+
+	Parameters:
+	-----------
+	values:         array of floats; its leading axes are the fine mesh. Any
+	                trailing axes (e.g., energy groups) are kept as they are.
+	coarse_shape:   tuple of ints; the shape of the coarse mesh
+	std_dev:        bool, optional; whether `values` are standard deviations
+	                [Default: False]
+
+	Returns:
+	--------
+	array of floats with shape `coarse_shape`, followed by the trailing axes of `values`
+	"""
+	values = np.asarray(values, dtype=float)
+	ndim = len(coarse_shape)
+	blocks = ()
+	for f, c in zip(values.shape[:ndim], coarse_shape):
+		assert f % c == 0, \
+			"Mesh {} does not nest within {}.".format(values.shape[:ndim], tuple(coarse_shape))
+		blocks += (c, f // c)
+	if std_dev:
+		values = np.square(values)
+	coarse = values.reshape(blocks + values.shape[ndim:])
+	coarse = coarse.sum(axis=tuple(range(1, 2*ndim, 2)))
+	if std_dev:
+		coarse = np.sqrt(coarse)
+	return coarse
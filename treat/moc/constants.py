@@ -3,3 +3,7 @@ import os as _os
 _root_name = _os.path.dirname(_os.path.dirname(_os.path.realpath(__file__)))
 _sys.path.append(_root_name)
 from constants import *
+
+# Default OpenMOC track laydown
+NAZIM = 32      # number of azimuthal angles
+DAZIM = 0.1     # cm; azimuthal ray spacing
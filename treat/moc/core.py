@@ -3,11 +3,14 @@
 # Class for data about the MOC representation of the TREAT core
 
 import pickle
+import hashlib
 import openmc
 from openmc import openmoc_compatible as compatible
 import openmoc
 from openmoc import checkvalue as cv
 from . import constants
+from .mgxs_arrays import MgxsArrays
+from .correction_operator import CorrectionOperator
 
 
 class Core:
@@ -30,10 +33,17 @@ class Core:
 	elements:           dict of {key : treat.moc.Element}; Elements requesting the features above
 	ids_fname:          str; file name of ids_to_keys pickle
 	                    [Default: consants.IDS_PICKLE --> "ids_to_keys.pkl"]
+	xs_arrays:          moc.MgxsArrays; the cross sections of `xslib`, already extracted.
+	                    Pass these in to share them between Core instances.
+	                    [Default: None --> extract them from `xslib`]
+	universe_cache:     dict; OpenMOC universes already converted from OpenMC.
+	                    Pass the same dict in to share them between Core instances.
+	                    [Default: None --> convert them all again]
 	"""
 	def __init__(self, openmc_lattice, xslib, domain_type,
 	             subdivide=False, use_sph=False, use_cmm=False, crdrings=False, fsrsects=False,
-	             elements=None, ids_fname=constants.IDS_PICKLE, *args, **kwargs):
+	             elements=None, ids_fname=constants.IDS_PICKLE, xs_arrays=None, universe_cache=None,
+	             *args, **kwargs):
 		cv.check_type("openmc_lattice", openmc_lattice, openmc.RectLattice)
 		
 		ids_to_keys_pickle = open(ids_fname, 'rb')
@@ -45,6 +55,12 @@ class Core:
 		self._nx, self._ny = openmc_lattice.shape
 		self._xslib = xslib
 		self._ngroups = xslib.energy_groups.num_groups
+		if xs_arrays is None:
+			xs_arrays = MgxsArrays(xslib, lattice=openmc_lattice)
+		self._xs_arrays = xs_arrays
+		if universe_cache is None:
+			universe_cache = {}
+		self._universe_cache = universe_cache
 		self._domain_type = domain_type
 		self._moc_cell = openmoc.Cell()
 		self._moc_universe = openmoc.Universe()
@@ -56,6 +72,58 @@ class Core:
 		self._elements = {}
 		if elements is not None:
 			self._elements.update(elements)
+		# {material id: (openmoc.Material, domain id, Element)} for in-place updates
+		self._moc_materials = {}
+		# {(Element key, MGXS digest): openmoc.Material} to share identical Materials
+		self._interned_materials = {}
+	
+	@property
+	def openmc_lattice(self):
+		return self._openmc_lattice
+	
+	@property
+	def domain_type(self):
+		return self._domain_type
+	
+	@property
+	def ngroups(self):
+		return self._ngroups
+	
+	def get_element(self, universe_id):
+		"""Get the Element for a lattice universe, or None if it has none"""
+		return self._elements.get(self.ids_to_keys[universe_id])
+	
+	def get_corrected_xsdict(self, domain_id, elem=None):
+		"""Get the MGXS of a domain as they are applied to the MOC Materials
+		
+		Parameters:
+		-----------
+		domain_id:      int; ID for this Cell, Material, or Universe
+		elem:           treat.moc.Element, optional; element containing
+		                information about SPH and CMM
+		
+		Returns:
+		--------
+		xsdict:         dict of {rxn : array of MGXS}
+		"""
+		corrected = self._get_corrected_xs([domain_id], [elem])
+		return {rxn: xs[0] for rxn, xs in corrected.items()}
+	
+	def _get_corrected_xs(self, domain_ids, elems):
+		"""Get the corrected MGXS of many domains at once
+		
+		Parameters:
+		-----------
+		domain_ids:     list of int; IDs of the Cells, Materials, or Universes
+		elems:          list of treat.moc.Element or None; the Element of each domain
+		
+		Returns:
+		--------
+		dict of {rxn : array of MGXS}, with one row per domain
+		"""
+		operator = CorrectionOperator(self._ngroups, elems, self.use_cmm, self.use_sph)
+		rows = self._xs_arrays.get_rows(domain_ids)
+		return operator.apply_to_arrays(self._xs_arrays, rows)
 	
 	def _fetch_domain_xsdict(self, domain_id):
 		"""Get the cross section dictionary for this domain
@@ -69,45 +137,99 @@ class Core:
 		xsdict:         dict of {rxn : array of MGXS}
 		
 		"""
-		xsdict = {}
-		for rxn in constants.MOC_TYPES:
-			xsdict[rxn] = self._xslib.get_mgxs(domain_id, rxn).get_xs()
-		return xsdict
+		return self._xs_arrays.get_xsdict(domain_id)
 	
-	def _populate_material_xs(self, material, xsdict, elem):
+	@staticmethod
+	def _populate_material_xs(material, xsdict):
 		"""Set the MGXS for the specified material
 		
 		Parameters:
 		-----------
 		material:       openmoc.Material
-		xsdict:         dict of {rxn : array of MGXS}
+		xsdict:         dict of {rxn : array of MGXS}; the corrected MGXS
+		
+		"""
+		material.setSigmaS(xsdict["consistent nu-scatter matrix"].flatten())
+		material.setSigmaT(xsdict["nu-transport"].flatten())
+		material.setSigmaF(xsdict["fission"].flatten())
+		material.setNuSigmaF(xsdict["nu-fission"].flatten())
+		material.setChi(xsdict["chi"].flatten())
+	
+	def _register_material(self, material, domain_id, elem):
+		"""Remember which domain and Element a Material's MGXS came from"""
+		self._moc_materials[material.getId()] = (material, domain_id, elem)
+	
+	def _get_moc_material(self, domain_id, elem, name):
+		"""Get an OpenMOC Material for the (corrected) MGXS of a domain
+		
+		Domains with identical cross sections, corrected by the same Element,
+		share a single Material. The MGXS of new Materials are set all at once
+		by `update_material_xs()`.
+		
+		Parameters:
+		-----------
+		domain_id:      int; ID for this Cell, Material, or Universe
 		elem:           treat.moc.Element containing information about SPH and CMM
+		name:           str; name to give the Material if a new one is created
+		
+		Returns:
+		--------
+		openmoc.Material
+		"""
+		xsdict = self._fetch_domain_xsdict(domain_id)
+		sha = hashlib.sha1()
+		for rxn in constants.MOC_TYPES:
+			sha.update(xsdict[rxn].tobytes())
+		key = (elem.key if elem else None, sha.hexdigest())
+		if key not in self._interned_materials:
+			material = openmoc.Material(name=name)
+			material.setNumEnergyGroups(self._ngroups)
+			self._register_material(material, domain_id, elem)
+			self._interned_materials[key] = material
+		return self._interned_materials[key]
+	
+	def _get_converted_universe(self, universe):
+		"""Get an OpenMC universe converted to OpenMOC, and its material cells
+		
+		Conversions are cached by universe ID. The domain ID and name of each
+		cell's original fill are kept, because the fills get replaced.
+		
+		Parameter:
+		----------
+		universe:       openmc.Universe
+		
+		Returns:
+		--------
+		moc_univ:       openmoc.Universe
+		cell_info:      list of (cell id, openmoc.Cell, material id, material name)
+		"""
+		if universe.id not in self._universe_cache:
+			moc_univ = compatible.get_openmoc_universe(universe)
+			# Find all the cells to set XS for in this universe
+			_tmp_geom = openmoc.Geometry()
+			_tmp_geom.setRootUniverse(moc_univ)
+			cell_info = []
+			for c, cell in _tmp_geom.getAllMaterialCells().items():
+				mat = cell.getFillMaterial()
+				cell_info.append((c, cell, mat.getId(), mat.getName()))
+			del _tmp_geom
+			self._universe_cache[universe.id] = (moc_univ, cell_info)
+		return self._universe_cache[universe.id]
+	
+	def update_material_xs(self):
+		"""Re-apply the MGXS to the existing OpenMOC Materials
 		
+		The CMM and SPH corrections of every Material are applied in a single pass.
+		Use this after changing the SPH factors or CMM corrections of the Elements
+		to update the cross sections in place, without rebuilding the lattice.
 		"""
-		scatter = xsdict["consistent nu-scatter matrix"]
-		transport = xsdict["nu-transport"]
-		fission = xsdict["fission"]
-		nu_fission = xsdict["nu-fission"]
-		chi = xsdict["chi"]
-		# Apply CMM and/or SPH factors as appropriate
-		if elem:
-			if self.use_cmm and (self._ngroups in elem.cmm):
-				cmmc = elem.cmm[self._ngroups]
-				scatter = cmmc.get_corrected_scatter_mgxs(scatter, transport)
-				transport = cmmc.get_corrected_transport_mgxs(transport)
-			if self.use_sph and (self._ngroups in elem.sph):
-				sphf = elem.sph[self._ngroups]
-				# Correct these 4, but not chi
-				scatter = sphf.get_corrected_mgxs(scatter)
-				transport = sphf.get_corrected_mgxs(transport)
-				fission = sphf.get_corrected_mgxs(fission)
-				nu_fission = sphf.get_corrected_mgxs(nu_fission)
-		# Set the MGXS themselves
-		material.setSigmaS(scatter.flatten())
-		material.setSigmaT(transport.flatten())
-		material.setSigmaF(fission.flatten())
-		material.setNuSigmaF(nu_fission.flatten())
-		material.setChi(chi.flatten())
+		entries = list(self._moc_materials.values())
+		if not entries:
+			return
+		corrected = self._get_corrected_xs([domain_id for _, domain_id, _ in entries],
+		                                   [elem for _, _, elem in entries])
+		for i, (material, _, _) in enumerate(entries):
+			self._populate_material_xs(material, {rxn: xs[i] for rxn, xs in corrected.items()})
 	
 	def _get_universe_cell(self, uid, elem=None):
 		"""Create a new MOC cell containing a homogenized core element
@@ -125,10 +247,7 @@ class Core:
 		"""
 		new_cell = openmoc.Cell(name="u{}-cell".format(uid))
 		name = "Homogenized Material for Universe {}".format(uid)
-		new_mat = openmoc.Material(name=name)
-		new_mat.setNumEnergyGroups(self._ngroups)
-		xsdict = self._fetch_domain_xsdict(uid)
-		self._populate_material_xs(new_mat, xsdict, elem)
+		new_mat = self._get_moc_material(uid, elem, name)
 		new_cell.setFill(new_mat)
 		return new_cell
 	
@@ -182,30 +301,25 @@ class Core:
 				elem = None
 			# Stage 3: Apply MGXS
 			if self._domain_type in ("cell", "material"):
-				moc_univ = compatible.get_openmoc_universe(universe)
-				# Find all the cells to set XS for in this universe
-				_tmp_geom = openmoc.Geometry()
-				_tmp_geom.setRootUniverse(moc_univ)
-				material_cells = _tmp_geom.getAllMaterialCells()
-				for c, cell in material_cells.items():
+				moc_univ, cell_info = self._get_converted_universe(universe)
+				for c, cell, mat_id, mat_name in cell_info:
 					if self._domain_type == "material":
-						mat = cell.getFillMaterial()
-						domain_id = mat.getId()
+						domain_id = mat_id
 					else:
-						mat = openmoc.Material()
-						mat.setName(cell.getFillMaterial().getName())
 						domain_id = c
-					mat.setNumEnergyGroups(self._ngroups)
-					xsdict = self._fetch_domain_xsdict(domain_id)
-					self._populate_material_xs(mat, xsdict, elem)
+					mat = self._get_moc_material(domain_id, elem, mat_name)
 					cell.setFill(mat)
 					# Apply special features to the control rods.
-					if elem and ("<ROD>" in cell.getName()):
-						if self.crdrings:
+					# Cached cells may carry them from a previous build, so always set them.
+					if "<ROD>" in cell.getName():
+						if elem and self.crdrings:
 							cell.setNumRings(elem.crdrings)
-						if self.fsrsects:
+						else:
+							cell.setNumRings(0)
+						if elem and self.fsrsects:
 							cell.setNumSectors(elem.fsrsects)
-				del _tmp_geom
+						else:
+							cell.setNumSectors(0)
 			elif self._domain_type == "universe":
 				# Make a homogenized universe
 				new_cell = self._get_universe_cell(u, elem)
@@ -227,6 +341,8 @@ class Core:
 				universe = universe_array[j][i]
 				moc_univ = ids_to_moc[universe.id]
 				moc_universes[j][i] = moc_univ
+		# Set the MGXS of all the Materials at once
+		self.update_material_xs()
 		
 		moc_lat = openmoc.Lattice()
 		moc_lat.setWidth(*self._openmc_lattice.pitch)
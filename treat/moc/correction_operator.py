@@ -0,0 +1,136 @@
+# Correction Operator
+#
+# CMM and SPH corrections of many domains' MGXS at once
+
+import numpy as np
+from .cmm.corrections import CORRECTIONS
+
+
+class CorrectionOperator:
+	"""Fused CMM and SPH corrections for the dense MGXS of many domains
+
+	Each domain (row of a moc.MgxsArrays) is corrected by the Element it belongs
+	to, if any. The corrections of each element type are gathered into one row of
+	a table of CMM transport ratios and one row of a table of SPH factors, and
+	every domain indexes its type's row. The corrections are then applied as
+	broadcast operations over the [domain, G] and [domain, G, G] arrays:
+
+		transport' = f * r * transport
+		scatter'   = (scatter + diag((r - 1) * transport)) * f[group_out]
+		fission'   = f * fission,   nu_fission' = f * nu_fission
+
+	which is the same as applying each Element's CumulativeMigrationCorrection
+	and then its SuperhomogeneisationFactors. Chi is never corrected.
+
+	Energy groups are "descending"; i.e., group 0 is the fastest.
+
+	Parameters:
+	-----------
+	ngroups:        int; number of energy groups
+	elements:       iterable of treat.moc.Element or None; the Element of each domain
+	use_cmm:        bool, optional; whether to apply the CMM corrections of the Elements
+	                [Default: False]
+	use_sph:        bool, optional; whether to apply the SPH factors of the Elements
+	                [Default: False]
+	default_cmm:    bool, optional; whether Elements without CMM corrections of their
+	                own take the ones of their key in `cmm.corrections.CORRECTIONS`
+	                [Default: False]
+
+	Attributes:
+	-----------
+	keys:           list of str; the element types, in the order of the table rows
+	type_index:     array of int, shape (ndomains,); the table row of each domain,
+	                or -1 for domains with no Element
+	cmm_table:      array of floats, shape (ntypes, ngroups); CMM transport ratios
+	sph_table:      array of floats, shape (ntypes, ngroups); SPH factors
+	"""
+	def __init__(self, ngroups, elements, use_cmm=False, use_sph=False, default_cmm=False):
+		self.ngroups = ngroups
+		self.use_cmm = use_cmm
+		self.use_sph = use_sph
+		self.keys = []
+		type_elements = []
+		type_index = []
+		for elem in elements:
+			if elem is None:
+				type_index.append(-1)
+				continue
+			if elem.key not in self.keys:
+				self.keys.append(elem.key)
+				type_elements.append(elem)
+			type_index.append(self.keys.index(elem.key))
+		self.type_index = np.array(type_index, dtype=int)
+		# The last row is the identity, for the domains without an Element
+		ntypes = len(self.keys)
+		self.cmm_table = np.ones((ntypes + 1, ngroups))
+		self.sph_table = np.ones((ntypes + 1, ngroups))
+		for t, elem in enumerate(type_elements):
+			if use_cmm:
+				if ngroups in elem.cmm:
+					self.cmm_table[t] = elem.cmm[ngroups].corrections
+				elif default_cmm and ngroups in CORRECTIONS.get(elem.key, {}):
+					self.cmm_table[t] = CORRECTIONS[elem.key][ngroups].corrections
+			if use_sph and ngroups in elem.sph:
+				self.sph_table[t] = elem.sph[ngroups].factors
+
+	def __len__(self):
+		return len(self.type_index)
+
+	@property
+	def cmm_ratios(self):
+		"""array of floats, shape (ndomains, ngroups); CMM transport ratio of each domain"""
+		return self.cmm_table[self.type_index]
+
+	@property
+	def sph_factors(self):
+		"""array of floats, shape (ndomains, ngroups); SPH factors of each domain"""
+		return self.sph_table[self.type_index]
+
+	def apply(self, transport, scatter, fission, nu_fission, chi):
+		"""Correct the MGXS of every domain
+
+		Parameters:
+		-----------
+		transport:      array of floats, shape (ndomains, G); nu-transport MGXS
+		scatter:        array of floats, shape (ndomains, G, G); consistent
+		                nu-scatter matrices, indexed by [group_in, group_out]
+		fission:        array of floats, shape (ndomains, G)
+		nu_fission:     array of floats, shape (ndomains, G)
+		chi:            array of floats, shape (ndomains, G)
+
+		Returns:
+		--------
+		dict of {rxn : array of MGXS}; new arrays of the corrected MGXS,
+		for the MOC reaction types
+		"""
+		ratios = self.cmm_ratios
+		factors = self.sph_factors
+		diagonal = np.arange(self.ngroups)
+		new_scatter = np.array(scatter, dtype=float)
+		new_scatter[:, diagonal, diagonal] += (ratios - 1)*transport
+		new_scatter *= factors[:, None, :]
+		return {"nu-transport": factors*ratios*transport,
+		        "consistent nu-scatter matrix": new_scatter,
+		        "fission": factors*fission,
+		        "nu-fission": factors*nu_fission,
+		        "chi": np.array(chi, dtype=float)}
+
+	def apply_to_arrays(self, xs_arrays, rows=None):
+		"""Correct the MGXS of some rows of a moc.MgxsArrays
+
+		Parameters:
+		-----------
+		xs_arrays:      moc.MgxsArrays
+		rows:           array of int, optional; the row of each of this operator's
+		                domains in `xs_arrays`
+		                [Default: None --> all the rows, in order]
+
+		Returns:
+		--------
+		dict of {rxn : array of MGXS}; see `apply()`
+		"""
+		if rows is None:
+			rows = slice(None)
+		return self.apply(xs_arrays.transport[rows], xs_arrays.scatter[rows],
+		                  xs_arrays.fission[rows], xs_arrays.nu_fission[rows],
+		                  xs_arrays.chi[rows])
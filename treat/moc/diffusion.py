@@ -0,0 +1,344 @@
+# Diffusion
+#
+# Coarse-mesh finite-difference diffusion eigenvalue solver for the TREAT lattice
+#
+# A cheap deterministic counterpart to the OpenMOC runs: the homogenized
+# ("universe" domain) cross sections of each lattice element are used as-is,
+# with diffusion coefficients D = 1/(3*transport) taken from the CMM-corrected
+# transport cross sections of the Elements that have CMM corrections.
+
+import pickle
+import numpy as np
+import scipy.sparse as sps
+import scipy.sparse.linalg as spla
+from . import constants
+from . import condensation
+from .correction_operator import CorrectionOperator
+
+BOUNDARY_CONDITIONS = ("vacuum", "reflective")
+
+
+def get_boundary_conditions(geometry, symmetry=1):
+	"""Get the boundary conditions of the full core from an OpenMC geometry
+
+	Parameters:
+	-----------
+	geometry:       openmc.Geometry with a cell named "root cell", bounded
+	                by XPlanes and YPlanes (see TreatLattice.get_openmc_geometry())
+	symmetry:       int, optional; symmetry of the geometry. The reflective planes
+	                through the center of a half or quarter core are replaced with
+	                the boundary condition across from them.
+	                [Default: 1 --> the full core]
+
+	Returns:
+	--------
+	tuple of 4 str; boundary conditions for (xmin, xmax, ymin, ymax)
+	"""
+	root_cell = geometry.get_cells_by_name(name="root cell")[0]
+	xplanes = []
+	yplanes = []
+	for surf in root_cell.region.get_surfaces().values():
+		if surf.type == "x-plane":
+			xplanes.append((surf.x0, surf.boundary_type))
+		elif surf.type == "y-plane":
+			yplanes.append((surf.y0, surf.boundary_type))
+	assert len(xplanes) == 2 and len(yplanes) == 2, \
+		"The root cell must be bounded by 2 XPlanes and 2 YPlanes."
+	(_, xmin), (_, xmax) = sorted(xplanes)
+	(_, ymin), (_, ymax) = sorted(yplanes)
+	if symmetry >= 2:
+		xmin = xmax
+	if symmetry == 4:
+		ymin = ymax
+	return xmin, xmax, ymin, ymax
+
+
+class DiffusionSolver:
+	"""Multigroup finite-difference diffusion solver on the TREAT lattice
+
+	Each lattice element is divided into `division`x`division` square mesh
+	cells of the element's homogenized cross sections. Neighboring cells are
+	coupled through the harmonic mean of their diffusion coefficients, and
+	vacuum edges use the Marshak condition. The eigenvalue is found by power
+	iteration on the LU-factorized loss operator.
+
+	Energy groups are "descending"; i.e., group 0 is the fastest.
+	Mesh arrays are in map order: [row (y, descending), column (x, ascending)].
+
+	Required Parameters:
+	--------------------
+	openmc_lattice:     openmc.RectLattice; the 2D core lattice (e.g., a TreatLattice)
+	xs_arrays:          moc.MgxsArrays of a "universe" domain MGXS Library
+
+	Optional Parameters:
+	--------------------
+	use_cmm:            bool; whether to apply CMM corrections to Elements that request it
+	                    [Default: True]
+	use_sph:            bool; whether to apply SPH factors to Elements that request it
+	                    [Default: False]
+	elements:           dict of {key : treat.moc.Element}; Elements requesting the features above
+	                    [Default: None]
+	division:           int; number of mesh cells per lattice element along each axis
+	                    [Default: 1]
+	bc:                 iterable of 4 str; "vacuum" or "reflective" boundary conditions
+	                    for (xmin, xmax, ymin, ymax), in the same order as the `bc`
+	                    of TreatLattice.get_openmc_geometry()
+	                    [Default: "vacuum" on all 4 edges]
+	ids_fname:          str; file name of ids_to_keys pickle
+	                    [Default: consants.IDS_PICKLE --> "ids_to_keys.pkl"]
+	"""
+	def __init__(self, openmc_lattice, xs_arrays, use_cmm=True, use_sph=False,
+	             elements=None, division=1, bc=("vacuum",)*4, ids_fname=constants.IDS_PICKLE):
+		assert int(division) == division and division >= 1, \
+			"division must be a positive integer."
+		bc = tuple(bc)
+		assert len(bc) == 4, "There must be 4 boundary conditions."
+		for b in bc:
+			assert b in BOUNDARY_CONDITIONS, "Unknown boundary condition: {}".format(b)
+		with open(ids_fname, 'rb') as ids_to_keys_pickle:
+			self.ids_to_keys = pickle.load(ids_to_keys_pickle)
+		self._openmc_lattice = openmc_lattice
+		self._xs_arrays = xs_arrays
+		self._ngroups = xs_arrays.ngroups
+		self.use_cmm = use_cmm
+		self.use_sph = use_sph
+		self._elements = {}
+		if elements is not None:
+			self._elements.update(elements)
+		self.division = int(division)
+		self.bc = bc
+		self.width = openmc_lattice.pitch[0]/self.division
+		self.keff = None
+		self.flux = None
+		self.num_iterations = 0
+
+	@property
+	def ngroups(self):
+		return self._ngroups
+
+	@property
+	def shape(self):
+		"""Shape of the diffusion mesh, in map order: (rows, columns)"""
+		ny, nx = np.shape(self._openmc_lattice.universes)[-2:]
+		return ny*self.division, nx*self.division
+
+	def _get_cell_xs(self):
+		"""Get the corrected cross sections of every mesh cell
+
+		Returns:
+		--------
+		dict of {rxn : array of MGXS}; the cross sections of the mesh cells,
+		indexed by [row, column, (group_in,) group]
+		"""
+		universe_array = self._openmc_lattice.universes
+		ids = np.array([[u.id for u in row] for row in universe_array])
+		unique_ids, kinds = np.unique(ids, return_inverse=True)
+		kinds = kinds.reshape(ids.shape)
+		elems = [self._elements.get(self.ids_to_keys[u]) for u in unique_ids]
+		operator = CorrectionOperator(self._ngroups, elems, self.use_cmm, self.use_sph)
+		corrected = operator.apply_to_arrays(self._xs_arrays, self._xs_arrays.get_rows(unique_ids))
+		kinds = np.repeat(np.repeat(kinds, self.division, axis=0), self.division, axis=1)
+		return {rxn: xs[kinds] for rxn, xs in corrected.items()}
+
+	def _get_leakage_operator(self, diffusion):
+		"""Get the finite-difference leakage operator of every group
+
+		Parameters:
+		-----------
+		diffusion:      array of floats, cm, indexed by [row, column, group];
+		                diffusion coefficients of the mesh cells
+
+		Returns:
+		--------
+		scipy.sparse.coo_matrix of the leakage terms, indexed by (g*ncells + cell)
+		"""
+		ny, nx, ng = diffusion.shape
+		ncells = ny*nx
+		h = self.width
+		index = np.arange(ncells*ng).reshape(ng, ny, nx)
+		dcells = np.moveaxis(diffusion, -1, 0)
+		diagonal = np.zeros((ng, ny, nx))
+		rows = []
+		cols = []
+		vals = []
+		# Interior faces: between columns, then between rows
+		for axis in (2, 1):
+			lo = [slice(None)]*3
+			hi = [slice(None)]*3
+			lo[axis] = slice(None, -1)
+			hi[axis] = slice(1, None)
+			lo = tuple(lo)
+			hi = tuple(hi)
+			da = dcells[lo]
+			db = dcells[hi]
+			coupling = 2*da*db/(da + db)/h**2
+			diagonal[lo] += coupling
+			diagonal[hi] += coupling
+			for a, b in ((lo, hi), (hi, lo)):
+				rows.append(index[a].ravel())
+				cols.append(index[b].ravel())
+				vals.append(-coupling.ravel())
+		# Vacuum edges. Rows are in map order, so row 0 is ymax.
+		edges = ((2, 0), (2, -1), (1, -1), (1, 0))  # xmin, xmax, ymin, ymax
+		for (axis, i), b in zip(edges, self.bc):
+			if b != "vacuum":
+				continue
+			edge = [slice(None)]*3
+			edge[axis] = i
+			edge = tuple(edge)
+			d = dcells[edge]
+			diagonal[edge] += 2*d/(h*(h + 4*d))
+		rows.append(index.ravel())
+		cols.append(index.ravel())
+		vals.append(diagonal.ravel())
+		n = ncells*ng
+		return sps.coo_matrix((np.concatenate(vals), (np.concatenate(rows), np.concatenate(cols))),
+		                      shape=(n, n))
+
+	def get_operators(self):
+		"""Get the loss and fission operators of the eigenvalue problem
+
+		The unknowns are the mesh cell fluxes, indexed by (g*ncells + cell),
+		where the cells are numbered in map order.
+
+		Returns:
+		--------
+		loss:           scipy.sparse.csc_matrix; leakage + collision - in-scatter
+		fission:        scipy.sparse.csr_matrix; chi x nu-fission
+		"""
+		xs = self._get_cell_xs()
+		transport = xs["nu-transport"]
+		ny, nx, ng = transport.shape
+		ncells = ny*nx
+		n = ncells*ng
+		cells = np.arange(ncells)
+		with np.errstate(divide="ignore"):
+			diffusion = 1.0/(3.0*transport)
+		assert np.isfinite(diffusion).all(), "Every mesh cell must have a transport cross section."
+		loss = self._get_leakage_operator(diffusion).tocsr()
+		# Collision and in-scatter; the scatter matrices are [group_in, group_out]
+		scatter = xs["consistent nu-scatter matrix"].reshape(ncells, ng, ng)
+		transport = transport.reshape(ncells, ng)
+		rows = []
+		cols = []
+		vals = []
+		for g in range(ng):
+			rows.append(g*ncells + cells)
+			cols.append(g*ncells + cells)
+			vals.append(transport[:, g])
+			for gp in range(ng):
+				rows.append(g*ncells + cells)
+				cols.append(gp*ncells + cells)
+				vals.append(-scatter[:, gp, g])
+		loss = loss + sps.csr_matrix((np.concatenate(vals), (np.concatenate(rows), np.concatenate(cols))),
+		                             shape=(n, n))
+		# Fission
+		chi = xs["chi"].reshape(ncells, ng)
+		nu_fission = xs["nu-fission"].reshape(ncells, ng)
+		rows = []
+		cols = []
+		vals = []
+		for g in range(ng):
+			for gp in range(ng):
+				rows.append(g*ncells + cells)
+				cols.append(gp*ncells + cells)
+				vals.append(chi[:, g]*nu_fission[:, gp])
+		fission = sps.csr_matrix((np.concatenate(vals), (np.concatenate(rows), np.concatenate(cols))),
+		                         shape=(n, n))
+		self._fission_xs = xs["fission"]
+		self._nu_fission_xs = xs["nu-fission"]
+		return loss.tocsc(), fission
+
+	def solve(self, tolerance=1E-6, max_iters=1000, keff=1.0):
+		"""Find the fundamental mode by power iteration
+
+		Parameters:
+		-----------
+		tolerance:      float, optional; convergence criterion for both the change
+		                in keff and the RMS relative change in the fission source
+		                [Default: 1E-6]
+		max_iters:      int, optional; maximum number of power iterations
+		                [Default: 1000]
+		keff:           float, optional; initial guess for the eigenvalue
+		                [Default: 1.0]
+
+		Returns:
+		--------
+		float; keff
+		"""
+		loss, fission = self.get_operators()
+		lu = spla.splu(loss)
+		flux = np.ones(loss.shape[0])
+		source = fission.dot(flux)
+		assert source.any(), "There is no fissile material in the lattice."
+		source *= keff/source.sum()
+		for i in range(1, max_iters + 1):
+			flux = lu.solve(source/keff)
+			new_source = fission.dot(flux)
+			new_keff = keff*new_source.sum()/source.sum()
+			new_source *= new_keff/new_source.sum()
+			fissile = source > 0
+			ds = (new_source[fissile] - source[fissile])/source[fissile]
+			converged = abs(new_keff - keff) < tolerance and np.sqrt(np.mean(ds**2)) < tolerance
+			keff = new_keff
+			source = new_source
+			if converged:
+				break
+		else:
+			raise RuntimeError("The diffusion solution did not converge in {} iterations.".
+			                   format(max_iters))
+		self.num_iterations = i
+		self.keff = float(keff)
+		ny, nx = self.shape
+		self.flux = np.moveaxis(flux.reshape(self._ngroups, ny, nx), 0, -1)
+		return self.keff
+
+	def get_reaction_rates(self, rxn_type, mesh_shape=None):
+		"""Get the groupwise reaction rates of the last solution
+
+		Parameters:
+		-----------
+		rxn_type:       str; "flux", "fission", or "nu-fission"
+		mesh_shape:     tuple of (nx, ny), optional; mesh to condense the rates onto.
+		                It must nest within the diffusion mesh.
+		                [Default: None --> the diffusion mesh]
+
+		Returns:
+		--------
+		array of floats, indexed by [row, column, group], in map order
+		"""
+		assert self.flux is not None, "You must solve() first."
+		if rxn_type == "flux":
+			rates = self.flux
+		elif rxn_type == "fission":
+			rates = self.flux*self._fission_xs
+		elif rxn_type == "nu-fission":
+			rates = self.flux*self._nu_fission_xs
+		else:
+			raise NotImplementedError(rxn_type)
+		rates = rates*self.width**2
+		if mesh_shape is not None:
+			rates = condensation.condense_mesh(rates, tuple(mesh_shape[:2])[::-1])
+		return rates
+
+	def get_fission_rates(self, mesh_shape=None, normalize=True):
+		"""Get the total fission rates of the last solution
+
+		Parameters:
+		-----------
+		mesh_shape:     tuple of (nx, ny), optional; see `get_reaction_rates()`
+		normalize:      bool, optional; whether to normalize the rates like the
+		                Monte Carlo ones: cells without fission are NaN, and
+		                the rest have a mean of 1.
+		                [Default: True]
+
+		Returns:
+		--------
+		array of floats, indexed by [row, column], in map order;
+		see `get_reaction_rates()`
+		"""
+		rates = self.get_reaction_rates("fission", mesh_shape).sum(axis=-1)
+		if normalize:
+			rates[rates == 0] = np.NaN
+			rates /= np.nanmean(rates)
+		return rates
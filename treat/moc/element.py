@@ -57,6 +57,19 @@ class Element:
 		"""Use an array to create and add a new SuperhomogeneisationFactors instance"""
 		ngroups = len(factors)
 		self._sph[ngroups] = SuperhomogeneisationFactors(ngroups, factors)
+	
+	def get_cache_inputs(self, ngroups):
+		"""Get the parameters of this Element that affect an `ngroups` simulation"""
+		inputs = {"division": self._division,
+		          "crdrings": self.crdrings,
+		          "crdsectors": self.crdsectors,
+		          "cmm": None,
+		          "sph": None}
+		if ngroups in self._cmm:
+			inputs["cmm"] = self._cmm[ngroups].corrections
+		if ngroups in self._sph:
+			inputs["sph"] = self._sph[ngroups].factors
+		return inputs
 
 
 class Element2D(Element):
@@ -110,3 +110,17 @@ treat['11-group'].group_edges = np.array(
       2.09610E-07, 6.25000E-07, 8.100030E-06, 1.32700E-04,
       3.48110E-03, 1.15620E-01, 3.32870E+00, 2.00E+01])
 group_structures['TREAT'] = treat
+
+
+def get_energy_groups(ngroups):
+	"""Get a tabulated group structure by its number of groups
+
+	The 11-group structure is TREAT's; the rest are CASMO's.
+	The group edges are in MeV. Copy them before rescaling.
+	"""
+	assert ngroups in ALL_GROUP_NUMBERS, \
+		"No {}-group structure; available: {}".format(ngroups, ALL_GROUP_NUMBERS)
+	key = "{}-group".format(ngroups)
+	if ngroups == 11:
+		return treat[key]
+	return casmo[key]
@@ -1,9 +1,9 @@
 
 
 import os
-import subprocess
 from warnings import warn
 from datetime import timedelta
+from .backends import QsubBackend
 
 
 class Executor:
@@ -25,17 +25,21 @@ class Executor:
 	[DEFAULT: The preceding parameters will default to `divmesh` when not provided.]
 	postsuffix:     str; what to append after the usual 'mesh{divmesh}' suffix
 	job_name:       str; what to call the job in the queue
+	backend:        QsubBackend or LocalBackend; how to run the job script
+	                [DEFAULT: None --> submit it to PBS with `qsub`]
 	
 	Attributes:
 	-----------
 	cmfdmesh:       int; default: 2
 	solver:         str; default: "lsr"
 	queue:          str; default: "treat"
+	nproc:          int; default: None --> the backend decides; see `get_nproc()`.
+	                Threads (OMP_NUM_THREADS) for the job.
 	
 	"""
 	def __init__(self, script_file, minutes, geneity, ngroups, divmesh,
 	             crdmesh=None, fuelmesh=None, reflmesh=None,
-	             postsuffix="", job_name="", **kwargs):
+	             postsuffix="", job_name="", backend=None, **kwargs):
 		self.script_file = script_file
 		self.timestr = str(timedelta(minutes=minutes))
 		self.geneity = geneity
@@ -53,11 +57,27 @@ class Executor:
 		self.cmfdmesh = 2
 		self.solver = "lsr"
 		self.queue = "treat"
+		self.nproc = None
 		self.postsuffix = postsuffix
 		self.job_name = job_name
+		self._backend = backend
 		self._template = None
 		
 		
+	@property
+	def backend(self):
+		if self._backend is None:
+			return QsubBackend()
+		return self._backend
+	
+	def get_nproc(self):
+		"""Get the number of threads for the job
+		
+		An `nproc` that was set is used as it is. Otherwise, it is a full node
+		(DEFAULT_NPROC) on PBS, or what fits in a LocalBackend's budget.
+		"""
+		return self.backend.get_nproc(self.nproc)
+		
 	@property
 	def suffix(self):
 		suf = "mesh{:02d}".format(self.divmesh)
@@ -101,8 +121,9 @@ class Executor:
 		"""
 		if self._template is None:
 			raise ValueError("You must load a template first.")
-		variables = vars(self)
+		variables = dict(vars(self))
 		variables["suffix"] = self.suffix
+		variables["nproc"] = self.get_nproc()
 		variables.update(kwargs)
 		return self._template.format(**variables)
 	
@@ -137,16 +158,19 @@ class Executor:
 		
 	
 	def execute_script(self, destination):
-		"""Call 'qsub' on the shell script.
+		"""Run the shell script with the backend (by default, 'qsub').
 		
 		Parameters:
 		-----------
 		destination:    str; shell script to call.
+		
+		Returns:
+		--------
+		The backend's handle on the job: a subprocess.Popen of the qsub call,
+		or a concurrent.futures.Future of a JobResult when run locally.
 		"""
 		if self.job_name:
 			job_name = self.job_name
 		else:
 			job_name = "MOC_{ngroups}groups_div{divmesh:02d}".format(**vars(self))
-		argument = ['qsub', '-N', job_name, destination]
-		print(" ".join(argument))
-		subprocess.Popen(argument)
+		return self.backend.submit(destination, job_name, nproc=self.get_nproc())
@@ -0,0 +1,277 @@
+# Infinite Medium
+#
+# Deterministic multigroup k-inf of infinite (0-D) media
+#
+# In an infinite medium, the multigroup eigenproblem is just a dense GxG
+# system: (T - S^T) phi = chi (nu-fission . phi)/k. The fission operator
+# chi x nu-fission has rank one, so the fundamental mode is found exactly
+# with a single linear solve, phi = (T - S^T)^-1 chi, and k = nu-fission . phi.
+# NumPy solves a whole stack of these at once, so every material variant
+# (or every domain of every library) is one batched call.
+
+from collections import OrderedDict
+import h5py
+import numpy as np
+from .mgxs_arrays import MgxsArrays
+
+
+def solve_kinf(transport, scatter, nu_fission, chi):
+	"""Solve the 0-D multigroup eigenproblem of a batch of media
+
+	Energy groups are "descending"; i.e., group 0 is the fastest.
+	Any leading axes are batch axes.
+
+	Parameters:
+	-----------
+	transport:      array of floats, shape (..., G); (nu-)transport MGXS
+	scatter:        array of floats, shape (..., G, G); consistent nu-scatter
+	                matrices, indexed by [group_in, group_out]
+	nu_fission:     array of floats, shape (..., G)
+	chi:            array of floats, shape (..., G); normalized to 1
+
+	Returns:
+	--------
+	keff:           array of floats, shape (...); k-inf of each medium
+	flux:           array of floats, shape (..., G); scalar flux per source neutron
+	"""
+	transport = np.asarray(transport, dtype=float)
+	ngroups = transport.shape[-1]
+	loss = -np.swapaxes(np.asarray(scatter, dtype=float), -1, -2)
+	diagonal = np.arange(ngroups)
+	loss[..., diagonal, diagonal] += transport
+	flux = np.linalg.solve(loss, np.asarray(chi, dtype=float)[..., None])[..., 0]
+	keff = np.einsum("...g,...g->...", nu_fission, flux)
+	return keff, flux
+
+
+def solve_libraries(xslibs):
+	"""Find k-inf of every domain of several MGXS Libraries at once
+
+	The domains of all the Libraries with the same number of groups
+	are stacked and solved in a single batch.
+
+	Parameters:
+	-----------
+	xslibs:         dict of {name: openmc.mgxs.Library}; "material" domain
+	                Libraries with the MOC reaction types, loaded from their statepoints
+
+	Returns:
+	--------
+	OrderedDict of {name: OrderedDict of {domain id: k-inf}}
+	"""
+	arrays = OrderedDict((name, MgxsArrays(lib)) for name, lib in xslibs.items())
+	batches = OrderedDict()
+	for name, xs in arrays.items():
+		batches.setdefault(xs.ngroups, []).append(name)
+	results = OrderedDict((name, None) for name in xslibs)
+	for names in batches.values():
+		stacks = [np.concatenate([getattr(arrays[name], attr) for name in names])
+		          for attr in ("transport", "scatter", "nu_fission", "chi")]
+		keffs, _ = solve_kinf(*stacks)
+		start = 0
+		for name in names:
+			index = arrays[name].index
+			ids = sorted(index, key=index.get)
+			results[name] = OrderedDict(
+				(domain_id, float(k)) for domain_id, k in zip(ids, keffs[start:start + len(ids)]))
+			start += len(ids)
+	return results
+
+
+class InfiniteMediumXS:
+	"""Microscopic MGXS of the nuclides of an infinite medium, with its spectrum
+
+	The microscopic cross sections are weighted by the spectrum of the
+	reference medium they were tallied in. They stay good for media of
+	similar composition (e.g., the fuel of a different material library),
+	whose macroscopic cross sections are just sums over the nuclides.
+	The fission spectrum of a mixture is weighted by each nuclide's
+	production rate in the cached reference spectrum.
+
+	Energy groups are "descending"; i.e., group 0 is the fastest.
+
+	Parameters:
+	-----------
+	nuclides:       list of str; names of the nuclides
+	densities:      array of floats, shape (N,); atom densities (atom/b-cm)
+	                of the nuclides in the reference medium
+	transport:      array of floats, shape (N, G); microscopic nu-transport MGXS (b)
+	scatter:        array of floats, shape (N, G, G); microscopic consistent
+	                nu-scatter matrices (b), indexed by [group_in, group_out]
+	capture:        array of floats, shape (N, G); microscopic capture MGXS (b)
+	fission:        array of floats, shape (N, G); microscopic fission MGXS (b)
+	nu_fission:     array of floats, shape (N, G); microscopic nu-fission MGXS (b)
+	chi:            array of floats, shape (N, G); fission spectrum of each nuclide
+	spectrum:       array of floats, shape (G,), optional; scalar flux of the
+	                reference medium.
+	                [Default: None --> solve for it]
+	"""
+	def __init__(self, nuclides, densities, transport, scatter, capture,
+	             fission, nu_fission, chi, spectrum=None):
+		self.nuclides = [str(n) for n in nuclides]
+		self.densities = np.array(densities, dtype=float)
+		self.transport = np.array(transport, dtype=float)
+		self.scatter = np.array(scatter, dtype=float)
+		self.capture = np.array(capture, dtype=float)
+		self.fission = np.array(fission, dtype=float)
+		self.nu_fission = np.array(nu_fission, dtype=float)
+		self.chi = np.array(chi, dtype=float)
+		n, g = self.transport.shape
+		assert len(self.nuclides) == n, \
+			"{} nuclides were given for {} sets of MGXS.".format(len(self.nuclides), n)
+		assert self.densities.shape == (n,), "There must be one density per nuclide."
+		assert self.scatter.shape == (n, g, g), "Scatter matrices must be (N, G, G)."
+		if spectrum is None:
+			spectrum = self._find_spectrum()
+		self.spectrum = np.array(spectrum, dtype=float)
+		assert self.spectrum.shape == (g,), "The spectrum must have one value per group."
+
+	def _find_spectrum(self, tolerance=1E-10, max_iters=50):
+		"""Find the reference spectrum, which the mixture's chi itself depends on"""
+		self.spectrum = np.ones(self.ngroups)
+		for _ in range(max_iters):
+			_, flux, _ = self.solve()
+			converged = np.allclose(flux[0], self.spectrum, rtol=tolerance, atol=0)
+			self.spectrum = flux[0]
+			if converged:
+				break
+		return self.spectrum
+
+	@property
+	def ngroups(self):
+		return self.transport.shape[1]
+
+	@property
+	def absorption(self):
+		return self.capture + self.fission
+
+	@classmethod
+	def from_library(cls, xslib, domain):
+		"""Get the nuclides' MGXS from a by-nuclide, material-domain Library
+
+		Parameters:
+		-----------
+		xslib:          openmc.mgxs.Library with `by_nuclide` set, loaded from a
+		                statepoint. It must have the MOC reaction types,
+		                and "capture" and "fission".
+		domain:         openmc.Material; the (infinite) medium the Library was tallied in
+		"""
+		assert xslib.by_nuclide, "The Library must be tallied by nuclide."
+		atom_densities = domain.get_nuclide_atom_densities()
+		nuclides = list(xslib.get_mgxs(domain, "nu-transport").get_nuclides())
+		g = xslib.energy_groups.num_groups
+		densities = []
+		for nuc in nuclides:
+			value = atom_densities[nuc]
+			# Older versions of OpenMC return (Nuclide, density) pairs
+			densities.append(value[1] if isinstance(value, tuple) else value)
+
+		def get_micro(rxn, shape, xs_type="micro"):
+			mg = xslib.get_mgxs(domain, rxn)
+			return np.array([np.reshape(mg.get_xs(nuclides=[nuc], xs_type=xs_type), shape)
+			                 for nuc in nuclides])
+
+		return cls(nuclides, densities,
+		           transport=get_micro("nu-transport", (g,)),
+		           scatter=get_micro("consistent nu-scatter matrix", (g, g)),
+		           capture=get_micro("capture", (g,)),
+		           fission=get_micro("fission", (g,)),
+		           nu_fission=get_micro("nu-fission", (g,)),
+		           chi=get_micro("chi", (g,), xs_type="macro"))
+
+	@classmethod
+	def from_hdf5(cls, fname):
+		"""Load the MGXS saved with `InfiniteMediumXS.export_to_hdf5()`"""
+		with h5py.File(fname, 'r') as f:
+			nuclides = [n.decode() for n in f["nuclides"][...]]
+			arrays = {key: f[key][...] for key in
+			          ("densities", "transport", "scatter", "capture", "fission",
+			           "nu_fission", "chi", "spectrum")}
+		return cls(nuclides, **arrays)
+
+	def export_to_hdf5(self, fname):
+		"""Cache these MGXS and the spectrum in an HDF5 file"""
+		with h5py.File(fname, 'w') as f:
+			f.create_dataset("nuclides", data=np.array(self.nuclides, dtype="S"))
+			for key in ("densities", "transport", "scatter", "capture", "fission",
+			            "nu_fission", "chi", "spectrum"):
+				f.create_dataset(key, data=getattr(self, key))
+
+	def get_densities(self, atom_densities, strict=True):
+		"""Arrange the atom densities of a material by the nuclides of these MGXS
+
+		Parameters:
+		-----------
+		atom_densities: dict of {nuclide name: atom/b-cm}, e.g., from
+		                openmc.Material.get_nuclide_atom_densities()
+		strict:         bool, optional; whether to raise an error for nuclides
+		                with no MGXS, instead of leaving them out
+		                [Default: True]
+
+		Returns:
+		--------
+		array of floats, shape (N,); zero for the nuclides not in the material
+		"""
+		densities = np.zeros(len(self.nuclides))
+		missing = []
+		for nuc, value in atom_densities.items():
+			nuc = getattr(nuc, "name", nuc)
+			if isinstance(value, tuple):
+				value = value[1]
+			if nuc in self.nuclides:
+				densities[self.nuclides.index(nuc)] = value
+			else:
+				missing.append(nuc)
+		if missing and strict:
+			raise KeyError("No MGXS for nuclides: {}".format(missing))
+		return densities
+
+	def get_macroscopic(self, densities):
+		"""Get the macroscopic MGXS of a batch of media
+
+		Parameters:
+		-----------
+		densities:      array of floats, shape (V, N); atom densities (atom/b-cm)
+		                of each nuclide in each medium
+
+		Returns:
+		--------
+		dict of {str: array of floats}; "transport", "scatter", "nu_fission",
+		and "chi", each with a leading axis of length V
+		"""
+		densities = np.atleast_2d(densities)
+		macro = {"transport": densities.dot(self.transport),
+		         "scatter": np.einsum("vn,ngh->vgh", densities, self.scatter),
+		         "nu_fission": densities.dot(self.nu_fission)}
+		production = densities*self.nu_fission.dot(self.spectrum)
+		total = production.sum(axis=1, keepdims=True)
+		total[total == 0] = 1.0
+		macro["chi"] = (production/total).dot(self.chi)
+		return macro
+
+	def solve(self, densities=None):
+		"""Find k-inf and the absorption by nuclide of a batch of media
+
+		Parameters:
+		-----------
+		densities:      array of floats, shape (V, N) or (N,), optional; atom
+		                densities of each nuclide in each medium. See `get_densities()`.
+		                [Default: None --> the reference medium]
+
+		Returns:
+		--------
+		keff:           array of floats, shape (V,); k-inf of each medium
+		flux:           array of floats, shape (V, G); scalar flux per source neutron
+		absorption:     array of floats, shape (V, N); fraction of the absorption
+		                in each medium that is in each nuclide
+		"""
+		if densities is None:
+			densities = self.densities
+		densities = np.atleast_2d(np.asarray(densities, dtype=float))
+		macro = self.get_macroscopic(densities)
+		keff, flux = solve_kinf(macro["transport"], macro["scatter"],
+		                        macro["nu_fission"], macro["chi"])
+		absorption = densities*flux.dot(self.absorption.T)
+		total = absorption.sum(axis=1, keepdims=True)
+		total[total == 0] = 1.0
+		return keff, flux, absorption/total
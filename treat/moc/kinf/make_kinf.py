@@ -1,6 +1,9 @@
 # Make kinf
 #
 # Analyze the fuel materials from different libraries
+#
+# Builds the one OpenMC model of an infinite medium of fuel whose by-nuclide
+# MGXS and spectrum are cached for the deterministic k-inf of ../../kinf/make_kinf.py
 
 import numpy as np
 import openmc
@@ -9,6 +12,8 @@ import os
 import sys; sys.path.append("..")
 import materials
 import energy_groups
+sys.path.append("../..")
+from moc.infinite_medium import InfiniteMediumXS
 
 
 def _get_fuel(library):
@@ -53,7 +58,8 @@ def _mgxs_groups(groups, geom, fuel, by_nuclide=False):
 		else:
 			key = "{}-group".format(g)
 			eg = energy_groups.casmo[key]
-		eg.group_edges *= 1E6
+		# Copy the structure in MeV; scaling it in place would corrupt it for other users
+		eg = mgxs.EnergyGroups(eg.group_edges*1E6)
 		lib = mgxs.Library(geom)
 		lib.energy_groups = eg
 		lib.mgxs_types = ['nu-transport', 'transport', 'total', 'fission',
@@ -115,7 +121,7 @@ def build_model(lib, multigroup):
 	mats = get_materials(matlib)
 	sets = get_settings()
 	geom = get_geometry(fuel)
-	libs = _mgxs_groups(multigroup, geom, fuel)
+	libs = _mgxs_groups(multigroup, geom, fuel, by_nuclide=True)
 	tals = get_tallies(fuel, libs)
 
 	export_to_xml(lib, sets, geom, mats, tals, libs)
@@ -131,5 +137,37 @@ def build_model(lib, multigroup):
 	np.savetxt(lib + "/atom_frac.txt", atom_frac)
 	
 
+def cache_infinite_medium(lib, ngroups, statepoint):
+	"""Cache the by-nuclide MGXS and spectrum of a finished run of `build_model()`
+	
+	Parameters:
+	-----------
+	lib:            str; name of the material library (and its folder)
+	ngroups:        int; number of energy groups of the MGXS library to cache
+	statepoint:     str; name of the statepoint file in the folder
+	
+	Returns:
+	--------
+	str; path to the HDF5 file of the cached InfiniteMediumXS
+	"""
+	sp = openmc.StatePoint(os.path.join(lib, statepoint))
+	fname = "material_lib_{}".format(ngroups)
+	material_lib = mgxs.Library.load_from_file(filename=fname, directory=lib)
+	material_lib.load_from_statepoint(sp)
+	fuel = material_lib.domains[0]
+	xs = InfiniteMediumXS.from_library(material_lib, fuel)
+	kinf, _, _ = xs.solve()
+	print("{} groups: k-inf = {:.5f} (OpenMC: {:.5f})".format(ngroups, kinf[0], sp.k_combined[0]))
+	cache_file = os.path.join(lib, "infinite_medium_{}.h5".format(ngroups))
+	xs.export_to_hdf5(cache_file)
+	print("Cached to:", cache_file)
+	return cache_file
+	
+
 if __name__ == "__main__":
-	build_model("BATMAN", multigroup=[11, 25])
+	STATEPOINT = "statepoint.100.h5"
+	if os.path.isfile(os.path.join("BATMAN", STATEPOINT)):
+		for ngroups in (11, 25):
+			cache_infinite_medium("BATMAN", ngroups, STATEPOINT)
+	else:
+		build_model("BATMAN", multigroup=[11, 25])
@@ -0,0 +1,167 @@
+# Multigroup Export
+#
+# Write the MGXS applied to an MOC Core as an OpenMC multi-group model
+#
+# Running the same problem in OpenMC's multi-group mode, with exactly the
+# cross sections OpenMOC saw, separates the error of the MOC method
+# from the error of the multigroup data.
+
+import copy
+import os
+import numpy as np
+import openmc
+import openmc.stats
+from . import constants
+
+
+def get_xsdata(name, energy_groups, xsdict):
+	"""Get an openmc.XSdata of a set of MOC cross sections
+
+	The absorption is found from the neutron balance, so that it is consistent
+	with the corrected transport and scatter cross sections.
+
+	Parameters:
+	-----------
+	name:           str; name of the XSdata
+	energy_groups:  openmc.mgxs.EnergyGroups, in eV
+	xsdict:         dict of {rxn : array of MGXS}, for the MOC reaction types
+
+	Returns:
+	--------
+	openmc.XSdata
+	"""
+	ngroups = energy_groups.num_groups
+	data = openmc.XSdata(name, energy_groups)
+	data.order = 0
+	transport = np.reshape(xsdict["nu-transport"], ngroups)
+	scatter = np.reshape(xsdict["consistent nu-scatter matrix"], (ngroups, ngroups))
+	data.set_total(transport)
+	data.set_absorption(np.maximum(transport - scatter.sum(axis=1), 0.0))
+	data.set_scatter_matrix(scatter[:, :, None])
+	nu_fission = np.reshape(xsdict["nu-fission"], ngroups)
+	if nu_fission.any():
+		data.set_fission(np.reshape(xsdict["fission"], ngroups))
+		data.set_nu_fission(nu_fission)
+		data.set_chi(np.reshape(xsdict["chi"], ngroups))
+	return data
+
+
+class MultigroupExport:
+	"""OpenMC multi-group model of the MGXS applied to an MOC Core
+
+	The OpenMC geometry is copied with its Materials replaced by macroscopic
+	ones of the corrected MGXS. In the "universe" domain, each lattice element
+	becomes a homogeneous universe, which is subdivided into a lattice of the
+	element's `division` if the Core subdivides it. In the "cell" and "material"
+	domains, each material cell is filled with the MGXS of its domain.
+	Domains corrected by the same Element share a Material.
+
+	Parameters:
+	-----------
+	core:           moc.Core; the MOC core model, with its Elements and options
+	geometry:       openmc.Geometry; the OpenMC model the MGXS were tallied on
+	energy_groups:  openmc.mgxs.EnergyGroups, in eV
+	"""
+	def __init__(self, core, geometry, energy_groups):
+		assert energy_groups.num_groups == core.ngroups, \
+			"{} energy groups for {} group MGXS".format(energy_groups.num_groups, core.ngroups)
+		self._core = core
+		self._geometry = geometry
+		self._energy_groups = energy_groups
+		self._mg_library = openmc.MGXSLibrary(energy_groups)
+		# {(Element key, domain id): openmc.Material}
+		self._materials = {}
+
+	@property
+	def mg_library(self):
+		return self._mg_library
+
+	@property
+	def materials(self):
+		return openmc.Materials(self._materials.values())
+
+	def _get_material(self, domain_id, elem):
+		key = (elem.key if elem else None, domain_id)
+		if key not in self._materials:
+			name = "{}{}".format(self._core.domain_type[0], domain_id)
+			if elem:
+				name += "_" + elem.key
+			xsdict = self._core.get_corrected_xsdict(domain_id, elem)
+			self._mg_library.add_xsdata(get_xsdata(name, self._energy_groups, xsdict))
+			material = openmc.Material(name=name)
+			material.set_density("macro", 1.0)
+			material.add_macroscopic(name)
+			self._materials[key] = material
+		return self._materials[key]
+
+	def _get_homogeneous_universe(self, universe_id, pitch):
+		elem = self._core.get_element(universe_id)
+		name = self._core.ids_to_keys[universe_id]
+		cell = openmc.Cell(name="u{}-cell".format(universe_id))
+		cell.fill = self._get_material(universe_id, elem)
+		universe = openmc.Universe(name=name, cells=[cell])
+		if elem is not None and elem.division and self._core.subdivide:
+			nx, ny = elem.division[:2]
+			sublattice = openmc.RectLattice(name="{} subdivision".format(name))
+			sublattice.pitch = (pitch[0]/nx, pitch[1]/ny)
+			sublattice.lower_left = (-pitch[0]/2.0, -pitch[1]/2.0)
+			sublattice.universes = [[universe]*nx for _ in range(ny)]
+			holder = openmc.Cell(name="u{}-subdivided".format(universe_id), fill=sublattice)
+			universe = openmc.Universe(name=name, cells=[holder])
+		return universe
+
+	def get_geometry(self):
+		"""Get the OpenMC geometry filled with the multigroup Materials
+
+		Returns:
+		--------
+		openmc.Geometry
+		"""
+		geometry = copy.deepcopy(self._geometry)
+		lattice = geometry.get_all_lattices()[constants.ROOT_LATTICE]
+		universe_array = np.array(lattice.universes)
+		if self._core.domain_type == "universe":
+			new_universes = {}
+			for u in set(universe.id for universe in universe_array.flat):
+				new_universes[u] = self._get_homogeneous_universe(u, lattice.pitch)
+			filled = np.empty(universe_array.shape, dtype=object)
+			for index, universe in np.ndenumerate(universe_array):
+				filled[index] = new_universes[universe.id]
+			lattice.universes = filled
+		elif self._core.domain_type in ("cell", "material"):
+			for u, universe in lattice.get_unique_universes().items():
+				elem = self._core.get_element(u)
+				for c, cell in universe.get_all_cells().items():
+					if cell.fill_type != "material":
+						continue
+					if self._core.domain_type == "cell":
+						domain_id = c
+					else:
+						domain_id = cell.fill.id
+					cell.fill = self._get_material(domain_id, elem)
+		else:
+			raise NotImplementedError(self._core.domain_type)
+		return geometry
+
+	def export_to_xml(self, path="./", settings=None):
+		"""Export the MGXS library and the materials, geometry, and settings XML
+
+		Parameters:
+		-----------
+		path:           str, optional; directory to export to
+		                [Default: "./"]
+		settings:       openmc.Settings, optional; settings to run with.
+		                The energy mode is set to multi-group.
+		                [Default: None --> no settings.xml]
+		"""
+		if not os.path.isdir(path):
+			os.makedirs(path)
+		geometry = self.get_geometry()
+		materials = self.materials
+		materials.cross_sections = constants.MGXS_FILE
+		self._mg_library.export_to_hdf5(os.path.join(path, constants.MGXS_FILE))
+		materials.export_to_xml(os.path.join(path, "materials.xml"))
+		geometry.export_to_xml(os.path.join(path, "geometry.xml"))
+		if settings is not None:
+			settings.energy_mode = "multi-group"
+			settings.export_to_xml(os.path.join(path, "settings.xml"))
@@ -0,0 +1,175 @@
+# MGXS Arrays
+#
+# Dense NumPy copies of the MOC cross sections in an MGXS Library
+
+import copy
+from functools import reduce
+from warnings import warn
+import numpy as np
+import openmc
+from . import constants
+
+# Attribute names of the arrays for each of the MOC reaction types
+_ATTRIBUTES = {"nu-transport": "transport",
+               "consistent nu-scatter matrix": "scatter",
+               "fission": "fission",
+               "nu-fission": "nu_fission",
+               "chi": "chi"}
+
+
+_DOMAIN_FILTERS = {"cell": openmc.CellFilter,
+                   "material": openmc.MaterialFilter,
+                   "universe": openmc.UniverseFilter}
+
+
+def get_lattice_domain_ids(lattice, domain_type):
+	"""Get the IDs of the domains that an MOC Core of a lattice uses
+
+	Parameters:
+	-----------
+	lattice:        openmc.RectLattice; the core lattice
+	domain_type:    str; "universe", "cell", or "material"
+
+	Returns:
+	--------
+	list of int; the Universe, material Cell, or Material IDs, without repeats
+	"""
+	ids = []
+	for u, universe in lattice.get_unique_universes().items():
+		if domain_type == "universe":
+			ids.append(u)
+			continue
+		for c, cell in universe.get_all_cells().items():
+			if cell.fill_type != "material":
+				continue
+			if domain_type == "cell":
+				ids.append(c)
+			elif domain_type == "material":
+				ids.append(cell.fill.id)
+			else:
+				raise NotImplementedError(domain_type)
+	return list(dict.fromkeys(ids))
+
+
+def _get_merged_mgxs(xslib, domain_ids, rxn):
+	"""Get one MGXS of a reaction over many domains, by merging their tallies
+
+	The tallies of the domains differ only in their domain filter bins, so
+	they merge into one tally per key. The merged MGXS's cross sections are
+	then computed for every domain at once.
+
+	Returns:
+	--------
+	mgxs:           openmc.mgxs.MGXS, or None if the MGXS have no tallies to merge
+	ids:            list of int; the domain ID of each of its subdomains, in order
+	"""
+	all_mgxs = [xslib.get_mgxs(domain_id, rxn) for domain_id in domain_ids]
+	if not all(getattr(mg, "tallies", None) for mg in all_mgxs):
+		return None, None
+	merged = copy.copy(all_mgxs[0])
+	merged._tallies = copy.copy(all_mgxs[0].tallies)
+	for key in merged.tallies:
+		merged.tallies[key] = reduce(lambda t1, t2: t1.merge(t2),
+		                             [mg.tallies[key] for mg in all_mgxs])
+	merged._rxn_rate_tally = None
+	merged._xs_tally = None
+	filter_type = _DOMAIN_FILTERS[xslib.domain_type]
+	domain_filter = merged.xs_tally.find_filter(filter_type)
+	ids = [int(np.ravel(b)[0]) for b in domain_filter.bins]
+	return merged, ids
+
+
+class MgxsArrays:
+	"""Dense arrays of the MOC cross sections of some domains in an MGXS Library
+
+	The cross sections of each reaction are extracted from the Library
+	for all of the domains at once, so repeated lookups (and repeated
+	Core builds) are just array indexing.
+
+	Energy groups are "descending"; i.e., group 0 is the fastest.
+
+	Parameters:
+	-----------
+	xslib:          openmc.mgxs.Library; the cross section data generated by OpenMC
+	domain_ids:     iterable of int, optional; IDs of the domains to extract.
+	                [Default: None --> all of the Library's domains]
+	lattice:        openmc.RectLattice, optional; if `domain_ids` is not given,
+	                only extract the Library's domains that this lattice uses.
+	                See `get_lattice_domain_ids()`.
+	                [Default: None]
+
+	Attributes:
+	-----------
+	ngroups:        int; number of energy groups
+	index:          dict of {domain id: row of the arrays}
+	transport:      array of floats, shape (ndomains, ngroups); nu-transport MGXS
+	scatter:        array of floats, shape (ndomains, ngroups, ngroups);
+	                consistent nu-scatter matrices
+	fission:        array of floats, shape (ndomains, ngroups)
+	nu_fission:     array of floats, shape (ndomains, ngroups)
+	chi:            array of floats, shape (ndomains, ngroups)
+	"""
+	def __init__(self, xslib, domain_ids=None, lattice=None):
+		if domain_ids is None:
+			domain_ids = [domain.id for domain in xslib.domains]
+			if lattice is not None:
+				used = set(get_lattice_domain_ids(lattice, xslib.domain_type))
+				domain_ids = [d for d in domain_ids if d in used]
+		domain_ids = list(domain_ids)
+		n = len(domain_ids)
+		g = xslib.energy_groups.num_groups
+		self.ngroups = g
+		self.index = {}
+		self.transport = np.zeros((n, g))
+		self.scatter = np.zeros((n, g, g))
+		self.fission = np.zeros((n, g))
+		self.nu_fission = np.zeros((n, g))
+		self.chi = np.zeros((n, g))
+		for row, domain_id in enumerate(domain_ids):
+			self.index[domain_id] = row
+		if n == 0:
+			return
+		for rxn in constants.MOC_TYPES:
+			array = getattr(self, _ATTRIBUTES[rxn])
+			try:
+				merged, ids = _get_merged_mgxs(xslib, domain_ids, rxn)
+			except ValueError as err:
+				warn("Extracting {} domain by domain: {}".format(rxn, err))
+				merged = None
+			if merged is None:
+				for row, domain_id in enumerate(domain_ids):
+					xs = xslib.get_mgxs(domain_id, rxn).get_xs()
+					array[row] = np.reshape(xs, array.shape[1:])
+				continue
+			xs = merged.get_xs(squeeze=False)
+			xs = np.reshape(xs, (len(ids),) + array.shape[1:])
+			array[self.get_rows(ids)] = xs
+
+	def __contains__(self, domain_id):
+		return domain_id in self.index
+
+	def __len__(self):
+		return len(self.index)
+
+	def get_rows(self, domain_ids):
+		"""Get the array rows for an iterable of domain IDs"""
+		return np.array([self.index[d] for d in domain_ids], dtype=int)
+
+	def get_xsdict(self, domain_id):
+		"""Get the cross sections of a single domain
+
+		Parameter:
+		----------
+		domain_id:      int; ID for this Cell, Material, or Universe
+
+		Returns:
+		--------
+		xsdict:         dict of {rxn : array of MGXS}; read-only views of the arrays
+		"""
+		row = self.index[domain_id]
+		xsdict = {}
+		for rxn, attr in _ATTRIBUTES.items():
+			view = getattr(self, attr)[row]
+			view.flags.writeable = False
+			xsdict[rxn] = view
+		return xsdict
@@ -0,0 +1,376 @@
+# Pipeline
+#
+# Run the stages of a study (XML export, OpenMC, MOC, plots) as a graph of tasks
+
+import os
+import subprocess
+from collections import OrderedDict
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from .backends import LocalBackend
+
+DONE = "done"
+SKIPPED = "skipped"
+FAILED = "failed"
+BLOCKED = "blocked"
+
+
+class Task:
+	"""One stage of a Pipeline
+
+	Like a rule in a makefile, a task is up to date when all of its outputs
+	exist and none is older than any of its inputs. A task with no outputs
+	is never up to date.
+
+	Parameters:
+	-----------
+	name:           str; unique name of the task
+	action:         callable taking no arguments; does the work
+	inputs:         iterable of str, optional; files the task reads.
+	                A task depends on whichever task outputs these.
+	outputs:        iterable of str, optional; files the task writes
+	requires:       iterable of str, optional; names of other tasks that must
+	                finish first, for dependencies that are not files
+	"""
+	def __init__(self, name, action, inputs=(), outputs=(), requires=()):
+		self.name = name
+		self.action = action
+		self.inputs = list(inputs)
+		self.outputs = list(outputs)
+		self.requires = list(requires)
+
+	def __repr__(self):
+		return "Task({})".format(self.name)
+
+	def get_stale_reason(self):
+		"""Find why this task must run
+
+		Returns:
+		--------
+		str describing why the task is out of date, or None if it is up to date
+		"""
+		if not self.outputs:
+			return "no outputs declared"
+		for fname in self.outputs:
+			if not os.path.exists(fname):
+				return "missing output " + fname
+		oldest_output = min(os.path.getmtime(f) for f in self.outputs)
+		for fname in self.inputs:
+			if not os.path.exists(fname):
+				return "missing input " + fname
+			if os.path.getmtime(fname) > oldest_output:
+				return "input {} is newer than the outputs".format(fname)
+		return None
+
+	def is_up_to_date(self):
+		return self.get_stale_reason() is None
+
+	def run(self):
+		return self.action()
+
+
+class CommandTask(Task):
+	"""A Task that runs a shell command
+
+	Standard output and error go to "{name}.log" in `cwd`.
+
+	Parameters:
+	-----------
+	name:           str; unique name of the task
+	command:        list of str; the command and its arguments
+	cwd:            str, optional; directory to run the command in
+	                [Default: None --> the current directory]
+	(inputs, outputs, requires:  as for Task)
+	"""
+	def __init__(self, name, command, inputs=(), outputs=(), requires=(), cwd=None):
+		super().__init__(name, self._call, inputs, outputs, requires)
+		self.command = list(command)
+		self.cwd = cwd
+
+	def _call(self):
+		log = os.path.join(self.cwd or ".", "{}.log".format(self.name.replace(" ", "_")))
+		with open(log, 'w') as f:
+			returncode = subprocess.call(self.command, cwd=self.cwd,
+			                             stdout=f, stderr=subprocess.STDOUT)
+		if returncode:
+			errstr = "{} exited with status {}; see {}"
+			raise RuntimeError(errstr.format(" ".join(self.command), returncode, log))
+		return returncode
+
+
+class JobTask(Task):
+	"""A Task that runs an Executor's job script with a backend and waits for it
+
+	Parameters:
+	-----------
+	name:           str; unique name of the task
+	executor:       Executor with its template loaded
+	script:         str; where to write the job script
+	backend:        LocalBackend to run the job script with
+	(inputs, outputs, requires:  as for Task)
+	**kwargs:       passed to `executor.write_script()`
+	"""
+	def __init__(self, name, executor, script, backend, inputs=(), outputs=(),
+	             requires=(), **kwargs):
+		super().__init__(name, self._call, inputs, outputs, requires)
+		self.executor = executor
+		self.script = script
+		self.backend = backend
+		self._script_kwargs = kwargs
+
+	def _call(self):
+		if self.executor.write_script(self.script, **self._script_kwargs):
+			raise IOError("Could not write job script: " + self.script)
+		result = self.backend.submit(self.script, self.name,
+		                             nproc=self.executor.get_nproc()).result()
+		if not result.ok:
+			raise RuntimeError("{} failed; see {}".format(result, result.stderr))
+		return result
+
+
+class Pipeline:
+	"""A graph of Tasks, run in dependency order
+
+	Tasks run as soon as everything they depend on has finished, so
+	independent tasks (e.g., MOC cases that share one statepoint) run
+	at the same time, and a task that follows one case (e.g., its plots)
+	does not wait for the others. Up-to-date tasks are skipped.
+
+	Parameter:
+	----------
+	max_workers:    int, optional; maximum number of tasks running at once.
+	                Job tasks are further limited by their backend's thread budget.
+	                [Default: None --> concurrent.futures' default]
+	"""
+	def __init__(self, max_workers=None):
+		self.max_workers = max_workers
+		self._tasks = OrderedDict()
+
+	@property
+	def tasks(self):
+		return self._tasks
+
+	def add_task(self, task):
+		"""Add a Task to the pipeline, and return it"""
+		if task.name in self._tasks:
+			raise ValueError("A task named {} already exists.".format(task.name))
+		self._tasks[task.name] = task
+		return task
+
+	def get_backends(self):
+		"""Get the distinct local backends that the job tasks run with"""
+		backends = []
+		for task in self._tasks.values():
+			backend = getattr(task, "backend", None)
+			if hasattr(backend, "shutdown") and all(backend is not b for b in backends):
+				backends.append(backend)
+		return backends
+
+	@contextmanager
+	def _shutting_down_backends(self):
+		"""Shut the job backends down on exit, so their pools do not leak across runs"""
+		try:
+			yield
+		finally:
+			for backend in self.get_backends():
+				backend.shutdown()
+
+	def get_dependencies(self):
+		"""Get the tasks that each task depends on
+
+		Returns:
+		--------
+		dict of {task name: set of task names}
+		"""
+		producers = {}
+		for task in self._tasks.values():
+			for fname in task.outputs:
+				fname = os.path.realpath(fname)
+				if fname in producers:
+					errstr = "{} is an output of both {} and {}."
+					raise ValueError(errstr.format(fname, producers[fname], task.name))
+				producers[fname] = task.name
+		dependencies = {}
+		for task in self._tasks.values():
+			deps = set(task.requires)
+			unknown = deps - self._tasks.keys()
+			if unknown:
+				raise ValueError("{} requires unknown tasks: {}".format(task.name, unknown))
+			for fname in task.inputs:
+				producer = producers.get(os.path.realpath(fname))
+				if producer is not None:
+					deps.add(producer)
+			deps.discard(task.name)
+			dependencies[task.name] = deps
+		return dependencies
+
+	def get_order(self):
+		"""Get the task names in an order that respects their dependencies
+
+		Raises a ValueError if the dependencies are cyclic.
+		"""
+		dependencies = self.get_dependencies()
+		order = []
+		remaining = OrderedDict((name, set(deps)) for name, deps in dependencies.items())
+		while remaining:
+			ready = [name for name, deps in remaining.items() if not deps]
+			if not ready:
+				raise ValueError("Cyclic dependencies among: {}".format(list(remaining)))
+			for name in ready:
+				order.append(name)
+				del remaining[name]
+			for deps in remaining.values():
+				deps.difference_update(ready)
+		return order
+
+	def run(self, force=False, dry_run=False):
+		"""Run the pipeline
+
+		A task whose dependency failed is not run; it is "blocked".
+
+		Parameters:
+		-----------
+		force:          bool, optional; whether to run the tasks even if up to date.
+		                [Default: False]
+		dry_run:        bool, optional; whether to only report what would run.
+		                Tasks downstream of a stale task are reported as stale too.
+		                [Default: False]
+
+		Returns:
+		--------
+		OrderedDict of {task name: status}, where status is one of
+		"done", "skipped", "failed", or "blocked"
+		"""
+		dependencies = self.get_dependencies()
+		order = self.get_order()
+		status = OrderedDict((name, None) for name in order)
+		if dry_run:
+			for name in order:
+				reason = self._tasks[name].get_stale_reason()
+				if reason is None and any(status[d] == DONE for d in dependencies[name]):
+					reason = "a dependency will run"
+				if force or reason:
+					status[name] = DONE
+					print("Would run {}: {}".format(name, reason or "forced"))
+				else:
+					status[name] = SKIPPED
+			return status
+
+		running = {}
+		with self._shutting_down_backends(), \
+		     ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+			while True:
+				for name in order:
+					if status[name] is not None or name in running.values():
+						continue
+					dep_status = [status[d] for d in dependencies[name]]
+					if any(s in (FAILED, BLOCKED) for s in dep_status):
+						status[name] = BLOCKED
+						print("Blocked:", name)
+						continue
+					if not all(s in (DONE, SKIPPED) for s in dep_status):
+						continue
+					task = self._tasks[name]
+					reason = task.get_stale_reason()
+					if not force and reason is None:
+						status[name] = SKIPPED
+						print("Up to date:", name)
+						continue
+					print("Running {} ({})".format(name, reason or "forced"))
+					running[pool.submit(task.run)] = name
+				if not running:
+					break
+				finished, _ = wait(running, return_when=FIRST_COMPLETED)
+				for future in finished:
+					name = running.pop(future)
+					error = future.exception()
+					if error is None:
+						status[name] = DONE
+						print("Finished:", name)
+					else:
+						status[name] = FAILED
+						print("FAILED: {}: {}".format(name, error))
+		return status
+
+
+def add_openmc_tasks(pipeline, case, statepoint, path="./", command=("openmc",)):
+	"""Add the XML export and OpenMC run of a case to a Pipeline
+
+	The MGXS library files are written with the XML; each MOC job reads them
+	and the statepoint to get its cross sections.
+
+	Parameters:
+	-----------
+	pipeline:       Pipeline
+	case:           BaseCase with its Monte Carlo tallies made
+	statepoint:     str; file name of the statepoint OpenMC will write
+	path:           str, optional; directory to export to and run OpenMC in.
+	                It must also have the OpenMC settings.xml.
+	                [Default: "./"]
+	command:        iterable of str, optional; command that runs OpenMC
+	                [Default: ("openmc",)]
+
+	Returns:
+	--------
+	str; path to the statepoint, for use as an input of the MOC tasks
+	"""
+	xml_files = [os.path.join(path, f) for f in ("geometry.xml", "materials.xml")]
+	if case._tallies:
+		xml_files.append(os.path.join(path, "tallies.xml"))
+	lib_files = [os.path.join(path, "{}_lib_{}.pkl".format(dom, n))
+	             for dom in case.domains for n, tallied in case.tallied_groups.items()
+	             if n == tallied]
+	pipeline.add_task(Task("xml", lambda: case.export_to_xml(path),
+	                       outputs=xml_files + lib_files))
+	statepoint = os.path.join(path, statepoint)
+	pipeline.add_task(CommandTask("openmc", command, cwd=path,
+	                              inputs=xml_files + [os.path.join(path, "settings.xml")],
+	                              outputs=[statepoint]))
+	return statepoint
+
+
+def add_moc_tasks(pipeline, automator, workdir, script_file, minutes, inputs,
+                  results_file, plot=None, backend=None, nproc=None, max_threads=None):
+	"""Add one MOC job (and its plots) per case of an Automator sweep to a Pipeline
+
+	Parameters:
+	-----------
+	pipeline:       Pipeline
+	automator:      Automator with all its variables set
+	workdir:        str; directory to write the job scripts to, and to run them in
+	script_file:    str; Python script to call inside the job script
+	minutes:        int; walltime of each job
+	inputs:         iterable of str; files every case reads, e.g., the statepoint
+	results_file:   str; results file each case writes, formatted with the
+	                case's variables and "case_name", e.g.,
+	                "{geneity}/{ngroups}groups/results_{case_name}.h5"
+	plot:           callable, optional; function of (case_name, results file)
+	                that makes the plots of one case
+	                [Default: None --> no plots]
+	backend:        LocalBackend, optional; backend to run the jobs with
+	                [Default: None --> a LocalBackend with `nproc` and `max_threads`]
+	nproc:          int, optional; threads for each job, if `backend` is None
+	                [Default: None --> as many as DEFAULT_NPROC that fit in `max_threads`]
+	max_threads:    int, optional; total number of threads for all jobs, if `backend` is None
+	                [Default: None --> the number of CPUs on this machine]
+
+	Returns:
+	--------
+	list of str; names of the MOC tasks
+	"""
+	if backend is None:
+		backend = LocalBackend(max_threads=max_threads, nproc=nproc, workdir=workdir)
+	names = []
+	for case_name, case_vars in automator.get_cases().items():
+		ex = automator.get_executor(case_name, case_vars, script_file, minutes, backend)
+		results = os.path.join(workdir, results_file.format(case_name=case_name, **case_vars))
+		script = os.path.join(workdir, "run_{}.sh".format(case_name))
+		task = JobTask("moc " + case_name, ex, script, backend,
+		               inputs=inputs, outputs=[results], **case_vars)
+		pipeline.add_task(task)
+		names.append(task.name)
+		if plot is not None:
+			pipeline.add_task(Task("plot " + case_name,
+			                       lambda c=case_name, r=results: plot(c, r),
+			                       inputs=[results]))
+	return names
@@ -284,8 +284,8 @@ def compare_moc_rates(mesh_shape, montecarlo_coarse, moc_coarse, moc1, moc2,
 	for k, moc_array in enumerate((moc1, moc2)):
 		if moc_array is None:
 			continue
-		elif moc_array.shape == moc_coarse:
-			coarse_mocs[k][:,:] = moc1
+		elif moc_array.shape == moc_coarse.shape:
+			coarse_mocs[k][:,:] = moc_array
 		else:
 			# project
 			coarse_mocs[k][:,:] = project_array(moc_array, moc_coarse)
@@ -868,7 +868,7 @@ def het25_hom25_hom11(mesh_shape, solve_type, condense_to=None, ebar=False):
 		assert condense_to in ["19x19"] + _MESHES, \
 			"Unknown shape to condense to"
 		shape = np.array(condense_to.split('x'), dtype=int)
-		blank_array = np.empty(shape)
+		blank_array = np.zeros(shape)
 		het25 = project_array(het25, blank_array)
 		hom25 = project_array(hom25, blank_array)
 		hom11 = project_array(hom11, blank_array)
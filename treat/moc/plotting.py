@@ -3,9 +3,11 @@
 # A better plotting module for the MC/OpenMC manager
 
 import os
+import functools
 import matplotlib.pyplot as plt
 import numpy as np
-from .constants import PITCH, HPITCH
+from .constants import PITCH, HPITCH, RESULTS_FILE
+from .results import read_rates
 
 
 def _slashed(directory):
@@ -26,6 +28,38 @@ def _get_geneity(homogeneous):
 		return "heterogeneous"
 
 
+def _load_arrays(path, monte, ngroups, mesh_shape, rxn, g):
+	"""Load reaction rates from a results directory
+	
+	The HDF5 results file is used if it exists; otherwise, the rates are
+	read from the legacy text files. See `load_results()` for the parameters.
+	"""
+	if monte:
+		code = "montecarlo"
+	else:
+		code = "moc"
+	mesh_name = _get_mesh_name(mesh_shape)
+	if os.path.isfile(path + RESULTS_FILE):
+		return read_rates(path + RESULTS_FILE, code, mesh_name, rxn, g)
+	if g == 0:
+		# Integrated
+		fname = path + "{ngroups}groups_{code}_{rxn}_rates_{mesh_name}".format(**locals())
+		return np.loadtxt(fname)
+	elif g == -1:
+		# All groups in a bigger array
+		master_array = np.empty(shape=tuple(mesh_shape) + (ngroups,))
+		fmt = "{code}_{rxn}_{gp:02d}-of-{ngroups:02d}_{mesh_name}"
+		for i in range(ngroups):
+			gp = i + 1
+			fname = path + fmt.format(**locals())
+			master_array[..., i] = np.loadtxt(fname)
+		return master_array
+	else:
+		# Single energy group
+		fname = path + "{code}_{rxn}_{g:02d}-of-{ngroups:02d}_{mesh_name}".format(**locals())
+		return np.loadtxt(fname)
+
+
 def load_results(root, homogeneous, ngroups, mesh_shape, solver, rxn, g,
                  monte=False, dir_suffix="", het_suffix="", hom_suffix="", **kwargs):
 	"""Load the reaction rates from disk
@@ -53,6 +87,7 @@ def load_results(root, homogeneous, ngroups, mesh_shape, solver, rxn, g,
 	Returns:
 	--------
 	np.array of the reaction rates --> if g == -1, then the last index is energy groups.
+	Only the requested slice is read from the HDF5 results file, when there is one.
 	"""
 	assert g <= ngroups, "Group {} of {} does not exist.".format(g, ngroups)
 	# Construct the path
@@ -75,32 +110,15 @@ def load_results(root, homogeneous, ngroups, mesh_shape, solver, rxn, g,
 	path = root + "{geneity}/{ngroups}groups/cmfd{mesh_name}-{solver}{dir_suffix}/".format(**locals())
 	assert os.path.isdir(path), "Path does not exist: {}".format(path)
 	# Load and return the arrays
-	if monte:
-		code = "montecarlo"
-	else:
-		code = "moc"
-	if g == 0:
-		# Integrated
-		fname = path + "{ngroups}groups_{code}_{rxn}_rates_{mesh_name}".format(**locals())
-		return np.loadtxt(fname)
-	elif g == -1:
-		# All groups in a bigger array
-		master_array = np.empty(shape = mesh_shape + (ngroups,))
-		fmt = "{code}_{rxn}_{gp:02d}-of-{ngroups:02d}_{mesh_name}"
-		for i in range(ngroups):
-			gp = i + 1
-			fname = path + fmt.format(**locals())
-			master_array[..., i] = np.loadtxt(fname)
-		return master_array
-	else:
-		# Single energy group
-		fname = path + "{code}_{rxn}_{g:02d}-of-{ngroups:02d}_{mesh_name}".format(**locals())
-		return np.loadtxt(fname)
+	return _load_arrays(path, monte, ngroups, mesh_shape, rxn, g)
 
 
 def load_sph_results(root, ngroups, mesh_shape, solver, rxn, g, i,
                      monte=False, case_dir="", **kwargs):
-	"""Load the reaction rates from disk
+	"""Load the reaction rates of an SPH iteration from disk
+	
+	See `load_results()` for the parameters; `i` is the SPH iteration number,
+	and `case_dir` is the directory of the case under "sph_calcs/{ngroups}groups/".
 	"""
 	
 	assert g <= ngroups, "Group {} of {} does not exist.".format(g, ngroups)
@@ -119,33 +137,53 @@ def load_sph_results(root, ngroups, mesh_shape, solver, rxn, g, i,
 	              "cmfd{mesh_name}-{solver}_iter{i:02d}/".format(**locals())
 	assert os.path.isdir(path), "Path does not exist: {}".format(path)
 	# Load and return the arrays
-	if monte:
-		code = "montecarlo"
-	else:
-		code = "moc"
-	if g == 0:
-		# Integrated
-		fname = path + "{ngroups}groups_{code}_{rxn}_rates_{mesh_name}".format(**locals())
-		return np.loadtxt(fname)
-	elif g == -1:
-		# All groups in a bigger array
-		master_array = np.empty(shape=mesh_shape + (ngroups,))
-		fmt = "{code}_{rxn}_{gp:02d}-of-{ngroups:02d}_{mesh_name}"
-		for i in range(ngroups):
-			gp = i + 1
-			fname = path + fmt.format(**locals())
-			master_array[..., i] = np.loadtxt(fname)
-		return master_array
-	else:
-		# Single energy group
-		fname = path + "{code}_{rxn}_{g:02d}-of-{ngroups:02d}_{mesh_name}".format(**locals())
-		return np.loadtxt(fname)
+	return _load_arrays(path, monte, ngroups, mesh_shape, rxn, g)
 
 
-def project_array(fine, coarse):
-	"""Projects a coarse array on a finer array.
-	The shapes of the two must be evenly divisible.
-	Mesh must be uniform (i.e., have equal volumes/weights)
+@functools.lru_cache(maxsize=None)
+def get_overlap_matrix(nfine, ncoarse):
+	"""Get the fraction of each fine cell within each coarse cell along one axis
+	
+	Both meshes span the same extent with uniform cells. The matrix is
+	cached, so each pair of mesh sizes is only computed once.
+	
+	Parameters:
+	-----------
+	nfine:      int; number of fine cells along the axis
+	ncoarse:    int; number of coarse cells along the axis
+	
+	Returns:
+	--------
+	array of floats, shape (ncoarse, nfine); read-only
+	"""
+	fine_edges = np.linspace(0, 1, nfine + 1)
+	coarse_edges = np.linspace(0, 1, ncoarse + 1)
+	lower = np.maximum(coarse_edges[:-1, None], fine_edges[None, :-1])
+	upper = np.minimum(coarse_edges[1:, None], fine_edges[None, 1:])
+	overlap = (upper - lower)*nfine
+	# Clean up roundoff at the shared edges
+	overlap[overlap < 1E-9] = 0
+	overlap.flags.writeable = False
+	return overlap
+
+
+def _sum_onto_axis(array, nfine, ncoarse, axis):
+	"""Sum the fine cells of one axis onto the coarse cells"""
+	if nfine % ncoarse == 0:
+		ratio = nfine // ncoarse
+		shape = array.shape[:axis] + (ncoarse, ratio) + array.shape[axis + 1:]
+		return array.reshape(shape).sum(axis=axis + 1)
+	overlap = get_overlap_matrix(nfine, ncoarse)
+	return np.moveaxis(np.tensordot(overlap, array, axes=(1, axis)), 0, axis)
+
+
+def project_array(fine, coarse, weights=None):
+	"""Projects a fine array on a coarser array.
+	
+	Each coarse cell gets the (weighted) average of the fine cells within it.
+	NaNs in `fine` count as zeros. Where the mesh ratios are integers, the
+	fine cells are summed by reshaping; otherwise, fine cells are split
+	between coarse cells by their overlap.
 
 	Tested on:
 	 * OpenMC fission rates 285 -> 95
@@ -155,34 +193,42 @@ def project_array(fine, coarse):
 	Parameters:
 	-----------
 	fine:       array of floats; the array to project.
-				Its shape must be an integer*(coarse.shape)
+				Its leading axes are the mesh, (x, y) or (x, y, z); any
+				trailing axes (e.g., energy groups) are projected all at once.
 	coarse:     array of floats; the template array to project upon.
+				Its shape is the coarse mesh: (x, y) or (x, y, z).
 				Anyplace `coarse` has a NaN, one will be placed in the output.
+	weights:    array of floats with the mesh shape of `fine`, optional;
+				weight (e.g., volume) of each fine cell.
+				[Default: None --> uniform mesh]
 
 	Returns:
 	--------
-	array of floats; values of `fine` projected down to the shape of `coarse`
+	array of floats; values of `fine` projected down to the shape of `coarse`,
+	followed by any trailing axes of `fine`.
 	"""
-	f = np.array(fine.shape)
-	c = np.array(coarse.shape)
-	assert (f // c == f / c).all(), "Meshes do not line up!"
-	new = np.zeros(c)
-	xratio, yratio = f // c
-	for i in range(c[0]):
-		for j in range(c[1]):
-			tot = 0
-			if np.isnan(coarse[i, j]):
-				new[i, j] = np.nan
-			else:
-				for cmi in range(xratio):
-					fmi = xratio * i + cmi
-					for cmj in range(yratio):
-						fmj = yratio * j + cmj
-						add = fine[fmi, fmj]
-						if not np.isnan(add):
-							tot += add
-				new[i, j] = tot
-	new /= (xratio * yratio)
+	fine = np.asarray(fine, dtype=float)
+	coarse = np.asarray(coarse)
+	c = coarse.shape
+	ndim = len(c)
+	assert fine.ndim >= ndim, \
+		"Cannot project a {}D array onto a {}D mesh.".format(fine.ndim, ndim)
+	f = fine.shape[:ndim]
+	extra = (1,)*(fine.ndim - ndim)
+	if weights is None:
+		weights = np.ones(f)
+	else:
+		weights = np.asarray(weights, dtype=float)
+		assert weights.shape == f, \
+			"Weights of shape {} do not match the mesh {}.".format(weights.shape, f)
+	total = np.where(np.isnan(fine), 0.0, fine)*weights.reshape(f + extra)
+	norm = weights
+	for axis in range(ndim):
+		total = _sum_onto_axis(total, f[axis], c[axis], axis)
+		norm = _sum_onto_axis(norm, f[axis], c[axis], axis)
+	with np.errstate(divide="ignore", invalid="ignore"):
+		new = total/norm.reshape(c + extra)
+	new[np.isnan(coarse)] = np.nan
 	return new
 
 
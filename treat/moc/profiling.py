@@ -0,0 +1,78 @@
+# Profiling
+#
+# Stage-level timing and memory records for the MOC pipeline
+
+import time
+import json
+import resource
+from contextlib import contextmanager
+
+
+def get_peak_rss():
+	"""Get the peak resident set size of this process so far, in MB"""
+	# ru_maxrss is in kB on Linux
+	return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss/1024.0
+
+
+class StageTimer:
+	"""Record the wall time, CPU time, and peak memory of named stages
+
+	Stages may be nested; a nested stage is named after its parent,
+	e.g., "prep/lattice". Repeated stages accumulate their times.
+
+	Attributes:
+	-----------
+	stages:         dict of {name: {"wall": s, "cpu": s, "peak_rss": MB, "calls": int}}
+	counts:         dict of {name: int}; problem sizes, such as the number of FSRs
+	"""
+	def __init__(self):
+		self.stages = {}
+		self.counts = {}
+		self._stack = []
+
+	@contextmanager
+	def stage(self, name):
+		"""Time the enclosed block as the stage `name`"""
+		self._stack.append(name)
+		full_name = "/".join(self._stack)
+		wall0 = time.perf_counter()
+		cpu0 = time.process_time()
+		try:
+			yield
+		finally:
+			wall = time.perf_counter() - wall0
+			cpu = time.process_time() - cpu0
+			self._stack.pop()
+			record = self.stages.setdefault(full_name, {"wall": 0.0, "cpu": 0.0, "calls": 0})
+			record["wall"] += wall
+			record["cpu"] += cpu
+			record["calls"] += 1
+			record["peak_rss"] = get_peak_rss()
+
+	def count(self, **counts):
+		"""Record problem sizes, e.g., `count(fsrs=1000, tracks=5000)`"""
+		for key, value in counts.items():
+			self.counts[key] = int(value)
+
+	def as_dict(self):
+		return {"stages": self.stages, "counts": self.counts, "peak_rss": get_peak_rss()}
+
+	def get_report(self):
+		"""Get a table of the stage times as a string"""
+		lines = ["{:32s} {:>10s} {:>10s} {:>10s}".format("Stage", "Wall (s)", "CPU (s)", "RSS (MB)")]
+		for name, record in self.stages.items():
+			lines.append("{:32s} {:10.3f} {:10.3f} {:10.1f}".format(
+				name, record["wall"], record["cpu"], record["peak_rss"]))
+		for key, value in self.counts.items():
+			lines.append("{:32s} {:>10d}".format(key, value))
+		return "\n".join(lines)
+
+	def export_to_json(self, fname):
+		with open(fname, 'w') as f:
+			json.dump(self.as_dict(), f, indent=1)
+
+
+def load_timings(fname):
+	"""Load the timings written by `StageTimer.export_to_json()`"""
+	with open(fname, 'r') as f:
+		return json.load(f)
@@ -0,0 +1,134 @@
+# Results
+#
+# HDF5 container for the results of a single simulation
+
+import h5py
+import numpy as np
+
+
+class ResultsFile:
+	"""HDF5 container for the results of a single simulation
+
+	Layout:
+	-------
+	/                                   attributes: keff, bias, SPH factors, metadata
+	/{code}/{mesh_name}/rates           [reaction, group, x, y]
+	/{code}/{mesh_name}/fission_rates   [x, y]; total fission rates
+	/montecarlo/{mesh_name}/uncertainty [reaction, group, x, y]; standard deviations
+
+	`code` is "moc", "montecarlo", or "diffusion". Groups are "descending";
+	i.e., group 0 is the fastest. Arrays are oriented the same way as the old text files.
+	Rate datasets are chunked by (reaction, group), so reading a single
+	group only reads that group from disk.
+
+	Parameters:
+	-----------
+	fname:          str; path to the HDF5 file
+	mode:           str, optional; h5py file mode ('r', 'w', 'a', ...)
+	                [Default: 'r']
+	"""
+	def __init__(self, fname, mode='r'):
+		self.fname = fname
+		self._file = h5py.File(fname, mode)
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *args):
+		self.close()
+
+	def close(self):
+		self._file.close()
+
+	@property
+	def attrs(self):
+		return self._file.attrs
+
+	def set_attributes(self, **attributes):
+		"""Set scalar or array attributes on the file. None values are skipped."""
+		for key, value in attributes.items():
+			if value is not None:
+				self._file.attrs[key] = value
+
+	def write_fission_rates(self, code, mesh_name, rates):
+		"""Write the total fission rates on a mesh
+
+		Parameters:
+		-----------
+		code:           str; "moc" or "montecarlo"
+		mesh_name:      str; the mesh name in the format {NX}x{NY}, e.g., "3x3"
+		rates:          array of floats with shape (nx, ny)
+		"""
+		group = self._file.require_group("{}/{}".format(code, mesh_name))
+		group.create_dataset("fission_rates", data=rates)
+
+	def write_rates(self, code, mesh_name, reactions, rates, uncertainty=None):
+		"""Write the groupwise reaction rates on a mesh
+
+		Parameters:
+		-----------
+		code:           str; "moc" or "montecarlo"
+		mesh_name:      str; the mesh name in the format {NX}x{NY}, e.g., "3x3"
+		reactions:      list of str; names of the reactions, in the order of `rates`
+		rates:          array of floats with shape (nreactions, ngroups, nx, ny)
+		uncertainty:    array of floats with the same shape as `rates`, optional;
+		                standard deviations of the rates
+		                [Default: None]
+		"""
+		rates = np.asarray(rates)
+		assert rates.ndim == 4, "Rates must be indexed by [reaction, group, x, y]."
+		assert len(reactions) == rates.shape[0], \
+			"{} reactions given for {} sets of rates.".format(len(reactions), rates.shape[0])
+		chunks = (1, 1) + rates.shape[2:]
+		group = self._file.require_group("{}/{}".format(code, mesh_name))
+		group.attrs["reactions"] = np.array(reactions, dtype="S")
+		group.create_dataset("rates", data=rates, chunks=chunks)
+		if uncertainty is not None:
+			group.create_dataset("uncertainty", data=uncertainty, chunks=chunks)
+
+	def get_reactions(self, code, mesh_name):
+		"""Get the list of reactions saved for a code and mesh"""
+		group = self._file["{}/{}".format(code, mesh_name)]
+		return [r.decode() for r in group.attrs["reactions"]]
+
+	def read_rates(self, code, mesh_name, rxn, g, uncertainty=False):
+		"""Read (a slice of) the reaction rates
+
+		Parameters:
+		-----------
+		code:           str; "moc" or "montecarlo"
+		mesh_name:      str; the mesh name in the format {NX}x{NY}, e.g., "3x3"
+		rxn:            str; reaction name (e.g., "fission" or "flux")
+		g:              int; group number to return. indexed from 1.
+		                To get an array of integrated reaction rates, use `g=0`
+		                To get an array of all groups' reaction rates, use `g=-1`
+		uncertainty:    bool, optional; whether to read the standard deviations
+		                instead of the rates (Monte Carlo only)
+		                [Default: False]
+
+		Returns:
+		--------
+		np.array of the reaction rates --> if g == -1, then the last index is energy groups.
+		"""
+		group = self._file["{}/{}".format(code, mesh_name)]
+		if g == 0 and rxn == "fission" and "fission_rates" in group and not uncertainty:
+			return group["fission_rates"][...]
+		r = self.get_reactions(code, mesh_name).index(rxn)
+		dset = group["uncertainty" if uncertainty else "rates"]
+		if g == 0:
+			if uncertainty:
+				return np.sqrt(np.square(dset[r]).sum(axis=0))
+			return dset[r].sum(axis=0)
+		elif g == -1:
+			return np.moveaxis(dset[r], 0, -1)
+		else:
+			return dset[r, g - 1]
+
+
+def read_rates(fname, code, mesh_name, rxn, g, uncertainty=False):
+	"""Open a ResultsFile, read (a slice of) the reaction rates, and close it
+
+	See `ResultsFile.read_rates()` for the parameters.
+	"""
+	with ResultsFile(fname, 'r') as results_file:
+		return results_file.read_rates(code, mesh_name, rxn, g, uncertainty)
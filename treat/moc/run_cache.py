@@ -0,0 +1,124 @@
+# Run Cache
+#
+# Content-addressed records of completed simulations
+
+import os
+import json
+import hashlib
+import numpy as np
+
+_CHUNK_SIZE = 2**20
+_file_digests = {}
+
+
+def hash_file(fname):
+	"""Get the SHA-256 digest of a file's contents
+
+	Digests are memoized by (path, size, modification time), so large files
+	such as statepoints are only read once per process.
+
+	Parameter:
+	----------
+	fname:          str; path to the file
+
+	Returns:
+	--------
+	str; hexadecimal digest
+	"""
+	stat = os.stat(fname)
+	key = (os.path.realpath(fname), stat.st_size, stat.st_mtime)
+	if key not in _file_digests:
+		sha = hashlib.sha256()
+		with open(fname, 'rb') as f:
+			for chunk in iter(lambda: f.read(_CHUNK_SIZE), b''):
+				sha.update(chunk)
+		_file_digests[key] = sha.hexdigest()
+	return _file_digests[key]
+
+
+def _jsonable(value):
+	"""Convert arrays and containers into plain, reproducibly ordered types"""
+	if isinstance(value, np.ndarray):
+		return value.tolist()
+	if isinstance(value, np.integer):
+		return int(value)
+	if isinstance(value, np.floating):
+		return float(value)
+	if isinstance(value, dict):
+		return {str(k): _jsonable(v) for k, v in value.items()}
+	if isinstance(value, (list, tuple)):
+		return [_jsonable(v) for v in value]
+	return value
+
+
+def get_input_hash(inputs):
+	"""Hash a dictionary of simulation inputs
+
+	Parameter:
+	----------
+	inputs:         dict of {str: value}; values may be numbers, strings, arrays,
+	                or (nested) lists, tuples, and dicts of them
+
+	Returns:
+	--------
+	str; hexadecimal digest
+	"""
+	string = json.dumps(_jsonable(inputs), sort_keys=True)
+	return hashlib.sha256(string.encode()).hexdigest()
+
+
+def load_record(fname):
+	"""Load a cache record from a JSON file, or None if there is none"""
+	if not os.path.isfile(fname):
+		return None
+	with open(fname, 'r') as f:
+		return json.load(f)
+
+
+def dump_record(record, fname):
+	"""Write a cache record to a JSON file"""
+	with open(fname, 'w') as f:
+		json.dump(_jsonable(record), f, indent=1, sort_keys=True)
+
+
+class RunCache:
+	"""Directory of records of completed simulations, keyed by input hash
+
+	Each record is a JSON file named after the hash of the simulation inputs,
+	containing the results directory and the scalar results (keff, bias, ...).
+
+	Parameter:
+	----------
+	directory:      str; where to keep the records. Created if it does not exist.
+	"""
+	def __init__(self, directory):
+		if not os.path.isdir(directory):
+			os.makedirs(directory)
+		self.directory = directory
+
+	def _get_fname(self, digest):
+		return os.path.join(self.directory, digest + ".json")
+
+	def __contains__(self, digest):
+		return self.get(digest) is not None
+
+	def get(self, digest):
+		"""Get the record for an input hash
+
+		Records whose results directory no longer exists are ignored.
+
+		Returns:
+		--------
+		dict of the record, or None if there is no valid record.
+		"""
+		record = load_record(self._get_fname(digest))
+		if record is None:
+			return None
+		path = record.get("path")
+		if path and not os.path.isdir(path):
+			return None
+		return record
+
+	def store(self, digest, record):
+		"""Save the record for an input hash"""
+		dump_record(record, self._get_fname(digest))
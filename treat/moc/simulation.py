@@ -3,6 +3,9 @@
 import os
 import numpy as np
 from .standard import *
+from .constants import CACHE_RECORD, TIMINGS_FILE, IDS_PICKLE, RESULTS_FILE
+from . import run_cache
+from .profiling import load_timings
 
 
 class Simulation:
@@ -30,6 +33,18 @@ class Simulation:
 	                The higher the number, the more damping will be applied.
 	                Guillaume recommends a value on (0, 1).
 	                [Default: 0 --> no damping.]
+	cmfd_relaxation: float; SOR relaxation factor of the CMFD solver
+	                [Default: 1.5]
+	cmfd_knearest:  int; number of nearest CMFD cells to use when updating the MOC fluxes
+	                [Default: 3]
+	cmfd_flux_update: bool; whether CMFD updates the MOC fluxes
+	                [Default: True]
+	cmfd_groups:    int; number of groups of the tabulated structure to condense the
+	                CMFD problem onto. It must nest in the MOC structure (e.g., 25 --> 4).
+	                [Default: None --> the MOC group structure]
+	cmfd_tune:      bool; whether to choose the CMFD settings above from short pilot
+	                solves before the run. See `moc.cmfd_config.tune()`.
+	                [Default: False]
 	fsrsects:       int; number of source region azimuthal sectors to use in b4c control rods
 					TODO: Consider whether to repurpose this argument for all cells.
 	                [Default: 0 --> no azimuthal discretization]
@@ -43,9 +58,26 @@ class Simulation:
 	                [Default: None]
 	save_uncert:    bool; if saving results, whether to save the OpenMC uncertainties as well
 	                [Default: False]
+	save_text:      bool; if saving results, whether to also save the reaction rates as
+	                text files, one per group, reaction, and mesh
+	                [Default: False --> only the HDF5 results file]
 	plot:           bool; whether to make plots of the source regions,
 	                materials, cells, and spatial fluxes
 	                [Default: False]
+	warm_start:     moc.WarmStart or str; previous solution (or HDF5 file containing one)
+	                to use as the initial guess for the fluxes
+	                [Default: None --> flat initial guess]
+	save_fluxes:    bool; if saving results, whether to save the FSR fluxes and keff
+	                for warm-starting later simulations
+	                [Default: False]
+	ids_fname:      str; file name of the ids_to_keys pickle
+	                [Default: IDS_PICKLE --> "ids_to_keys.pkl"]
+	use_cache:      bool; whether to skip the run when the results of a simulation with
+	                identical inputs already exist (in the results directory or `cache_dir`)
+	                [Default: False]
+	cache_dir:      str; directory of a shared moc.run_cache.RunCache to look up and
+	                record results in, in addition to the results directory
+	                [Default: None]
 	"""
 	def __init__(self, case, ngroups, solve_type, mesh_shape, homogeneous,
 	             use_sph=False, nazim=NAZIM, dazim=DAZIM):
@@ -66,6 +98,11 @@ class Simulation:
 		self.cmfd_mesh = mesh_shape
 		self.mesh_str = "x".join(np.array(mesh_shape, dtype=str))
 		self.stabilize = 0.0
+		self.cmfd_relaxation = 1.5
+		self.cmfd_knearest = 3
+		self.cmfd_flux_update = True
+		self.cmfd_groups = None
+		self.cmfd_tune = False
 		self.fsrsects = 0
 		self.crdrings = False
 		self.elements = {}
@@ -74,8 +111,15 @@ class Simulation:
 		self.save_results = True
 		self.save_suffix = None
 		self.save_uncert = False
+		self.save_text = False
 		self.plot = False
+		self.warm_start = None
+		self.save_fluxes = False
+		self.ids_fname = IDS_PICKLE
+		self.use_cache = False
+		self.cache_dir = None
 		self._path = None
+		self._timings = None
 	
 	@property
 	def calculate_sph(self):
@@ -94,6 +138,16 @@ class Simulation:
 	def path(self):
 		return self._path
 	
+	@property
+	def timings(self):
+		"""dict of the wall time, CPU time, and peak memory of each stage of the run,
+		and the numbers of FSRs, tracks, and iterations. None if it has not been run."""
+		if self._timings is None and self._path:
+			fname = os.path.join(self._path, TIMINGS_FILE)
+			if os.path.isfile(fname):
+				self._timings = load_timings(fname)
+		return self._timings
+	
 	@path.setter
 	def path(self, path):
 		if path is None:
@@ -137,6 +191,7 @@ MOC simulation for:
 	Domain:         {domain}
 	Geneity:        {gen}
 	Mesh:           {mesh_str}
+	CMFD:           {cmfd_str}
 	Solver:         {solve_type}
 	CMM:            {use_cmm}
 	SPH:            {use_sph}
@@ -154,23 +209,119 @@ MOC simulation for:
 			vardict["sph_elements"] = self.calculate_sph
 		else:
 			vardict["sph_elements"] = False
+		if self.cmfd_tune:
+			vardict["cmfd_str"] = "tuned from pilot solves"
+		else:
+			vardict["cmfd_str"] = "relaxation {}, {}-nearest, {} groups".format(
+				self.cmfd_relaxation, self.cmfd_knearest, self.cmfd_groups or self.ngroups)
+			if not self.cmfd_flux_update:
+				vardict["cmfd_str"] += ", no flux update"
 		return base.format(**vardict)
 	
 	
+	def get_input_hash(self):
+		"""Hash every input that affects the results of this simulation
+		
+		This includes the statepoint, MGXS library, and ids_to_keys files,
+		the MOC parameters, what is saved, and the parameters
+		(divisions, CMM, SPH, ...) of each Element.
+		"""
+		inputs = self._case.get_cache_inputs(self.domain, self.ngroups)
+		for attr in ("domain", "ngroups", "cmfd_mesh", "nazim", "dazim", "solve_type",
+		             "stabilize", "use_cmm", "use_sph", "crdrings", "fsrsects",
+		             "cmfd_relaxation", "cmfd_knearest", "cmfd_flux_update", "cmfd_groups",
+		             "cmfd_tune", "save_fluxes", "save_text", "save_uncert"):
+			inputs[attr] = getattr(self, attr)
+		if os.path.isfile(self.ids_fname):
+			inputs["ids_to_keys"] = run_cache.hash_file(self.ids_fname)
+		else:
+			inputs["ids_to_keys"] = None
+		inputs["calculate_sph"] = self._calculate_sph
+		inputs["elements"] = {key: elem.get_cache_inputs(self.ngroups)
+		                      for key, elem in self.elements.items()}
+		return run_cache.get_input_hash(inputs)
+	
+	def _get_cached_record(self, digest):
+		"""Find the record of a completed simulation with these inputs, if any"""
+		if self.cache_dir:
+			record = run_cache.RunCache(self.cache_dir).get(digest)
+			if record is not None:
+				return record
+		path = self._path or self._get_default_path(self.save_suffix)
+		record = run_cache.load_record(os.path.join(path, CACHE_RECORD))
+		if record is not None and record.get("hash") == digest:
+			# The results may have been deleted since the record was written
+			if record["path"] and os.path.isfile(os.path.join(record["path"], RESULTS_FILE)):
+				return record
+		return None
+	
+	def _store_record(self, digest, results):
+		record = {"hash": digest, "path": self._path, "results": results}
+		if self._path:
+			run_cache.dump_record(record, os.path.join(self._path, CACHE_RECORD))
+		if self.cache_dir:
+			run_cache.RunCache(self.cache_dir).store(digest, record)
+	
 	def run(self, nproc=4):
+		"""Run the simulation
+		
+		If `use_cache` is set and a simulation with identical inputs has already
+		been run, its results are returned without launching OpenMOC.
+		
+		Parameter:
+		----------
+		nproc:      int, optional; number of threads for OpenMOC to use
+		            [Default: 4]
+		
+		Returns:
+		--------
+		dict of {str: float}; keff, and the OpenMC keff and bias if available.
+		The reaction rates are saved in `self.path`.
+		"""
+		digest = None
+		if self.use_cache:
+			digest = self.get_input_hash()
+			record = self._get_cached_record(digest)
+			if record is not None:
+				self._path = record["path"]
+				print("Identical simulation found; results are in:", self._path)
+				return record["results"]
 		if self.save_results and not self._path:
 			self._set_path()
 		if self.calculate_sph:
 			self._set_sph_keys()
 		print("Running", self.get_report())
-		self._case.run_openmoc(
+		results = self._case.run_openmoc(
 			nproc=nproc,
 			export_path=self._path,
 			calculate_sph=self._sph_keys,
 			**vars(self))
+		self._timings = self._case.timings
+		if digest is not None and results is not None:
+			self._store_record(digest, results)
+		return results
 	
 	
-	def write_xs(self):
-		"""TODO implement"""
-		pass
+	def write_xs(self, export_path=None):
+		"""Export the MGXS of this simulation as an OpenMC multi-group model
+		
+		The MGXS are written exactly as they are applied to OpenMOC, with the
+		CMM and SPH corrections and subdivisions of the elements,
+		to run the same problem with OpenMC in multi-group mode.
+		
+		Parameter:
+		----------
+		export_path:    str, optional; directory to export the model to
+		                [Default: None --> "multigroup/" in the results directory]
+		
+		Returns:
+		--------
+		str; the directory the model was exported to
+		"""
+		if export_path is None:
+			if not self._path:
+				self._set_path()
+			export_path = os.path.join(self._path, "multigroup/")
+		self._case.export_mg_model(export_path=export_path, **vars(self))
+		return export_path
 		
@@ -2,6 +2,7 @@
 #
 # Iteratively sovle for SPH factors
 
+import json
 import numpy as np
 from .simulation import Simulation
 from .constants import SPH_ARRAY
@@ -11,6 +12,59 @@ def _fmt_iter(i):
 	return "iter{:02d}".format(i)
 
 
+class AndersonMixer:
+	"""Anderson acceleration of a fixed-point iteration x = g(x)
+	
+	Each new iterate is the combination of the last `depth` iterates whose
+	residuals, g(x) - x, best cancel in the least-squares sense. With `depth`=0,
+	it is the plain (damped) fixed-point iteration.
+	
+	Parameters:
+	-----------
+	depth:          int, optional; number of previous iterates to mix
+	                [Default: 3]
+	beta:           float, optional; damping factor on (0, 1]
+	                [Default: 1.0 --> undamped]
+	"""
+	def __init__(self, depth=3, beta=1.0):
+		assert depth >= 0, "depth must be a non-negative integer."
+		assert 0 < beta <= 1, "beta must be on (0, 1]."
+		self.depth = depth
+		self.beta = beta
+		self._xs = []
+		self._fs = []
+	
+	def reset(self):
+		self._xs = []
+		self._fs = []
+	
+	def update(self, x, gx):
+		"""Get the next iterate
+		
+		Parameters:
+		-----------
+		x:              array of floats; the current iterate
+		gx:             array of floats; the fixed-point map of the current iterate
+		
+		Returns:
+		--------
+		array of floats; the next iterate
+		"""
+		x = np.ravel(x).astype(float)
+		f = np.ravel(gx) - x
+		self._xs.append(x)
+		self._fs.append(f)
+		if len(self._xs) > self.depth + 1:
+			del self._xs[0], self._fs[0]
+		plain = x + self.beta*f
+		if len(self._xs) == 1:
+			return plain
+		dx = np.diff(self._xs, axis=0)
+		df = np.diff(self._fs, axis=0)
+		gamma = np.linalg.lstsq(df.T, f, rcond=None)[0]
+		return plain - (dx + self.beta*df).T.dot(gamma)
+
+
 class SphIterator(Simulation):
 	def __init__(self, case, ngroups, solve_type, mesh_shape, last_iter=None, **kwargs):
 		super().__init__(case, ngroups, solve_type, mesh_shape,
@@ -18,6 +72,26 @@ class SphIterator(Simulation):
 		if last_iter is None:
 			last_iter = -1
 		self._last_iter = last_iter
+		self._history = []
+	
+	
+	@property
+	def history(self):
+		"""list of dicts of the iteration, keff, residual, and factors of each
+		iteration of the last `solve_in_memory()`"""
+		return self._history
+	
+	
+	def _run_iteration(self, nproc, warm_start):
+		"""Run OpenMOC for one iteration, without keeping its warm start"""
+		print("Running", self.get_report())
+		kwargs = dict(vars(self))
+		kwargs["warm_start"] = warm_start
+		return self._case.run_openmoc(
+			nproc=nproc,
+			export_path=self._path,
+			calculate_sph=self._sph_keys,
+			**kwargs)
 	
 	
 	def _load_factors(self):
@@ -39,24 +113,40 @@ class SphIterator(Simulation):
 			elem.add_sph_factors_from_array(factors)
 	
 	
-	def solve_for_sph_factors(self, max_iter, eps, nproc=4, overwrite=False):
+	def solve_for_sph_factors(self, max_iter, eps, nproc=4, overwrite=False, in_place=False):
+		"""Iterate on the SPH factors until they converge
+		
+		Parameters:
+		-----------
+		max_iter:       int; number of the last SPH iteration to run
+		eps:            float; convergence criterion on the relative change in the factors
+		nproc:          int, optional; number of threads for OpenMOC to use
+		                [Default: 4]
+		overwrite:      bool, optional; whether to overwrite existing results directories
+		                [Default: False]
+		in_place:       bool, optional; whether to keep the OpenMOC geometry, tracks,
+		                and solver between iterations, and only update the MGXS.
+		                [Default: False --> rebuild the model on each iteration]
+		"""
 		self._set_sph_keys()
 		mu = self._load_factors()
 		diff = eps + 1
-		for i in range(self._last_iter + 1, max_iter + 1):
+		first_iter = self._last_iter + 1
+		for i in range(first_iter, max_iter + 1):
 			header = "SPH ITERATION {}:".format(i)
 			header += '\n' + '-'*len(header)
 			print("\n\n" + header)
-			self._case.reset()
 			self._apply_factors(mu)
+			if in_place and i > first_iter:
+				# Start from the last iterate's fluxes as well
+				warm_start = self._case.last_solution
+				self._case.update_openmoc_xs()
+			else:
+				warm_start = self.warm_start
+				self._case.reset()
 			self.save_suffix = _fmt_iter(i)
 			self._set_path(overwrite=overwrite)
-			print("Running", self.get_report())
-			self._case.run_openmoc(
-				nproc=nproc,
-				export_path=self._path,
-				calculate_sph=self._sph_keys,
-				**vars(self))
+			self._run_iteration(nproc, warm_start)
 			self._last_iter = i
 			last_mu = mu
 			mu = self._load_factors()
@@ -70,3 +160,123 @@ class SphIterator(Simulation):
 			print("{}-group factors:\n{}".format(self.ngroups, mu))
 		print("...finished.")
 			
+	
+	
+	def _get_current_factors(self, keys):
+		"""Get the factors the elements already have, or ones"""
+		factors = {}
+		for key in keys:
+			elem = self.elements[key]
+			if self.ngroups in elem.sph:
+				factors[key] = np.array(elem.sph[self.ngroups].factors, dtype=float)
+			else:
+				factors[key] = np.ones(self.ngroups)
+		return factors
+	
+	
+	def solve_in_memory(self, max_iter, eps, nproc=4, per_element=True, depth=3, beta=1.0,
+	                    in_place=True, overwrite=False):
+		"""Iterate on the SPH factors with Anderson acceleration, keeping them in memory
+		
+		Unlike `solve_for_sph_factors()`, the factors are taken directly from the
+		case after each OpenMOC run instead of from the results files, and each
+		element key can have its own set of factors. All the factors are mixed
+		together as one vector, so fewer OpenMOC runs are needed to converge.
+		The iterates are recorded in `history`.
+		
+		Parameters:
+		-----------
+		max_iter:       int; maximum number of SPH iterations (OpenMOC runs)
+		eps:            float; convergence criterion on the relative change in the factors
+		nproc:          int, optional; number of threads for OpenMOC to use
+		                [Default: 4]
+		per_element:    bool, optional; whether each element key in `calculate_sph`
+		                gets its own factors. Otherwise, they all share one set.
+		                [Default: True]
+		depth:          int, optional; number of previous iterates to mix.
+		                0 is the plain fixed-point iteration.
+		                [Default: 3]
+		beta:           float, optional; damping factor on (0, 1]
+		                [Default: 1.0 --> undamped]
+		in_place:       bool, optional; whether to keep the OpenMOC geometry, tracks,
+		                and solver between iterations, and only update the MGXS.
+		                [Default: True]
+		overwrite:      bool, optional; whether to overwrite existing results directories
+		                [Default: False]
+		
+		Returns:
+		--------
+		dict of {element key: array of floats}; the SPH factors of each element
+		"""
+		self._set_sph_keys()
+		keys = list(self._sph_keys)
+		# The factor sets to solve for: one per key, or one shared by all the keys
+		if per_element:
+			sets = [(key,) for key in keys]
+		else:
+			sets = [tuple(keys)]
+		current = self._get_current_factors(keys)
+		x = np.concatenate([np.mean([current[key] for key in s], axis=0) for s in sets])
+		mixer = AndersonMixer(depth, beta)
+		self._history = []
+		diff = eps + 1
+		first_iter = self._last_iter + 1
+		for i in range(first_iter, first_iter + max_iter):
+			header = "SPH ITERATION {}:".format(i)
+			header += '\n' + '-'*len(header)
+			print("\n\n" + header)
+			factors = self._split_factors(x, sets)
+			self._apply_factor_sets(factors)
+			if in_place and i > first_iter:
+				# Start from the last iterate's fluxes as well
+				warm_start = self._case.last_solution
+				self._case.update_openmoc_xs()
+			else:
+				warm_start = self.warm_start
+				self._case.reset()
+			if self.save_results:
+				self.save_suffix = _fmt_iter(i)
+				self._set_path(overwrite=overwrite)
+			results = self._run_iteration(nproc, warm_start)
+			self._last_iter = i
+			new = self._case.get_sph_factors(self.ngroups, sets, self.cmfd_mesh)
+			gx = np.concatenate([new[s] for s in sets])
+			diff = np.divide(abs(gx - x), gx).max()
+			self._history.append({"iteration": i,
+			                      "keff": results["keff"],
+			                      "residual": float(diff),
+			                      "factors": {"+".join(s): mu.tolist() for s, mu in factors.items()}})
+			print("SPH max eps: {:8.6f}".format(diff))
+			if diff <= eps:
+				x = gx
+				print("SPH factors converged in", i - first_iter + 1, "iterations.")
+				break
+			x = mixer.update(x, gx)
+			if (x <= 0).any():
+				# The mixing overshot; fall back on the plain update
+				mixer.reset()
+				x = gx
+		else:
+			print("SPH factors did not converge in", max_iter, "iterations.")
+		factors = self._split_factors(x, sets)
+		self._apply_factor_sets(factors)
+		print("...finished.")
+		return {key: mu for s, mu in factors.items() for key in s}
+	
+	
+	def _split_factors(self, x, sets):
+		"""Split the vector of all the factors into {set of keys: factors}"""
+		g = self.ngroups
+		return {s: x[j*g:(j + 1)*g] for j, s in enumerate(sets)}
+	
+	
+	def _apply_factor_sets(self, factors):
+		for keyset, mu in factors.items():
+			for key in keyset:
+				self.elements[key].add_sph_factors_from_array(mu)
+	
+	
+	def export_history(self, fname):
+		"""Save the convergence history of `solve_in_memory()` as JSON"""
+		with open(fname, 'w') as f:
+			json.dump(self.history, f, indent=1)
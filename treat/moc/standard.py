@@ -4,10 +4,9 @@
 
 
 from .base_case import BaseCase
+from .constants import NAZIM, DAZIM
 
 
-NAZIM = 32
-DAZIM = 0.1
 NGROUPS = (1, 11, 25)
 GENEOUS = {True: "homogeneous", False: "heterogeneous"}
 DOMAINS = {"homogeneous": "universe", "heterogeneous": "cell"}
@@ -26,8 +25,18 @@ class StandardCase(BaseCase):
 	isotropic:          bool, optional; whether to use isotropic elastic
 	                    scattering in the lab frame
 	                    [Default: False]
+	condense_groups:    bool, optional; whether to tally only the finest group
+	                    structure and condense the others from it
+	                    [Default: False]
+	condense_meshes:    bool, optional; whether to tally only the finest mesh of
+	                    each nesting chain of mesh shapes and sum the others from it
+	                    [Default: False]
+	symmetry:           int or "auto", optional; 1 (full core), 2 (east half), or 4
+	                    (northeast quarter), or "auto" to detect it. See `BaseCase`.
+	                    [Default: 1]
 	"""
 	
-	def __init__(self, geometry, mesh_shapes, isotropic=False):
+	def __init__(self, geometry, mesh_shapes, isotropic=False, condense_groups=False,
+	             condense_meshes=False, symmetry=1):
 		super().__init__(geometry, NGROUPS, tuple(DOMAINS.values()),
-		                 mesh_shapes, isotropic)
+		                 mesh_shapes, isotropic, condense_groups, condense_meshes, symmetry)
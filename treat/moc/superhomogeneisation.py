@@ -42,11 +42,7 @@ class SuperhomogeneisationFactors:
 	
 	def _get_corrected_scatter_mgxs(self, scatter_matrix):
 		# TODO: Confirm with Ben that this is how SPH is applied
-		new_scatter = np.zeros(scatter_matrix.shape)
-		for g in range(self._ngroups):
-			new_scatter[g, :] = self._factors * scatter_matrix[g, :]
-		return new_scatter
-			
+		return scatter_matrix*self._factors[None, :]
 	
 	def get_corrected_mgxs(self, reaction_xs):
 		assert self._factors is not None, \
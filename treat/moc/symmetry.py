@@ -0,0 +1,135 @@
+# Symmetry
+#
+# Reduce meshes to a half or quarter core, and unfold the results back to the full core
+#
+# Symmetry 2 keeps the east half of the core (x >= 0), and symmetry 4 keeps
+# the northeast quarter (x >= 0, y >= 0). Symmetry 1 is the full core.
+#
+# A mesh with an odd number of cells along a cut is cut through the middle
+# of its center row (or column). The reduced mesh keeps that row, whose
+# cells only have their kept half in the model, so their rates are doubled
+# when the results are unfolded.
+
+import numpy as np
+
+SYMMETRIES = (1, 2, 4)
+
+
+def check_symmetry(symmetry):
+	assert symmetry in SYMMETRIES, \
+		"symmetry must be one of {}, not {}".format(SYMMETRIES, symmetry)
+
+
+def get_reduced_shape(mesh_shape, symmetry):
+	"""Get the shape of a full-core mesh over the symmetric part of the core
+
+	If the full-core mesh has an odd number of cells along a cut axis,
+	the cells cut in half are kept.
+
+	Parameters:
+	-----------
+	mesh_shape:     tuple of (nx, ny); shape of the full-core mesh
+	symmetry:       int; 1, 2, or 4
+
+	Returns:
+	--------
+	tuple of (nx, ny) of the reduced mesh
+	"""
+	check_symmetry(symmetry)
+	nx, ny = mesh_shape[:2]
+	if symmetry >= 2:
+		nx = (nx + 1)//2
+	if symmetry == 4:
+		ny = (ny + 1)//2
+	return (nx, ny) + tuple(mesh_shape[2:])
+
+
+def get_cut_offsets(mesh_shape, symmetry):
+	"""Get how far the reduced mesh starts before each cut plane, in cells
+
+	Parameters:
+	-----------
+	mesh_shape:     tuple of (nx, ny); shape of the full-core mesh
+	symmetry:       int; 1, 2, or 4
+
+	Returns:
+	--------
+	tuple of (float, float); 0.5 along the axes cut through the middle of a
+	cell, and 0 otherwise
+	"""
+	check_symmetry(symmetry)
+	nx, ny = mesh_shape[:2]
+	xoff = 0.5 if symmetry >= 2 and nx % 2 else 0.0
+	yoff = 0.5 if symmetry == 4 and ny % 2 else 0.0
+	return xoff, yoff
+
+
+def get_cut_widths(mesh_shape, symmetry, cell_width):
+	"""Get the widths of the reduced mesh's cells inside the cut geometry
+
+	The first cell along an axis cut through the middle of a cell is
+	only half inside the geometry; e.g., for `Cmfd.setWidths()`.
+
+	Parameters:
+	-----------
+	mesh_shape:     tuple of (nx, ny); shape of the full-core mesh
+	symmetry:       int; 1, 2, or 4
+	cell_width:     tuple of (float, float), cm; width of a full mesh cell along x and y
+
+	Returns:
+	--------
+	list of [x widths, y widths]; lists of floats, in cm
+	"""
+	reduced = get_reduced_shape(mesh_shape, symmetry)
+	offsets = get_cut_offsets(mesh_shape, symmetry)
+	widths = []
+	for n, offset, w in zip(reduced[:2], offsets, cell_width):
+		axis = [float(w)]*n
+		axis[0] *= 1 - offset
+		widths.append(axis)
+	return widths
+
+
+def unfold(array, symmetry, mesh_shape=None):
+	"""Mirror an array over the symmetric part of the core back onto the full core
+
+	The last two axes of `array` must be in map order:
+	[..., row (y, descending), column (x, ascending)], as in the results files.
+	A center row or column that was cut in half is put back once, with its
+	values doubled to the whole cells' rates.
+
+	Parameters:
+	-----------
+	array:          array of the results on the reduced mesh
+	symmetry:       int; 1, 2, or 4
+	mesh_shape:     tuple of (nx, ny), optional; shape of the full-core mesh
+	                [Default: None --> twice the reduced mesh along each cut]
+
+	Returns:
+	--------
+	array of the results on the full-core mesh
+	"""
+	check_symmetry(symmetry)
+	if mesh_shape is None:
+		xoff, yoff = 0, 0
+	else:
+		xoff, yoff = get_cut_offsets(mesh_shape, symmetry)
+	if xoff or yoff:
+		array = np.array(array, dtype=float)
+	if symmetry >= 2:
+		# The kept half is on the right (east)
+		if xoff:
+			array[..., :, 0] *= 2
+			mirror = np.flip(array[..., :, 1:], axis=-1)
+		else:
+			mirror = np.flip(array, axis=-1)
+		array = np.concatenate([mirror, array], axis=-1)
+	if symmetry == 4:
+		# ...and on top (north)
+		if yoff:
+			array[..., -1, :] *= 2
+			mirror = np.flip(array[..., :-1, :], axis=-2)
+		else:
+			mirror = np.flip(array, axis=-2)
+		array = np.concatenate([array, mirror], axis=-2)
+	return array
@@ -0,0 +1,83 @@
+# Test Local Backend
+#
+# Run a small Automator sweep on this machine, as on a CI node without PBS
+
+import os
+import sys
+from treat.moc.automator import Automator
+from treat.moc.backends import LocalBackend
+from treat.moc.pipeline import Pipeline, add_moc_tasks
+
+# Stands in for the MOC script: records its arguments and thread count
+FAKE_SCRIPT = """\
+import os
+import sys
+with open("ran_" + sys.argv[sys.argv.index("--suffix") + 1], 'w') as f:
+	f.write(os.environ["OMP_NUM_THREADS"] + "\\n" + " ".join(sys.argv[1:]))
+"""
+
+
+def _get_automator():
+	auto = Automator()
+	auto.add_variable("ngroups", [2, 4])
+	auto.add_constant("nazim", 4)
+	auto.add_constant("dazim", 0.5)
+	auto.add_constant("geneity", "homogeneous")
+	auto.add_constant("cmfdmesh", 1)
+	auto.add_constant("divmesh", 1)
+	return auto
+
+
+def test_local_sweep(tmpdir, monkeypatch):
+	workdir = str(tmpdir)
+	script_file = os.path.join(workdir, "fake_moc.py")
+	with open(script_file, 'w') as f:
+		f.write(FAKE_SCRIPT)
+	# The job scripts call `python`
+	monkeypatch.setenv("PATH", os.path.dirname(sys.executable) + os.pathsep + os.environ["PATH"])
+	backend = LocalBackend(max_threads=2, workdir=workdir)
+	results = _get_automator().create_jobs(workdir, script_file, minutes=1,
+	                                       execute=True, backend=backend)
+	assert len(results) == 2
+	assert all(r.ok for r in results), [open(r.stderr).read() for r in results]
+	for case in ("ngroups2", "ngroups4"):
+		with open(os.path.join(workdir, "ran_mesh01_" + case)) as f:
+			nproc, args = f.read().split("\n")
+		# The jobs must fit in the local thread budget, not request a full node
+		assert nproc == "2"
+		assert "--ngroups " + case[-1] in args
+
+
+def test_explicit_nproc_too_large(tmpdir):
+	workdir = str(tmpdir)
+	auto = _get_automator()
+	backend = LocalBackend(max_threads=2, workdir=workdir)
+	cases = auto.get_cases()
+	name, case_vars = next(iter(cases.items()))
+	ex = auto.get_executor(name, case_vars, "fake_moc.py", 1, backend)
+	ex.nproc = 36
+	shell_script = os.path.join(workdir, "run.sh")
+	ex.write_script(shell_script, **case_vars)
+	try:
+		ex.execute_script(shell_script)
+	except ValueError:
+		pass
+	else:
+		raise AssertionError("A 36-thread job was accepted with a budget of 2 threads.")
+
+
+def test_pipeline_sweep(tmpdir, monkeypatch):
+	workdir = str(tmpdir)
+	script_file = os.path.join(workdir, "fake_moc.py")
+	with open(script_file, 'w') as f:
+		f.write(FAKE_SCRIPT)
+	monkeypatch.setenv("PATH", os.path.dirname(sys.executable) + os.pathsep + os.environ["PATH"])
+	pipeline = Pipeline()
+	names = add_moc_tasks(pipeline, _get_automator(), workdir, script_file, minutes=1,
+	                      inputs=[script_file], results_file="ran_mesh01_{case_name}",
+	                      max_threads=2)
+	status = pipeline.run()
+	assert all(status[name] == "done" for name in names), status
+	# The backend is released once the pipeline has run
+	backend, = pipeline.get_backends()
+	assert backend._pool is None and not backend._jobs
@@ -0,0 +1,163 @@
+# Warm Start
+#
+# Seed OpenMOC eigenvalue calculations with the solution of a previous run
+
+import h5py
+import numpy as np
+import openmoc.process
+
+
+def get_fsr_points(geometry):
+	"""Get a characteristic (x, y) point inside each flat source region
+
+	Parameter:
+	----------
+	geometry:       openmoc.Geometry with its FSRs initialized
+
+	Returns:
+	--------
+	array of floats, shape (num_fsrs, 2); the FSR points (cm)
+	"""
+	num_fsrs = geometry.getNumFSRs()
+	points = np.zeros((num_fsrs, 2))
+	for r in range(num_fsrs):
+		point = geometry.getFSRPoint(r)
+		points[r] = point.getX(), point.getY()
+	return points
+
+
+class WarmStart:
+	"""Scalar fluxes and eigenvalue from a previous OpenMOC solution
+
+	If the new model has the same FSR layout, the fluxes are used as-is.
+	Otherwise, the old fluxes are binned onto a uniform spatial grid and
+	each new FSR takes the (volume-weighted) flux of the bin it falls in.
+
+	Parameters:
+	-----------
+	fluxes:         array of floats, shape (num_fsrs, ngroups); FSR scalar fluxes
+	keff:           float; eigenvalue of the previous solution
+	points:         array of floats, shape (num_fsrs, 2); (x, y) of a point
+	                inside each FSR, used to map the fluxes onto new FSRs
+	volumes:        array of floats, shape (num_fsrs,), optional; FSR volumes
+	                [Default: None --> equal weights]
+	"""
+	def __init__(self, fluxes, keff, points, volumes=None):
+		self._fluxes = np.array(fluxes, dtype=float)
+		self._points = np.array(points, dtype=float)
+		num_fsrs = len(self._fluxes)
+		errstr = "{} FSR points were given for {} FSR fluxes."
+		assert len(self._points) == num_fsrs, errstr.format(len(self._points), num_fsrs)
+		if volumes is None:
+			volumes = np.ones(num_fsrs)
+		self._volumes = np.array(volumes, dtype=float)
+		self.keff = keff
+
+	@property
+	def fluxes(self):
+		return self._fluxes
+
+	@property
+	def points(self):
+		return self._points
+
+	@property
+	def volumes(self):
+		return self._volumes
+
+	@property
+	def num_fsrs(self):
+		return self._fluxes.shape[0]
+
+	@property
+	def ngroups(self):
+		return self._fluxes.shape[1]
+
+	@classmethod
+	def from_solver(cls, solver, geometry, track_generator=None):
+		"""Harvest the solution of a converged OpenMOC solver
+
+		Parameters:
+		-----------
+		solver:             openmoc.Solver which has computed an eigenvalue
+		geometry:           openmoc.Geometry the solver ran on
+		track_generator:    openmoc.TrackGenerator, optional; used to get the FSR volumes.
+		                    [Default: None --> equal weights]
+		"""
+		fluxes = openmoc.process.get_scalar_fluxes(solver)
+		points = get_fsr_points(geometry)
+		volumes = None
+		if track_generator is not None:
+			volumes = [track_generator.getFSRVolume(r) for r in range(len(points))]
+		return cls(fluxes, solver.getKeff(), points, volumes)
+
+	@classmethod
+	def from_hdf5(cls, fname):
+		"""Load a solution saved with `WarmStart.export_to_hdf5()`"""
+		with h5py.File(fname, 'r') as f:
+			return cls(f["fluxes"][...], f.attrs["keff"],
+			           f["points"][...], f["volumes"][...])
+
+	def export_to_hdf5(self, fname):
+		"""Save this solution to an HDF5 file"""
+		with h5py.File(fname, 'w') as f:
+			f.attrs["keff"] = self.keff
+			f.create_dataset("fluxes", data=self._fluxes)
+			f.create_dataset("points", data=self._points)
+			f.create_dataset("volumes", data=self._volumes)
+
+	def get_fluxes_for(self, points, grid=None):
+		"""Map the stored fluxes onto a (possibly different) set of FSRs
+
+		Parameters:
+		-----------
+		points:         array of floats, shape (num_fsrs, 2); a point inside each new FSR
+		grid:           int, optional; number of bins across each direction of the
+		                spatial lookup grid.
+		                [Default: None --> sqrt of the number of stored FSRs]
+
+		Returns:
+		--------
+		array of floats, shape (len(points), ngroups); the mapped scalar fluxes
+		"""
+		points = np.asarray(points, dtype=float)
+		if points.shape == self._points.shape and np.allclose(points, self._points):
+			return self._fluxes
+		if grid is None:
+			grid = max(int(np.sqrt(self.num_fsrs)), 1)
+		lower = np.minimum(self._points.min(axis=0), points.min(axis=0))
+		upper = np.maximum(self._points.max(axis=0), points.max(axis=0))
+		span = np.where(upper > lower, upper - lower, 1.0)
+
+		def get_bins(pts):
+			ij = ((pts - lower)/span*grid).astype(int)
+			ij = np.clip(ij, 0, grid - 1)
+			return ij[:, 0]*grid + ij[:, 1]
+
+		# Volume-weighted average flux of the old FSRs in each bin
+		old_bins = get_bins(self._points)
+		binned = np.zeros((grid*grid, self.ngroups))
+		np.add.at(binned, old_bins, self._volumes[:, None]*self._fluxes)
+		weights = np.bincount(old_bins, self._volumes, minlength=grid*grid)
+		filled = weights > 0
+		binned[filled] /= weights[filled, None]
+		# Empty bins get the average spectrum of the whole problem
+		binned[~filled] = (self._volumes[:, None]*self._fluxes).sum(axis=0)/self._volumes.sum()
+		return binned[get_bins(points)]
+
+	def apply_to_solver(self, solver, geometry):
+		"""Set the stored fluxes as the initial guess of an OpenMOC solver
+
+		OpenMOC derives the first eigenvalue from the seeded fission source,
+		so `keff` is kept for reference and reporting only.
+
+		Parameters:
+		-----------
+		solver:         openmoc.Solver which has not yet run
+		geometry:       openmoc.Geometry the solver will run on
+		"""
+		ngroups = geometry.getNumEnergyGroups()
+		errstr = "Cannot warm start a {}-group solve from {}-group fluxes."
+		assert ngroups == self.ngroups, errstr.format(ngroups, self.ngroups)
+		fluxes = self.get_fluxes_for(get_fsr_points(geometry))
+		solver.setFluxes(np.ascontiguousarray(fluxes).flatten())
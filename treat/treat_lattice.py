@@ -4,7 +4,7 @@
 
 import pickle
 from warnings import warn
-from numpy import array
+from numpy import array, array_equal
 import openmc
 from . import constants
 
@@ -38,15 +38,59 @@ class TreatLattice(openmc.RectLattice):
 			pickle.dump(ids_to_keys, pickle_file)
 	
 	
-	def get_openmc_geometry(self, bc, axially_finite):
+	def get_symmetry(self):
+		"""Find the mirror symmetry of the lattice universes
+		
+		Returns:
+		--------
+		int; 4 if the lattice is symmetric about both its x and y center lines
+		(which includes octant symmetry), 2 if only about the x center line
+		(the east half mirrors the west), or 1 otherwise.
+		"""
+		ids = array([[u.id for u in row] for row in self.universes])
+		mirror_x = array_equal(ids, ids[:, ::-1])
+		mirror_y = array_equal(ids, ids[::-1, :])
+		if mirror_x and mirror_y:
+			return 4
+		elif mirror_x:
+			return 2
+		return 1
+	
+	
+	def get_openmc_geometry(self, bc, axially_finite, symmetry=1):
+		"""Get an openmc.Geometry of this lattice
+		
+		Parameters:
+		-----------
+		bc:             iterable of 4 str; boundary conditions of the lattice edges
+		axially_finite: bool; whether to bound the top and bottom with reflective ZPlanes
+		symmetry:       int or "auto", optional; 2 to model only the east half of
+		                the core, or 4 for only the northeast quarter, with reflective
+		                planes through the center. "auto" uses `get_symmetry()`.
+		                [Default: 1 --> the full core]
+		
+		Returns:
+		--------
+		openmc.Geometry
+		"""
+		if symmetry == "auto":
+			symmetry = self.get_symmetry()
+		assert symmetry in (1, 2, 4), "symmetry must be 1, 2, 4, or 'auto'."
 		geom = openmc.Geometry()
 		root_universe = openmc.Universe(universe_id=0)
 		root_cell = openmc.Cell(name="root cell")
 		hwidth = self.width[0]/2.0
 		bce, bcw, bcs, bcn = bc
-		xmin = openmc.XPlane(x0=-hwidth, boundary_type=bce)
+		# Cut the core with reflective planes through its center
+		if symmetry >= 2:
+			xmin = openmc.XPlane(x0=0.0, boundary_type="reflective")
+		else:
+			xmin = openmc.XPlane(x0=-hwidth, boundary_type=bce)
 		xmax = openmc.XPlane(x0=+hwidth, boundary_type=bcw)
-		ymin = openmc.YPlane(y0=-hwidth, boundary_type=bcs)
+		if symmetry == 4:
+			ymin = openmc.YPlane(y0=0.0, boundary_type="reflective")
+		else:
+			ymin = openmc.YPlane(y0=-hwidth, boundary_type=bcs)
 		ymax = openmc.YPlane(y0=+hwidth, boundary_type=bcn)
 		root_universe.add_cell(root_cell)
 		root_cell.region = +xmin & -xmax & +ymin & -ymax
@@ -60,7 +104,7 @@ class TreatLattice(openmc.RectLattice):
 	
 	
 	def export_to_xml(self, bc, axially_finite, plotzs=(0.0,), entropy=0,
-	                  particles=1000, batches=10, inactive=5):
+	                  particles=1000, batches=10, inactive=5, symmetry=1):
 		"""Export just this lattice's geometry and materials to XML
 
 		Parameters:     (all optional)
@@ -89,8 +133,12 @@ class TreatLattice(openmc.RectLattice):
 		axially_finite: bool; whether to bound the top and bottom with reflective ZPlanes.
 		                [Default: False]
 		
+		symmetry:       int or "auto"; part of the core to model.
+		                See `get_openmc_geometry()`.
+		                [Default: 1 --> the full core]
+		
 		"""
-		geom = self.get_openmc_geometry(bc, axially_finite)
+		geom = self.get_openmc_geometry(bc, axially_finite, symmetry)
 		geom.export_to_xml()
 		self.export_key_pickle()
 		# plots